@@ -0,0 +1,19 @@
+import os
+import sys
+from pathlib import Path
+
+import django
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ocrsite.settings')
+django.setup()
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    from portal.benchmark import CorpusSpec, generate_corpus
+
+    pytest.importorskip('PIL')
+    spec = CorpusSpec(dpis=(300,), skews=(0.0,), noise_levels=(0.0,), languages=('eng',), pages=1)
+    return generate_corpus(tmp_path_factory.mktemp('corpus'), spec)
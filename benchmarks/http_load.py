@@ -0,0 +1,73 @@
+"""
+Minimal HTTP load generator (stdlib only) used to compare the WSGI and ASGI server
+modes: it keeps ``--concurrency`` connections busy for ``--duration`` seconds and
+reports throughput, latency percentiles and errors.
+
+    python benchmarks/http_load.py http://localhost:8000/ocr/status/<job-id>/ \\
+        --cookie "sessionid=..." --concurrency 200 --duration 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _fetch(host: str, port: int, path: str, headers: str) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n{headers}\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _worker(url, headers, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await _fetch(parts.hostname, parts.port or 80, path, headers)
+        except OSError:
+            errors.append('connection')
+            continue
+        if status >= 400:
+            errors.append(str(status))
+        else:
+            latencies.append(time.perf_counter() - started)
+
+
+async def main(args) -> None:
+    headers = f'Cookie: {args.cookie}\r\n' if args.cookie else ''
+    latencies: list[float] = []
+    errors: list[str] = []
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(
+        *(_worker(args.url, headers, deadline, latencies, errors) for _ in range(args.concurrency))
+    )
+    print(f'requests: {len(latencies)}  errors: {len(errors)}')
+    print(f'throughput: {len(latencies) / args.duration:.1f} req/s')
+    print(f'p50: {_percentile(latencies, 50) * 1000:.1f} ms  p95: {_percentile(latencies, 95) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('--cookie', default='')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    asyncio.run(main(parser.parse_args()))
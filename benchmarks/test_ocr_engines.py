@@ -0,0 +1,38 @@
+import pytest
+
+from portal.benchmark import OPTION_PRESETS, available_engines, char_accuracy, run_document
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.mark.parametrize('preset', sorted(OPTION_PRESETS))
+def test_ocrmypdf_presets(benchmark, corpus, preset):
+    if 'ocrmypdf' not in available_engines():
+        pytest.skip('OCRmyPDF is not installed.')
+    document = corpus[0]
+    _, text, ocr_dpi = benchmark.pedantic(run_document, args=('ocrmypdf', preset, document), rounds=3)
+    benchmark.extra_info['char_accuracy'] = char_accuracy(document.ground_truth, text)
+    benchmark.extra_info['ocr_dpi'] = ocr_dpi
+
+
+def test_docling(benchmark, corpus):
+    if 'docling' not in available_engines():
+        pytest.skip('Docling is not installed.')
+    document = corpus[0]
+    _, text, _ = benchmark.pedantic(run_document, args=('docling', 'default', document), rounds=1)
+    benchmark.extra_info['char_accuracy'] = char_accuracy(document.ground_truth, text)
+
+
+def test_bounded_docling_peak_rss(tmp_path, monkeypatch):
+    from django.conf import settings
+
+    from portal.benchmark import CorpusSpec, generate_corpus, isolated_peak_rss_kb
+
+    if 'docling' not in available_engines():
+        pytest.skip('Docling is not installed.')
+    pytest.importorskip('PIL')
+    spec = CorpusSpec(dpis=(300,), skews=(0.0,), noise_levels=(0.0,), languages=('eng',), pages=12)
+    document = generate_corpus(tmp_path, spec)[0]
+    monkeypatch.setenv('OCR_BOUNDED_WINDOW', '4')
+    peak_mb = isolated_peak_rss_kb('docling', 'bounded', document) / 1024
+    assert peak_mb <= settings.OCR_JOB_MAX_RSS_MB, f'peak RSS {peak_mb:.0f} MB'
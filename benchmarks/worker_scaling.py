@@ -0,0 +1,94 @@
+"""
+Queue throughput against the number of OCR worker processes on this machine. For each
+worker count the same batch of jobs (copies of one PDF) is queued and that many
+``manage.py ocr_worker --exit-when-idle`` processes drain it; jobs/second should grow
+roughly linearly until the CPUs are saturated.
+
+    python benchmarks/worker_scaling.py sample.pdf --jobs 24 --workers 1,2,4
+
+Jobs are created for ``--user`` (default: the first superuser) and deleted afterwards.
+Use a scratch database (``DATA_DIR``/``DATABASE_*``) rather than production.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ocrsite.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.files import File  # noqa: E402
+
+from portal.models import OcrJob  # noqa: E402
+from portal.retention import purge  # noqa: E402
+
+
+def _enqueue(user, pdf: Path, count: int, language: str) -> list:
+    ids = []
+    for _ in range(count):
+        job = OcrJob(user=user, language=language, status=OcrJob.Status.PENDING, options={'optimize': 0})
+        with pdf.open('rb') as stream:
+            job.source_file.save(pdf.name, File(stream), save=False)
+        job.save()
+        ids.append(job.pk)
+    return ids
+
+
+def _drain(workers: int) -> float:
+    env = {**os.environ, 'OCR_EXECUTION': 'queue', 'OCR_COMPRESSION': 'off'}
+    command = [sys.executable, str(ROOT / 'manage.py'), 'ocr_worker', '--exit-when-idle']
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen([*command, '--name', f'bench-{index}'], env=env, stdout=subprocess.DEVNULL)
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.wait()
+    return time.perf_counter() - started
+
+
+def main(args) -> None:
+    user_model = get_user_model()
+    user = (
+        user_model.objects.get(username=args.user)
+        if args.user
+        else user_model.objects.filter(is_superuser=True).order_by('pk').first()
+    )
+    if user is None:
+        raise SystemExit('No user to own the benchmark jobs; pass --user.')
+
+    baseline = None
+    print(f'{"workers":>7} {"seconds":>8} {"jobs/s":>7} {"speed-up":>8} {"failed":>6}')
+    for workers in args.workers:
+        ids = _enqueue(user, args.pdf, args.jobs, args.language)
+        try:
+            seconds = _drain(workers)
+            jobs = OcrJob.objects.filter(pk__in=ids)
+            failed = jobs.exclude(status=OcrJob.Status.COMPLETED).count()
+        finally:
+            for job in OcrJob.objects.filter(pk__in=ids):
+                purge(job)
+        rate = args.jobs / seconds
+        baseline = baseline or rate / workers
+        print(f'{workers:>7} {seconds:>8.1f} {rate:>7.2f} {rate / baseline:>7.2f}x {failed:>6}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', type=Path)
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--workers', type=lambda value: [int(item) for item in value.split(',')], default=[1, 2, 4])
+    parser.add_argument('--language', default='eng')
+    parser.add_argument('--user', default='')
+    main(parser.parse_args())
@@ -3,7 +3,16 @@ set -e
 
 mkdir -p /app/staticfiles /app/media /app/data
 
+# Shared directory for prometheus_client multiprocess metrics; stale files from a
+# previous run would otherwise be merged into the new counters.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
-exec gunicorn ocrsite.wsgi:application --bind 0.0.0.0:8000
 
+# Worker count, threads, timeouts and recycling are derived from the container's
+# CPU and memory limits in gunicorn.conf.py (GUNICORN_* variables override them).
+# SERVER_MODE=asgi switches to uvicorn workers for the async views.
+exec gunicorn -c /app/gunicorn.conf.py
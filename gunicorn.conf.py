@@ -0,0 +1,97 @@
+"""
+Gunicorn configuration sized to the container. Every value can be overridden with
+the environment variable named next to it.
+"""
+
+import os
+import sys
+
+# The gunicorn console script does not put the working directory on sys.path.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ocrsite.cgroup import cpu_count, memory_limit  # noqa: E402
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+_MB = 1024 * 1024
+
+# --- server -----------------------------------------------------------------
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'ocrsite.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'ocrsite.wsgi:application'
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# --- sizing -----------------------------------------------------------------
+
+_cpus = cpu_count()
+_memory = memory_limit()
+# Resident size of one worker after a Docling/onnxruntime job has run.
+_worker_memory = _env_int('GUNICORN_WORKER_MEMORY_MB', 700) * _MB
+
+_by_cpu = _cpus + 1
+_by_memory = max(1, _memory // _worker_memory) if _memory else _by_cpu
+workers = _env_int('GUNICORN_WORKERS', max(1, min(_by_cpu, _by_memory)))
+threads = _env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+
+# Import Django and the portal once in the master so workers share the pages
+# copy-on-write instead of importing everything after each fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in {'1', 'true', 'yes'}
+
+# Recycle workers to contain memory growth from Docling/onnxruntime.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 200)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 50)
+
+# --- timeouts ---------------------------------------------------------------
+
+# gthread and uvicorn workers heartbeat from their main loop, so ``timeout`` only
+# catches a hung worker and long OCR requests running in a thread are not killed.
+# Sync workers block the heartbeat for the whole request and need the OCR budget.
+web_timeout = _env_int('GUNICORN_WEB_TIMEOUT', 60)
+ocr_timeout = _env_int('GUNICORN_OCR_TIMEOUT', 900)
+timeout = ocr_timeout if worker_class == 'sync' else web_timeout
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+
+
+def when_ready(server):
+    server.log.info(
+        'Gunicorn sized for %d CPU(s), memory limit %s: %d worker(s) x %d thread(s), class %s, timeout %ss',
+        _cpus,
+        f'{_memory // _MB} MB' if _memory else 'none',
+        workers,
+        threads,
+        worker_class,
+        timeout,
+    )
+    if preload_app:
+        # Runs in the master after the application is preloaded: engine imports end
+        # up in memory shared copy-on-write by every forked worker. Models are not
+        # loaded here; their native thread pools would not survive the fork.
+        from portal.warmup import warm_up
+
+        warm_up(phase='import')
+
+
+def post_worker_init(worker):
+    from portal.warmup import warm_up
+
+    # With preload the master already imported the engines; build the models here.
+    warm_up(phase='init' if preload_app else 'all')
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
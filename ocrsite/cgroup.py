@@ -0,0 +1,92 @@
+"""
+Read the CPU and memory limits of the current container (cgroup v2 with a v1
+fallback). Kept free of Django imports so gunicorn.conf.py can use it before the
+application is loaded.
+"""
+
+import math
+import os
+from pathlib import Path
+
+CGROUP_ROOT = Path(os.environ.get('CGROUP_ROOT', '/sys/fs/cgroup'))
+
+# cgroup v1 reports "unlimited" as a page-aligned value close to 2**63.
+_UNLIMITED_THRESHOLD = 1 << 60
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def host_cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - non-Linux platforms
+        return os.cpu_count() or 1
+
+
+def cpu_limit() -> float:
+    """Number of CPUs this container may use (fractional quotas are preserved)."""
+    host = host_cpu_count()
+
+    v2 = _read(CGROUP_ROOT / 'cpu.max')
+    if v2:
+        quota, _, period = v2.partition(' ')
+        if quota != 'max' and period:
+            return min(host, int(quota) / int(period))
+        return float(host)
+
+    quota = _read(CGROUP_ROOT / 'cpu' / 'cpu.cfs_quota_us') or _read(CGROUP_ROOT / 'cpu.cfs_quota_us')
+    period = _read(CGROUP_ROOT / 'cpu' / 'cpu.cfs_period_us') or _read(CGROUP_ROOT / 'cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return min(host, int(quota) / int(period))
+    return float(host)
+
+
+def cpu_count() -> int:
+    """Whole CPUs available, rounded up and never below one."""
+    return max(1, math.ceil(cpu_limit()))
+
+
+def memory_limit() -> int | None:
+    """Memory limit in bytes, or ``None`` when the container is unrestricted."""
+    v2 = _read(CGROUP_ROOT / 'memory.max')
+    if v2:
+        return None if v2 == 'max' else int(v2)
+
+    v1 = _read(CGROUP_ROOT / 'memory' / 'memory.limit_in_bytes') or _read(
+        CGROUP_ROOT / 'memory.limit_in_bytes'
+    )
+    if v1 and int(v1) < _UNLIMITED_THRESHOLD:
+        return int(v1)
+    return None
+
+
+def memory_usage() -> int | None:
+    """Current memory usage of the container in bytes, when the cgroup exposes it."""
+    value = _read(CGROUP_ROOT / 'memory.current') or _read(
+        CGROUP_ROOT / 'memory' / 'memory.usage_in_bytes'
+    )
+    return int(value) if value else None
+
+
+def memory_working_set() -> int | None:
+    """
+    Usage minus reclaimable page cache (``inactive_file``), the figure the OOM killer
+    effectively compares with the limit. ``None`` when the cgroup does not expose it.
+    """
+    usage = memory_usage()
+    if usage is None:
+        return None
+    stat = _read(CGROUP_ROOT / 'memory.stat') or _read(CGROUP_ROOT / 'memory' / 'memory.stat')
+    inactive = 0
+    for line in (stat or '').splitlines():
+        key, _, value = line.partition(' ')
+        if key in {'inactive_file', 'total_inactive_file'}:
+            inactive = int(value)
+            if key == 'total_inactive_file':
+                break
+    return max(0, usage - inactive)
@@ -96,6 +96,7 @@ if WHITENOISE_AVAILABLE:
     MIDDLEWARE.append('whitenoise.middleware.WhiteNoiseMiddleware')
 
 MIDDLEWARE += [
+    'portal.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -104,6 +105,17 @@ MIDDLEWARE += [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Sampled request profiling (opt-in). Staff can force a profile with the
+# ``X-Portal-Profile: 1`` header; the slowest traces are kept in PROFILING_DIR.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False').lower() in {'1', 'true', 'yes'}
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', '0.005'))
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', '20'))
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', DATA_DIR / 'profiles'))
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.append('portal.middleware.RequestProfilingMiddleware')
+
 ROOT_URLCONF = 'ocrsite.urls'
 
 TEMPLATES = [
@@ -130,12 +142,36 @@ WSGI_APPLICATION = 'ocrsite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': DATA_DIR / 'db.sqlite3',
+# SQLite by default; set DATABASE_HOST to use PostgreSQL, which split deployments (several
+# web replicas and OCR workers, see OCR_EXECUTION) need to share one database.
+if os.environ.get('DATABASE_HOST'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'ocrsite'),
+            'USER': os.environ.get('DATABASE_USER', 'ocrsite'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ['DATABASE_HOST'],
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': DATA_DIR / 'db.sqlite3',
+            # Local worker processes write concurrently: take the write lock when a
+            # transaction starts (no lock-upgrade deadlocks), let readers proceed under WAL
+            # and wait for the lock instead of failing.
+            'OPTIONS': {
+                'timeout': 30,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL;',
+            },
+        }
     }
-}
 
 
 # Password validation
@@ -185,6 +221,209 @@ else:
 MEDIA_URL = os.environ.get('MEDIA_URL', '/media/')
 MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
 
+# Media storage: "local" keeps uploads and results in MEDIA_ROOT; "s3" stores them in an
+# S3-compatible bucket (AWS, MinIO, Ceph RGW...) through django-storages, so several web and
+# worker nodes share the same files. Transfers above OCR_S3_MULTIPART_THRESHOLD_MB use
+# multipart uploads; downloads redirect to presigned URLs valid for OCR_MEDIA_URL_EXPIRE
+# seconds unless OCR_MEDIA_PRESIGNED is disabled.
+OCR_MEDIA_STORAGE = os.environ.get('OCR_MEDIA_STORAGE', 'local').lower()
+OCR_MEDIA_PRESIGNED = os.environ.get('OCR_MEDIA_PRESIGNED', 'True').lower() in {'1', 'true', 'yes'}
+OCR_MEDIA_URL_EXPIRE = int(os.environ.get('OCR_MEDIA_URL_EXPIRE', '300'))
+# Endpoint browsers use for presigned URLs when the nodes reach the store on a private
+# address (e.g. http://minio:9000 inside compose, https://media.example.org outside).
+OCR_S3_PUBLIC_ENDPOINT_URL = os.environ.get('OCR_S3_PUBLIC_ENDPOINT_URL', '')
+
+MEDIA_STORAGE_BACKEND = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+if OCR_MEDIA_STORAGE == 's3':
+    from boto3.s3.transfer import TransferConfig
+
+    MEDIA_STORAGE_BACKEND = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ['OCR_S3_BUCKET'],
+            'endpoint_url': os.environ.get('OCR_S3_ENDPOINT_URL') or None,
+            'region_name': os.environ.get('OCR_S3_REGION') or None,
+            'access_key': os.environ.get('OCR_S3_ACCESS_KEY_ID') or None,
+            'secret_key': os.environ.get('OCR_S3_SECRET_ACCESS_KEY') or None,
+            'location': os.environ.get('OCR_S3_PREFIX', ''),
+            # MinIO and most self-hosted stores only support path-style bucket addressing.
+            'addressing_style': os.environ.get('OCR_S3_ADDRESSING_STYLE', 'path'),
+            'signature_version': 's3v4',
+            'default_acl': None,
+            'querystring_auth': True,
+            'querystring_expire': OCR_MEDIA_URL_EXPIRE,
+            # Same semantics as FileSystemStorage: a new upload never replaces another job's file.
+            'file_overwrite': False,
+            'transfer_config': TransferConfig(
+                multipart_threshold=int(os.environ.get('OCR_S3_MULTIPART_THRESHOLD_MB', '16')) * 1024 * 1024,
+                multipart_chunksize=int(os.environ.get('OCR_S3_MULTIPART_CHUNK_MB', '16')) * 1024 * 1024,
+                max_concurrency=int(os.environ.get('OCR_S3_MAX_CONCURRENCY', '4')),
+            ),
+        },
+    }
+elif OCR_MEDIA_STORAGE != 'local':
+    raise ValueError(f'Unknown OCR_MEDIA_STORAGE {OCR_MEDIA_STORAGE!r}; use "local" or "s3".')
+
+STORAGES = {
+    'default': MEDIA_STORAGE_BACKEND,
+    'staticfiles': {'BACKEND': STATICFILES_STORAGE},
+}
+
+# Adaptive OCR routing (used when the admin console selects the "auto" engine).
+OCR_ROUTING_SAMPLE_PAGES = int(os.environ.get('OCR_ROUTING_SAMPLE_PAGES', '3'))
+OCR_ROUTING_TABLE_THRESHOLD = int(os.environ.get('OCR_ROUTING_TABLE_THRESHOLD', '40'))
+OCR_ROUTING_DOCLING_MAX_PAGES = int(os.environ.get('OCR_ROUTING_DOCLING_MAX_PAGES', '200'))
+# Scans have no vector rulings: their sample pages are rendered at OCR_ROUTING_RASTER_DPI
+# (0 disables) and go to Docling from OCR_ROUTING_RASTER_TABLE_THRESHOLD ruled-grid crossings
+# per page, or when a page has OCR_ROUTING_COLUMNS text columns or more.
+OCR_ROUTING_RASTER_DPI = int(os.environ.get('OCR_ROUTING_RASTER_DPI', '100'))
+OCR_ROUTING_RASTER_TABLE_THRESHOLD = int(os.environ.get('OCR_ROUTING_RASTER_TABLE_THRESHOLD', '12'))
+OCR_ROUTING_COLUMNS = int(os.environ.get('OCR_ROUTING_COLUMNS', '3'))
+
+# Engines imported once in the gunicorn master before workers fork; their models are
+# loaded in each worker after the fork.
+OCR_WARMUP_ENGINES = [
+    engine.strip()
+    for engine in os.environ.get('OCR_WARMUP_ENGINES', 'ocrmypdf,docling,docx').split(',')
+    if engine.strip()
+]
+
+# Result of the heavy engine validation (warm-up or ``manage.py probe_engines``),
+# shared by all workers; request paths only read it.
+OCR_CAPABILITIES_PATH = Path(os.environ.get('OCR_CAPABILITIES_PATH', DATA_DIR / 'capabilities.json'))
+OCR_ENGINE_PROBE_TTL = int(os.environ.get('OCR_ENGINE_PROBE_TTL', '86400'))
+
+# Store per-page words and boxes for every OCR job (search and preview highlighting).
+OCR_STRUCTURED_OUTPUT = os.environ.get('OCR_STRUCTURED_OUTPUT', 'True').lower() in {'1', 'true', 'yes'}
+OCR_SEARCH_MAX_HITS = int(os.environ.get('OCR_SEARCH_MAX_HITS', '200'))
+
+# "opencv" replaces OCRmyPDF's deskew/remove_background/clean_final with the
+# in-process NumPy/OpenCV stage in portal/preprocess.py; "ocrmypdf" keeps the flags.
+OCR_PREPROCESSING = os.environ.get('OCR_PREPROCESSING', 'ocrmypdf').lower()
+OCR_PREPROCESS_DPI = int(os.environ.get('OCR_PREPROCESS_DPI', '300'))
+
+# Adaptive OCR resolution (portal/resolution.py): dense scans are OCR'd at the lowest
+# DPI giving lowercase letters OCR_TARGET_XHEIGHT_PX pixels, never below the minimum.
+OCR_ADAPTIVE_DPI = os.environ.get('OCR_ADAPTIVE_DPI', 'True').lower() in {'1', 'true', 'yes'}
+OCR_TARGET_XHEIGHT_PX = int(os.environ.get('OCR_TARGET_XHEIGHT_PX', '20'))
+OCR_ADAPTIVE_MIN_DPI = int(os.environ.get('OCR_ADAPTIVE_MIN_DPI', '150'))
+
+# Output compression (portal/compression.py) after a job completes: "background" runs it
+# on a thread of the web process, "queue" leaves it to ``manage.py compress_outputs``,
+# "off" disables it. Results saving less than OCR_COMPRESSION_MIN_SAVING are discarded.
+OCR_COMPRESSION = os.environ.get('OCR_COMPRESSION', 'background').lower()
+OCR_COMPRESSION_WORKERS = int(os.environ.get('OCR_COMPRESSION_WORKERS', '1'))
+OCR_COMPRESSION_JPEG_PSNR = float(os.environ.get('OCR_COMPRESSION_JPEG_PSNR', '34'))
+OCR_COMPRESSION_BACKGROUND_SCALE = int(os.environ.get('OCR_COMPRESSION_BACKGROUND_SCALE', '3'))
+OCR_COMPRESSION_MIN_SAVING = float(os.environ.get('OCR_COMPRESSION_MIN_SAVING', '0.05'))
+# A compression still marked running after this long was interrupted (the process died);
+# ``compress_outputs`` queues it again.
+OCR_COMPRESSION_STALE_SECONDS = int(os.environ.get('OCR_COMPRESSION_STALE_SECONDS', '3600'))
+
+# Tiered media storage (portal/tiering.py). ``manage.py storage_tiers --migrate`` moves the
+# uploads of completed jobs older than OCR_TIER_SOURCE_DAYS, and results nobody opened for
+# OCR_TIER_IDLE_DAYS, into zstd archives on OCR_ARCHIVE_ROOT (or OCR_ARCHIVE_STORAGE);
+# they are restored on the next download.
+OCR_ARCHIVE_STORAGE = os.environ.get('OCR_ARCHIVE_STORAGE', 'django.core.files.storage.FileSystemStorage')
+OCR_ARCHIVE_ROOT = Path(os.environ.get('OCR_ARCHIVE_ROOT', DATA_DIR / 'archive'))
+OCR_ARCHIVE_ZSTD_LEVEL = int(os.environ.get('OCR_ARCHIVE_ZSTD_LEVEL', '10'))
+OCR_TIER_SOURCE_DAYS = int(os.environ.get('OCR_TIER_SOURCE_DAYS', '7'))
+OCR_TIER_IDLE_DAYS = int(os.environ.get('OCR_TIER_IDLE_DAYS', '30'))
+
+# Media garbage collection (``manage.py media_gc``, portal/retention.py). Unreferenced files
+# younger than OCR_GC_GRACE_HOURS are kept (uploads are written before their row). Retention
+# deletes failed/abandoned jobs, completed jobs and Word documents after the given number of
+# days; 0 keeps them forever.
+OCR_GC_GRACE_HOURS = int(os.environ.get('OCR_GC_GRACE_HOURS', '24'))
+OCR_GC_DELETE_RATE = float(os.environ.get('OCR_GC_DELETE_RATE', '0'))
+OCR_RETENTION_FAILED_DAYS = int(os.environ.get('OCR_RETENTION_FAILED_DAYS', '30'))
+OCR_RETENTION_JOB_DAYS = int(os.environ.get('OCR_RETENTION_JOB_DAYS', '0'))
+OCR_RETENTION_WORD_DAYS = int(os.environ.get('OCR_RETENTION_WORD_DAYS', '0'))
+
+# Where OCR jobs run: "inline" inside the upload request (single node), or "queue": web
+# replicas only store the upload and ``manage.py ocr_worker`` processes on any node sharing
+# the database and media storage lease jobs (portal/workers.py). Leases are renewed every
+# OCR_WORKER_HEARTBEAT_SECONDS; a job whose lease expires is retried up to
+# OCR_JOB_MAX_ATTEMPTS times. Word conversions still run inline. Inline jobs hold a lease
+# too: when the web process dies they are requeued, and ``ocr_worker --exit-when-idle`` run
+# periodically (e.g. from cron) resumes them.
+OCR_EXECUTION = os.environ.get('OCR_EXECUTION', 'inline').lower()
+OCR_WORKER_LEASE_SECONDS = int(os.environ.get('OCR_WORKER_LEASE_SECONDS', '120'))
+OCR_WORKER_HEARTBEAT_SECONDS = int(os.environ.get('OCR_WORKER_HEARTBEAT_SECONDS', '30'))
+OCR_WORKER_POLL_SECONDS = float(os.environ.get('OCR_WORKER_POLL_SECONDS', '2'))
+OCR_JOB_MAX_ATTEMPTS = int(os.environ.get('OCR_JOB_MAX_ATTEMPTS', '3'))
+
+# Resource governor (portal/governor.py): the cgroup CPU/memory limits are split into units
+# of OCR_JOB_CPUS CPUs and OCR_JOB_MEMORY_MB; an OCRmyPDF job holds one unit, a Docling job
+# enough for OCR_DOCLING_JOB_MEMORY_MB. Each job gets OCR_JOB_CPUS as OCRmyPDF ``jobs`` and
+# native thread pools. Jobs wait (up to OCR_GOVERNOR_WAIT_SECONDS) for free units and while
+# the working set is above OCR_GOVERNOR_MEMORY_HIGH of the limit. OCR_GOVERNOR_DIR must be
+# shared by all processes of one container; OCR_GOVERNOR_CPUS overrides the detected CPUs.
+OCR_GOVERNOR = os.environ.get('OCR_GOVERNOR', 'true').lower() in {'1', 'true', 'yes'}
+OCR_GOVERNOR_DIR = Path(os.environ.get('OCR_GOVERNOR_DIR', '/tmp/ocr-governor'))
+OCR_GOVERNOR_CPUS = int(os.environ.get('OCR_GOVERNOR_CPUS', '0'))
+OCR_GOVERNOR_RESERVE_MB = int(os.environ.get('OCR_GOVERNOR_RESERVE_MB', '300'))
+OCR_GOVERNOR_MEMORY_HIGH = float(os.environ.get('OCR_GOVERNOR_MEMORY_HIGH', '0.9'))
+OCR_GOVERNOR_WAIT_SECONDS = int(os.environ.get('OCR_GOVERNOR_WAIT_SECONDS', '600'))
+OCR_JOB_CPUS = int(os.environ.get('OCR_JOB_CPUS', '2'))
+OCR_JOB_MEMORY_MB = int(os.environ.get('OCR_JOB_MEMORY_MB', '500'))
+OCR_DOCLING_JOB_MEMORY_MB = int(os.environ.get('OCR_DOCLING_JOB_MEMORY_MB', '1500'))
+
+# Memory-bounded mode (portal/bounded.py): Docling converts documents with more than
+# OCR_BOUNDED_PAGES pages (0 disables) in windows of OCR_BOUNDED_WINDOW pages, writing each
+# window to disk before the next. The window is halved whenever the worker RSS passes
+# OCR_JOB_MAX_RSS_MB (default: the memory the governor reserves for a Docling job).
+OCR_BOUNDED_PAGES = int(os.environ.get('OCR_BOUNDED_PAGES', '100'))
+OCR_BOUNDED_WINDOW = int(os.environ.get('OCR_BOUNDED_WINDOW', '20'))
+OCR_JOB_MAX_RSS_MB = int(os.environ.get('OCR_JOB_MAX_RSS_MB', '0')) or OCR_DOCLING_JOB_MEMORY_MB
+
+# Scratch space (portal/scratch.py). Each OCR job gets a directory on OCR_SCRATCH_TMPFS_DIR
+# (an existing tmpfs mount, used when the estimate fits OCR_SCRATCH_TMPFS_MAX_MB) or on the
+# OCR_SCRATCH_DIR volume, which is also the process TMPDIR. The need is estimated as
+# pages x page area x DPI^2 x OCR_SCRATCH_BYTES_PER_PIXEL plus three copies of the input and
+# OCR_SCRATCH_BASE_MB, and reserved up front leaving OCR_SCRATCH_HEADROOM_MB free; jobs
+# wait up to OCR_SCRATCH_WAIT_SECONDS for room (queue workers then requeue the job), or
+# OCR_SCRATCH_INLINE_WAIT_SECONDS when they run inside a web request. A job needing more
+# than a whole tier fails at once. While the engine runs, TMPDIR points at the job directory.
+OCR_SCRATCH_DIR = Path(os.environ.get('OCR_SCRATCH_DIR', '/tmp/ocr-scratch'))
+OCR_SCRATCH_TMPFS_DIR = os.environ.get('OCR_SCRATCH_TMPFS_DIR', '')
+OCR_SCRATCH_TMPFS_MAX_MB = int(os.environ.get('OCR_SCRATCH_TMPFS_MAX_MB', '256'))
+OCR_SCRATCH_HEADROOM_MB = int(os.environ.get('OCR_SCRATCH_HEADROOM_MB', '512'))
+OCR_SCRATCH_BYTES_PER_PIXEL = float(os.environ.get('OCR_SCRATCH_BYTES_PER_PIXEL', '2'))
+OCR_SCRATCH_BASE_MB = int(os.environ.get('OCR_SCRATCH_BASE_MB', '32'))
+OCR_SCRATCH_DEFAULT_DPI = int(os.environ.get('OCR_SCRATCH_DEFAULT_DPI', '300'))
+OCR_SCRATCH_WAIT_SECONDS = int(os.environ.get('OCR_SCRATCH_WAIT_SECONDS', '600'))
+OCR_SCRATCH_INLINE_WAIT_SECONDS = int(os.environ.get('OCR_SCRATCH_INLINE_WAIT_SECONDS', '30'))
+OCR_SCRATCH_SAMPLE_SECONDS = float(os.environ.get('OCR_SCRATCH_SAMPLE_SECONDS', '5'))
+
+# Checkpoints (portal/checkpoints.py), opt-in: OCRmyPDF processes documents with more than
+# OCR_CHECKPOINT_PAGES pages (0, the default, disables) in chunks of that many pages, and
+# Docling's bounded windows are stored the same way. Finished chunks are kept in media
+# storage, so a job retried after a crash (an expired lease) only redoes the pages that were
+# not finished. The joined PDF keeps the pages but not the document-level parts of the
+# original (outline, page labels, named destinations, forms, tags, /Info), and PDF/A
+# conversion and optimisation run per chunk.
+OCR_CHECKPOINT_PAGES = int(os.environ.get('OCR_CHECKPOINT_PAGES', '0'))
+
+# Number of recent jobs summarised in the admin console (stage timings, routing, compression).
+OCR_TIMINGS_WINDOW = int(os.environ.get('OCR_TIMINGS_WINDOW', '200'))
+
+# TrueType font ocr_bench renders its corpus with; it must cover the Romanian, German and
+# French letters of the sample texts (the benchmark refuses to start otherwise).
+OCR_BENCH_FONT = os.environ.get('OCR_BENCH_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Port on which each ``ocr_worker`` serves its own Prometheus metrics (0 disables). Queue
+# workers run in separate processes or hosts, so OCR job metrics in queue mode are only
+# found there; the web /metrics has the HTTP metrics and the job counts per status.
+OCR_WORKER_METRICS_PORT = int(os.environ.get('OCR_WORKER_METRICS_PORT', '0'))
+
+# Clients allowed to scrape /metrics without a staff session (e.g. the Prometheus server).
+METRICS_ALLOWED_IPS = {
+    address.strip()
+    for address in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+    if address.strip()
+}
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'portal:home'
 LOGOUT_REDIRECT_URL = 'login'
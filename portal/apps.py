@@ -6,4 +6,7 @@ class PortalConfig(AppConfig):
     name = 'portal'
 
     def ready(self) -> None:  # pragma: no cover - side effect registration
-        from . import signals  # noqa: F401
+        from . import governor, scratch, signals  # noqa: F401
+
+        governor.apply_thread_limits()
+        scratch.configure()
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from pathlib import Path
+
+from django.conf import settings
+
+from .tracing import percentile
+
+log = logging.getLogger(__name__)
+
+
+SAMPLE_TEXTS = {
+    'eng': (
+        'The quick brown fox jumps over the lazy dog. Optical character recognition '
+        'turns scanned pages into searchable documents for the archive.'
+    ),
+    'ron': (
+        'Vulpea maro sare peste câinele leneș. Recunoașterea optică a caracterelor '
+        'transformă paginile scanate în documente ușor de căutat în arhivă.'
+    ),
+    'deu': (
+        'Der schnelle braune Fuchs springt über den faulen Hund. Die Texterkennung '
+        'macht gescannte Seiten im Archiv durchsuchbar.'
+    ),
+    'fra': (
+        'Le renard brun rapide saute par-dessus le chien paresseux. La reconnaissance '
+        'optique rend les pages numérisées consultables dans les archives.'
+    ),
+}
+
+OPTION_PRESETS = {
+    'default': {'optimize': 1},
+    'fast': {'optimize': 0},
+    'deskew': {'optimize': 1, 'deskew': True},
+    'clean': {'optimize': 1, 'clean_final': True},
+    'optimize3': {'optimize': 3},
+    # Same cleanup as "deskew"/"clean", done by portal.preprocess before OCRmyPDF.
+    'opencv_deskew': {'optimize': 1, 'deskew': True, 'preprocess': 'opencv'},
+    'opencv_clean': {'optimize': 1, 'clean_final': True, 'preprocess': 'opencv'},
+    # OCR at the resolution chosen by portal.resolution instead of the scan's own DPI.
+    'adaptive_dpi': {'optimize': 1, 'adaptive_dpi': True},
+    'opencv_adaptive': {'optimize': 1, 'clean_final': True, 'preprocess': 'opencv', 'adaptive_dpi': True},
+    # Docling in page windows (portal.bounded); OCRmyPDF already works page by page.
+    'bounded': {'bounded': True},
+}
+DOCLING_PRESETS = ('default', 'bounded')
+
+# Corpus pages are A4.
+PAGE_INCHES = (8.27, 11.69)
+
+
+@dataclass(slots=True)
+class CorpusSpec:
+    dpis: tuple[int, ...] = (150, 300)
+    skews: tuple[float, ...] = (0.0, 2.5)
+    noise_levels: tuple[float, ...] = (0.0, 0.03)
+    languages: tuple[str, ...] = ('eng', 'ron')
+    pages: int = 2
+    seed: int = 1337
+
+
+@dataclass(slots=True)
+class CorpusDocument:
+    path: Path
+    language: str
+    dpi: int
+    skew: float
+    noise: float
+    pages: int
+    ground_truth: str
+
+
+@dataclass(slots=True)
+class BenchResult:
+    engine: str
+    preset: str
+    documents: int = 0
+    pages: int = 0
+    failures: int = 0
+    seconds: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    accuracies: list[float] = field(default_factory=list)
+    # Pixels handed to the OCR engine, the cost the adaptive resolution presets reduce.
+    ocr_megapixels: float = 0.0
+    peak_rss_kb: int = 0
+
+    def summary(self) -> dict:
+        return {
+            'engine': self.engine,
+            'preset': self.preset,
+            'documents': self.documents,
+            'pages': self.pages,
+            'failures': self.failures,
+            'seconds': round(self.seconds, 3),
+            'pages_per_second': round(self.pages / self.seconds, 3) if self.seconds else 0.0,
+            'latency_p50': round(percentile(self.latencies, 50), 3),
+            'latency_p95': round(percentile(self.latencies, 95), 3),
+            'char_accuracy': round(sum(self.accuracies) / len(self.accuracies), 4)
+            if self.accuracies
+            else 0.0,
+            'ocr_megapixels': round(self.ocr_megapixels, 1),
+            'peak_rss_kb': self.peak_rss_kb,
+        }
+
+
+def char_accuracy(expected: str, actual: str) -> float:
+    """1 - normalised Levenshtein distance, computed on whitespace-collapsed text."""
+    expected = ' '.join(expected.split())
+    actual = ' '.join(actual.split())
+    if not expected:
+        return 1.0 if not actual else 0.0
+
+    previous = list(range(len(actual) + 1))
+    for row, expected_char in enumerate(expected, start=1):
+        current = [row]
+        for column, actual_char in enumerate(actual, start=1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (expected_char != actual_char),
+                )
+            )
+        previous = current
+    return max(0.0, 1 - previous[-1] / len(expected))
+
+
+# Glyphs the corpus needs beyond ASCII; a font without them draws boxes in place of
+# the letters, and the "ground truth" no longer matches the page.
+CORPUS_GLYPHS = ''.join(sorted({char for text in SAMPLE_TEXTS.values() for char in text if ord(char) > 127}))
+
+
+def _glyph(font, char: str) -> bytes:
+    from PIL import Image, ImageDraw
+
+    size = int(font.size * 2)
+    image = Image.new('L', (size, size), 0)
+    ImageDraw.Draw(image).text((0, 0), char, fill=255, font=font)
+    return image.tobytes()
+
+
+def _missing_glyphs(font) -> str:
+    # Characters the font has no glyph for are drawn as its .notdef box, the same
+    # shape it draws for a private-use code point.
+    notdef = _glyph(font, '\ue000')
+    return ''.join(char for char in CORPUS_GLYPHS if _glyph(font, char) == notdef)
+
+
+def _load_font(size: int):
+    from PIL import ImageFont
+
+    path = settings.OCR_BENCH_FONT
+    try:
+        font = ImageFont.truetype(path, size)
+    except OSError as exc:
+        raise RuntimeError(
+            f'Benchmark font {path} cannot be loaded ({exc}); install fonts-dejavu-core '
+            'or point OCR_BENCH_FONT at a TrueType font with Latin Extended glyphs.'
+        ) from exc
+    missing = _missing_glyphs(font)
+    if missing:
+        raise RuntimeError(f'Benchmark font {path} has no glyphs for {missing!r}; set OCR_BENCH_FONT.')
+    return font
+
+
+def _render_page(text: str, dpi: int, skew: float, noise: float, rng: random.Random):
+    from PIL import Image, ImageDraw
+
+    width, height = int(PAGE_INCHES[0] * dpi), int(PAGE_INCHES[1] * dpi)
+    margin = int(0.8 * dpi)
+    font = _load_font(max(12, int(dpi * 12 / 72)))
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+
+    line_height = int(dpi * 18 / 72)
+    words = text.split()
+    lines, current = [], ''
+    for word in words:
+        candidate = f'{current} {word}'.strip()
+        if draw.textlength(candidate, font=font) > width - 2 * margin and current:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    for index, line in enumerate(lines):
+        draw.text((margin, margin + index * line_height), line, fill=0, font=font)
+
+    if skew:
+        image = image.rotate(skew, expand=False, fillcolor=255)
+    if noise:
+        pixels = image.load()
+        for _ in range(int(width * height * noise)):
+            x, y = rng.randrange(width), rng.randrange(height)
+            pixels[x, y] = 0 if pixels[x, y] > 127 else 255
+    return image, '\n'.join(lines)
+
+
+def generate_corpus(target_dir: Path, spec: CorpusSpec | None = None) -> list[CorpusDocument]:
+    """Render a deterministic set of PDFs (one per variant) with known ground truth."""
+    spec = spec or CorpusSpec()
+    target_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(spec.seed)
+    documents = []
+
+    for language, dpi, skew, noise in product(spec.languages, spec.dpis, spec.skews, spec.noise_levels):
+        base_text = SAMPLE_TEXTS[language]
+        images, truths = [], []
+        for page in range(spec.pages):
+            text = f'{page + 1}. {base_text} {base_text}'
+            image, truth = _render_page(text, dpi, skew, noise, rng)
+            images.append(image)
+            truths.append(truth)
+
+        path = target_dir / f'{language}-{dpi}dpi-skew{skew:g}-noise{noise:g}.pdf'
+        images[0].save(path, 'PDF', resolution=dpi, save_all=True, append_images=images[1:])
+        documents.append(
+            CorpusDocument(path, language, dpi, skew, noise, spec.pages, '\n'.join(truths))
+        )
+    return documents
+
+
+def available_engines() -> list[str]:
+    from .models import PortalSettings
+
+    engines = []
+    try:
+        import ocrmypdf  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        engines.append(PortalSettings.OcrEngine.OCRMYPDF.value)
+    if PortalSettings.docling_available():
+        engines.append(PortalSettings.OcrEngine.DOCLING.value)
+    return engines
+
+
+def _run_ocrmypdf(document: CorpusDocument, preset: dict, work_dir: Path) -> tuple[str, int]:
+    """Run one document and return the recognised text and the DPI Tesseract worked at."""
+    import ocrmypdf
+
+    from .views import _ocrmypdf_kwargs
+
+    output_path = work_dir / 'output.pdf'
+    sidecar_path = work_dir / 'sidecar.txt'
+    options = {**preset, 'force_ocr': True, 'skip_text': False, 'output_type': 'pdf'}
+    kwargs = _ocrmypdf_kwargs(options, document.language)
+    input_path = document.path
+    ocr_dpi = document.dpi
+    plan = None
+    if preset.get('adaptive_dpi'):
+        from .resolution import plan_resolution, tesseract_downsample_supported
+
+        plan = plan_resolution(document.path, document.dpi)
+        if plan is not None and plan.reduced:
+            if preset.get('preprocess') == 'opencv' or tesseract_downsample_supported():
+                ocr_dpi = plan.dpi
+    if preset.get('preprocess') == 'opencv':
+        from .preprocess import PreprocessOptions, preprocess_pdf
+
+        input_path = work_dir / 'preprocessed.pdf'
+        preprocess_options = PreprocessOptions.from_job_options(options, dpi=ocr_dpi)
+        preprocess_options.bitonal = plan is not None and plan.mode == 'bitonal'
+        preprocess_pdf(document.path, input_path, preprocess_options)
+        kwargs.update(deskew=False, remove_background=False, clean_final=False)
+    elif plan is not None:
+        kwargs.update(plan.ocrmypdf_kwargs())
+        if 'portal_ocr_colour' in kwargs:
+            kwargs['plugins'] = ['portal.ocrmypdf_plugin']
+    ocrmypdf.ocr(str(input_path), str(output_path), sidecar=str(sidecar_path), **kwargs)
+    return sidecar_path.read_text(encoding='utf-8', errors='ignore'), ocr_dpi
+
+
+def _run_docling(document: CorpusDocument, preset: dict, work_dir: Path) -> tuple[str, int]:
+    from .views import _docling_text
+    from .warmup import docling_converter
+
+    # Docling rasterises at its own fixed scale; its pixel count is not comparable.
+    if not preset.get('bounded'):
+        result = docling_converter().convert(str(document.path))
+        return _docling_text(result.document), 0
+
+    from .bounded import convert_in_windows
+
+    sidecar_path = work_dir / 'sidecar.txt'
+    with sidecar_path.open('w', encoding='utf-8') as sidecar:
+        convert_in_windows(
+            docling_converter(),
+            document.path,
+            document.pages,
+            lambda window, result: sidecar.write(_docling_text(result.document) + '\n'),
+        )
+    return sidecar_path.read_text(encoding='utf-8'), 0
+
+
+ENGINE_RUNNERS = {
+    'ocrmypdf': _run_ocrmypdf,
+    'docling': _run_docling,
+}
+
+
+def isolated_peak_rss_kb(engine: str, preset_name: str, document: CorpusDocument) -> int:
+    """
+    Peak RSS of one run in a fresh interpreter, so the figure is not inflated by
+    models or earlier documents already loaded into this process.
+    """
+    code = (
+        'import sys, django; django.setup(); '
+        'from portal.benchmark import _run_isolated; _run_isolated(*sys.argv[1:])'
+    )
+    arguments = [engine, preset_name, str(document.path), document.language, str(document.dpi), str(document.pages)]
+    process = subprocess.Popen(
+        [sys.executable, '-c', code, *arguments],
+        cwd=settings.BASE_DIR,
+        env={'DJANGO_SETTINGS_MODULE': 'ocrsite.settings', **os.environ},
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f'{engine}/{preset_name} failed on {document.path.name} (exit {process.returncode}).')
+    return usage.ru_maxrss
+
+
+def _run_isolated(engine: str, preset_name: str, path: str, language: str, dpi: str, pages: str) -> None:
+    document = CorpusDocument(Path(path), language, int(dpi), 0.0, 0.0, int(pages), '')
+    run_document(engine, preset_name, document)
+
+
+def run_document(engine: str, preset_name: str, document: CorpusDocument) -> tuple[float, str, int]:
+    runner = ENGINE_RUNNERS[engine]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        started = time.perf_counter()
+        text, ocr_dpi = runner(document, OPTION_PRESETS[preset_name], Path(temp_dir))
+        return time.perf_counter() - started, text, ocr_dpi
+
+
+def run_benchmark(
+    documents: list[CorpusDocument],
+    engines: list[str],
+    presets: list[str],
+) -> list[BenchResult]:
+    results = []
+    for engine in engines:
+        # Docling ignores the OCRmyPDF presets; a single pass per mode is representative.
+        if engine == 'ocrmypdf':
+            engine_presets = [name for name in presets if name not in DOCLING_PRESETS[1:]]
+        else:
+            engine_presets = [name for name in presets if name in DOCLING_PRESETS] or ['default']
+        for preset_name in engine_presets:
+            bench = BenchResult(engine=engine, preset=preset_name)
+            measured = []
+            for document in documents:
+                try:
+                    elapsed, text, ocr_dpi = run_document(engine, preset_name, document)
+                except Exception:  # noqa: BLE001 - record and continue with the corpus
+                    log.exception('Benchmark run failed for %s (%s, %s)', document.path.name, engine, preset_name)
+                    bench.failures += 1
+                    continue
+                measured.append(document)
+                bench.documents += 1
+                bench.pages += document.pages
+                bench.seconds += elapsed
+                bench.latencies.append(elapsed)
+                bench.accuracies.append(char_accuracy(document.ground_truth, text))
+                bench.ocr_megapixels += document.pages * PAGE_INCHES[0] * PAGE_INCHES[1] * ocr_dpi**2 / 1e6
+            if measured:
+                # The timed runs share this process (and its loaded models), so its
+                # high-water mark says nothing about one job; rerun the largest
+                # document on its own instead.
+                largest = max(measured, key=lambda document: document.dpi**2 * document.pages)
+                try:
+                    bench.peak_rss_kb = isolated_peak_rss_kb(engine, preset_name, largest)
+                except RuntimeError:
+                    log.exception('Isolated memory run failed for %s (%s, %s)', largest.path.name, engine, preset_name)
+            results.append(bench)
+    return results
+
+
+def build_report(results: list[BenchResult], spec: CorpusSpec) -> dict:
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus': asdict(spec),
+        'results': [result.summary() for result in results],
+    }
+
+
+def compare_reports(current: dict, baseline: dict) -> list[dict]:
+    baseline_rows = {(row['engine'], row['preset']): row for row in baseline.get('results', [])}
+    rows = []
+    for row in current.get('results', []):
+        previous = baseline_rows.get((row['engine'], row['preset']))
+        if previous is None:
+            continue
+        rows.append(
+            {
+                'engine': row['engine'],
+                'preset': row['preset'],
+                'pages_per_second': _relative(row['pages_per_second'], previous['pages_per_second']),
+                'latency_p95': _relative(row['latency_p95'], previous['latency_p95']),
+                'char_accuracy': round(row['char_accuracy'] - previous['char_accuracy'], 4),
+                'ocr_megapixels': _relative(row.get('ocr_megapixels', 0.0), previous.get('ocr_megapixels', 0.0)),
+            }
+        )
+    return rows
+
+
+def _relative(current: float, previous: float) -> float | None:
+    if not previous:
+        return None
+    return round((current - previous) / previous, 4)
+
+
+def load_report(path: Path) -> dict:
+    return json.loads(path.read_text(encoding='utf-8'))
@@ -0,0 +1,140 @@
+"""
+Memory-bounded processing for very large PDFs. Docling converts a document in one
+piece and keeps every page (images, layout, text) until the result is exported, so a
+2,000-page scan can exhaust a worker. Above ``OCR_BOUNDED_PAGES`` pages the document
+is converted in windows of ``OCR_BOUNDED_WINDOW`` pages instead: the caller stores each
+window's text, structure and PDF pages as a checkpoint (see ``portal.checkpoints``) and
+the window is dropped before the next one starts. Whenever the process RSS passes
+``OCR_JOB_MAX_RSS_MB`` the window is halved.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import gc
+import logging
+import os
+import resource
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import pikepdf
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+try:
+    _libc = ctypes.CDLL('libc.so.6')
+except OSError:  # pragma: no cover - non-glibc platforms
+    _libc = None
+
+
+@dataclass(slots=True)
+class Window:
+    # 1-based, inclusive, as Docling's ``page_range``.
+    start: int
+    end: int
+
+    @property
+    def pages(self) -> int:
+        return self.end - self.start + 1
+
+    def as_range(self) -> tuple[int, int]:
+        return self.start, self.end
+
+
+def page_count(path: Path) -> int:
+    """Page count read from the PDF structure; 0 when pikepdf cannot open it."""
+    try:
+        with pikepdf.open(path) as pdf:
+            return len(pdf.pages)
+    except pikepdf.PdfError:
+        return 0
+
+
+def enabled_for(pages: int) -> bool:
+    return bool(settings.OCR_BOUNDED_PAGES) and pages > settings.OCR_BOUNDED_PAGES
+
+
+def max_rss() -> int:
+    return settings.OCR_JOB_MAX_RSS_MB * _MB
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        resident = int(Path('/proc/self/statm').read_text().split()[1])
+    except (OSError, IndexError, ValueError):  # pragma: no cover - non-Linux platforms
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return resident * os.sysconf('SC_PAGE_SIZE')
+
+
+def release_memory() -> None:
+    """Collect the dropped window and hand freed heap pages back to the OS."""
+    gc.collect()
+    if _libc is not None:
+        _libc.malloc_trim(0)
+
+
+class WindowPlanner:
+    """Yields page windows, shrinking them when a window pushed RSS over the cap."""
+
+    def __init__(self, total: int, size: int | None = None, cap: int | None = None, start: int = 1) -> None:
+        self.total = total
+        self.start = start
+        self.size = max(1, size or settings.OCR_BOUNDED_WINDOW)
+        self.cap = cap if cap is not None else max_rss()
+        self.peak = 0
+
+    def __iter__(self):
+        start = self.start
+        while start <= self.total:
+            window = Window(start, min(self.total, start + self.size - 1))
+            yield window
+            self._observe(window)
+            start = window.end + 1
+
+    def _observe(self, window: Window) -> None:
+        # Measured before the collection: what the window actually needed.
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        release_memory()
+        if self.cap and rss > self.cap and self.size > 1:
+            self.size = max(1, self.size // 2)
+            log.warning(
+                'Pages %d-%d reached %d MB RSS (cap %d MB); continuing with %d-page windows.',
+                window.start,
+                window.end,
+                rss // _MB,
+                self.cap // _MB,
+                self.size,
+            )
+
+
+def convert_in_windows(
+    converter,
+    input_path: Path,
+    total: int,
+    handle: Callable[[Window, object], None],
+    size: int | None = None,
+    stage: Callable[[str], object] | None = None,
+    start: int = 1,
+) -> WindowPlanner:
+    """
+    Run ``converter.convert`` over ``input_path`` window by window, from page ``start``,
+    and pass each result to ``handle``; no reference to a result is kept once ``handle``
+    returns. ``stage`` is an optional ``JobTracer.stage``-like callable timing the
+    conversions.
+    """
+    stage = stage or (lambda name: nullcontext())
+    planner = WindowPlanner(total, size, start=start)
+    for window in planner:
+        with stage('ocr'):
+            result = converter.convert(str(input_path), page_range=window.as_range())
+        handle(window, result)
+        del result
+    return planner
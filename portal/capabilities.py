@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+from . import metrics
+from .constants import LANGUAGE_CHOICES
+
+log = logging.getLogger(__name__)
+
+# Parsed copy of the registry file, keyed by its mtime so each worker re-reads it
+# only after another process has written a new result.
+_loaded: tuple[float, dict] | None = None
+
+_TESSDATA_HEADER = re.compile(r'"(?P<path>[^"]+)"')
+
+
+def capabilities_path() -> Path:
+    return Path(getattr(settings, 'OCR_CAPABILITIES_PATH', Path(settings.DATA_DIR) / 'capabilities.json'))
+
+
+def load_registry() -> dict:
+    """
+    The capability registry: ``{'engines': {name: probe}, 'tesseract': {...}}``.
+    Reading it costs one ``stat`` unless another process rewrote the file.
+    """
+    global _loaded
+    path = capabilities_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return {}
+    if _loaded is None or _loaded[0] != mtime:
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            log.warning('Ignoring unreadable capabilities file %s.', path)
+            data = {}
+        _loaded = (mtime, data)
+    return _loaded[1]
+
+
+def load_probes() -> dict:
+    return load_registry().get('engines', {})
+
+
+def _update_registry(section: str, key: str | None, value: dict) -> None:
+    path = capabilities_path()
+    data = json.loads(json.dumps(load_registry()))
+    if key is None:
+        data[section] = value
+    else:
+        data.setdefault(section, {})[key] = value
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        temp.write_text(json.dumps(data, indent=2), encoding='utf-8')
+        os.replace(temp, path)
+    except OSError:
+        log.warning('Could not update %s in %s.', section, path, exc_info=True)
+
+
+def record_probe(
+    engine: str, ok: bool, version: str | None, error: str = '', seconds: float | None = None
+) -> None:
+    """Persist the outcome of a heavy engine validation for every worker to reuse."""
+    _update_registry(
+        'engines',
+        engine,
+        {
+            'ok': ok,
+            'version': version,
+            'checked_at': time.time(),
+            'error': error,
+            'warmup_seconds': round(seconds, 3) if seconds is not None else None,
+        },
+    )
+
+
+def _fresh_probe(engine: str) -> dict | None:
+    from .warmup import engine_version
+
+    probe = load_probes().get(engine)
+    if not probe or probe.get('version') != engine_version(engine):
+        return None
+    ttl = getattr(settings, 'OCR_ENGINE_PROBE_TTL', 86400)
+    if time.time() - probe.get('checked_at', 0) > ttl:
+        return None
+    return probe
+
+
+def docling_available() -> bool:
+    """
+    Cheap availability check for request paths: the package must be importable and the
+    last persisted validation (from warm-up or ``probe_engines``) must not have failed.
+    Without a fresh probe the engine is assumed usable; a failed job records the failure.
+    """
+    if importlib.util.find_spec('docling') is None:
+        return False
+    probe = _fresh_probe('docling')
+    metrics.record_cache('docling_probe', probe is not None)
+    if probe is None:
+        return True
+    return bool(probe['ok'])
+
+
+def _stat_key(path: str | None) -> list | None:
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_size, int(stat.st_mtime)]
+
+
+def _tesseract_fingerprint(tessdata: str | None) -> dict:
+    # Upgrading the binary or installing a traineddata file changes these stats, which
+    # is enough to detect a version change without spawning tesseract.
+    return {
+        'binary': _stat_key(shutil.which('tesseract')),
+        'tessdata': _stat_key(tessdata),
+    }
+
+
+def probe_tesseract(force: bool = False) -> dict:
+    """Tesseract version and installed traineddata, re-probed only when the install changed."""
+    cached = load_registry().get('tesseract')
+    if cached and not force and cached.get('fingerprint') == _tesseract_fingerprint(cached.get('tessdata')):
+        return cached
+
+    binary = shutil.which('tesseract')
+    info: dict = {'version': None, 'languages': [], 'tessdata': None, 'checked_at': time.time()}
+    if binary:
+        try:
+            version = subprocess.run(
+                [binary, '--version'], capture_output=True, text=True, timeout=30, check=False
+            )
+            langs = subprocess.run(
+                [binary, '--list-langs'], capture_output=True, text=True, timeout=30, check=False
+            )
+        except (OSError, subprocess.SubprocessError):
+            log.warning('Could not query tesseract.', exc_info=True)
+        else:
+            first_line = (version.stdout or version.stderr).splitlines()[:1]
+            info['version'] = first_line[0].split()[-1] if first_line else None
+            lines = (langs.stdout or langs.stderr).splitlines()
+            if lines:
+                header = _TESSDATA_HEADER.search(lines[0])
+                info['tessdata'] = header.group('path') if header else None
+                info['languages'] = sorted(line.strip() for line in lines[1:] if line.strip())
+    info['fingerprint'] = _tesseract_fingerprint(info['tessdata'])
+    _update_registry('tesseract', None, info)
+    return info
+
+
+def tesseract_languages() -> set[str] | None:
+    """Installed traineddata codes, or ``None`` when the registry has not been built yet."""
+    info = load_registry().get('tesseract')
+    if not info or not info.get('languages'):
+        return None
+    return set(info['languages'])
+
+
+def language_choices() -> list[tuple[str, str]]:
+    installed = tesseract_languages()
+    if installed is None:
+        return list(LANGUAGE_CHOICES)
+    return [(code, label) for code, label in LANGUAGE_CHOICES if code in installed]
+
+
+def missing_languages() -> list[str]:
+    installed = tesseract_languages()
+    if installed is None:
+        return []
+    return [code for code, _ in LANGUAGE_CHOICES if code not in installed]
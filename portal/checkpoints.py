@@ -0,0 +1,165 @@
+"""
+Page-range checkpoints for long OCR jobs. A job that dies half way (worker crash,
+deploy, OOM kill) used to start over from page one on its next attempt. When
+``OCR_CHECKPOINT_PAGES`` is set, documents with more pages than that are processed in
+chunks of that many pages (Docling's memory-bounded windows, see ``portal.bounded``, are
+chunks too), and every finished chunk is stored as a :class:`~portal.models.JobChunk`
+(its PDF pages, text and page structure) before the next one starts.
+
+A retried job keeps the chunks that cover its first pages without a gap and continues
+after the last one. The final assembly only reads stored chunks, so running it again
+after a crash gives the same files; the chunks are deleted once the job has ended.
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import pikepdf
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from . import media
+from .bounded import Window, page_count
+from .models import JobChunk, OcrJob
+from .ocrdata import PageReader, PageWords, write_pages
+
+log = logging.getLogger(__name__)
+
+
+def enabled_for(pages: int) -> bool:
+    return bool(settings.OCR_CHECKPOINT_PAGES) and pages > settings.OCR_CHECKPOINT_PAGES
+
+
+def plan(total: int, start: int = 1, size: int | None = None) -> list[Window]:
+    size = max(1, size or settings.OCR_CHECKPOINT_PAGES)
+    return [Window(first, min(total, first + size - 1)) for first in range(start, total + 1, size)]
+
+
+def completed(job: OcrJob, engine: str) -> list[JobChunk]:
+    """
+    Stored chunks a new attempt can reuse: those of ``engine`` that cover the document
+    from page 1 without a gap. Anything after a gap (or from another engine) is deleted.
+    """
+    usable: list[JobChunk] = []
+    next_page = 1
+    for chunk in job.chunks.order_by('first_page'):
+        if chunk.engine == engine and chunk.first_page == next_page:
+            usable.append(chunk)
+            next_page = chunk.last_page + 1
+        else:
+            # The files go with the row (see portal.signals).
+            chunk.delete()
+    if usable:
+        log.info('Job %s resumes after page %d (%d stored chunks).', job.id, next_page - 1, len(usable))
+    return usable
+
+
+def next_page(chunks: list[JobChunk]) -> int:
+    return chunks[-1].last_page + 1 if chunks else 1
+
+
+def extract(source: Path, window: Window, destination: Path) -> Path:
+    """Write the pages of ``window`` from the ``source`` PDF to ``destination``."""
+    with pikepdf.open(source) as pdf, pikepdf.new() as part:
+        part.pages.extend(pdf.pages[window.start - 1 : window.end])
+        part.save(destination)
+    return destination
+
+
+def shift_pages(pages: Iterable[PageWords], offset: int) -> Iterator[PageWords]:
+    """Renumber the pages of a chunk processed on its own (numbered from 1)."""
+    for page in pages:
+        page.page += offset
+        yield page
+
+
+def save(
+    job: OcrJob,
+    engine: str,
+    window: Window,
+    pdf_path: Path | None = None,
+    text_path: Path | None = None,
+    pages: Iterable[PageWords] = (),
+) -> JobChunk:
+    """
+    Store a finished chunk. Saving the same range again (an attempt that lost its
+    lease raced the new one) replaces the earlier row and its files.
+    """
+    chunk = JobChunk(job=job, engine=engine, first_page=window.start, last_page=window.end)
+    stem = f'{job.pk}-{window.start:06d}-{window.end:06d}'
+    if pdf_path is not None and pdf_path.exists():
+        with pdf_path.open('rb') as stream:
+            chunk.pdf_file.save(f'{stem}.pdf', File(stream), save=False)
+    if text_path is not None and text_path.exists():
+        with text_path.open('rb') as stream:
+            chunk.text_file.save(f'{stem}.txt', File(stream), save=False)
+    with tempfile.TemporaryFile() as buffer:
+        if write_pages(buffer, pages):
+            buffer.seek(0)
+            chunk.structure_file.save(f'{stem}.ocrpages', File(buffer), save=False)
+    # Files first, row last: a crash in between only leaves orphans for media_gc.
+    with transaction.atomic():
+        for stale in JobChunk.objects.select_for_update().filter(job=job, first_page=window.start):
+            stale.delete()
+        chunk.save()
+    return chunk
+
+
+def assemble(chunks: list[JobChunk], directory: Path, source: Path, total: int) -> int:
+    """
+    Join the stored chunks into ``directory/output.pdf`` and ``directory/sidecar.txt``;
+    returns the number of text bytes. The PDF keeps the document catalog (and so the
+    PDF/A metadata) of the first chunk; document-level parts of ``source`` (outline,
+    page labels, named destinations, forms, structure tree, /Info) are not carried
+    over, which is why chunking is opt-in. When some chunk has no PDF pages (Docling
+    may return none) the original ``source`` is copied instead.
+    """
+    output_path = directory / 'output.pdf'
+    with ExitStack() as stack:
+        parts = [
+            stack.enter_context(media.local_copy(chunk.pdf_file, directory, f'chunk-{chunk.first_page:06d}.pdf'))
+            for chunk in chunks
+            if chunk.pdf_file
+        ]
+        covered = sum(page_count(part) for part in parts)
+        if covered == total:
+            # Page objects are copied lazily, so the chunks are never all in memory.
+            opened = [stack.enter_context(pikepdf.open(part)) for part in parts]
+            for part in opened[1:]:
+                opened[0].pages.extend(part.pages)
+            opened[0].save(output_path)
+        else:
+            if parts:
+                log.warning('Chunks hold PDF output for %d of %d pages; keeping the original.', covered, total)
+            shutil.copyfile(source, output_path)
+
+    with (directory / 'sidecar.txt').open('wb') as sidecar:
+        for chunk in chunks:
+            if chunk.text_file:
+                with chunk.text_file.open('rb') as stream:
+                    shutil.copyfileobj(stream, sidecar)
+        return sidecar.tell()
+
+
+def structure_pages(chunks: list[JobChunk], directory: Path) -> Iterator[PageWords]:
+    """The stored pages of every chunk, in order, reading one chunk at a time."""
+    for chunk in chunks:
+        if not chunk.structure_file:
+            continue
+        with media.local_copy(chunk.structure_file, directory, 'chunk.ocrpages') as path, path.open('rb') as stream:
+            yield from PageReader(stream)
+
+
+def discard(job: OcrJob) -> int:
+    """Delete the chunks of a job that has ended."""
+    chunks = list(job.chunks.all())
+    for chunk in chunks:
+        chunk.delete()
+    return len(chunks)
@@ -0,0 +1,580 @@
+"""
+Output compression for processed PDFs, run after the job is already usable.
+
+Every scanned page image is rewritten according to its content:
+
+* bitonal pages become 1-bit images (JBIG2 when ``jbig2`` from jbig2enc is
+  installed, otherwise the smaller of CCITT G4 and Flate);
+* pages with text on a coloured or grey background are split MRC-style into a
+  downsampled JPEG background and a JPEG foreground shown through a full
+  resolution 1-bit text mask, wrapped in a form XObject that replaces the image;
+* photos are re-encoded as JPEG at the lowest quality that keeps the target PSNR.
+
+The compressed file is checked (it opens and has every page) before the processed
+file and its library copies are swapped; the original is kept until the swapped file
+has been read back. The before/after sizes are kept in ``OcrJob.options['compression']``.
+
+Compression holds a governor unit like an OCR job, so it never runs beside a full OCR
+load. A job left ``running`` by a process that died is put back in the queue after
+``OCR_COMPRESSION_STALE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import governor, media, metrics, preprocess, resolution, tiering
+from .governor import GovernorBusy
+from .models import OcrJob, StoredDocument
+from .preprocess import cv2, np
+
+log = logging.getLogger(__name__)
+
+# Images smaller than this (logos, thumbnails) are not worth re-encoding.
+_MIN_PIXELS = 250_000
+_JPEG_QUALITIES = (85, 75, 65, 55, 45, 35)
+# Pages are classified on a copy about as wide as A4 at the analysis DPI.
+_ANALYSIS_WIDTH = 1240
+# Scan resolution assumed when sizing the binarisation filter; the image DPI is unknown here.
+_SCAN_DPI = 300
+# Share of dark pixels above which a page is treated as a picture rather than text.
+_MAX_TEXT_INK = 0.3
+# Lab chroma (OpenCV 8-bit units) above which the paper or the ink of a page counts as
+# coloured: cream or beige paper and blue or red ink keep their colours (MRC).
+_PAPER_TINT = 6.0
+_INK_TINT = 12.0
+_FORM_CONTENT = b'q /Bg Do Q q /Fg Do Q'
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class CompressionReport:
+    before: int = 0
+    after: int = 0
+    images: Counter = field(default_factory=Counter)
+    encoder: str = ''
+    pages: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            'before': self.before,
+            'after': self.after,
+            'images': dict(self.images),
+            'encoder': self.encoder,
+        }
+
+
+def available() -> bool:
+    if not preprocess.OPENCV_AVAILABLE:
+        return False
+    try:
+        import pikepdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _jbig2_binary() -> str | None:
+    return shutil.which('jbig2')
+
+
+def _decode_image(raw) -> 'np.ndarray | None':
+    """RGB or greyscale 8-bit array for a plain scanned image, ``None`` to leave it alone."""
+    import pikepdf
+
+    if raw.get('/ImageMask') or '/SMask' in raw or '/Mask' in raw:
+        return None
+    if int(raw.get('/BitsPerComponent', 8)) != 8:
+        return None
+    if int(raw.get('/Width', 0)) * int(raw.get('/Height', 0)) < _MIN_PIXELS:
+        return None
+    try:
+        image = pikepdf.PdfImage(raw).as_pil_image()
+    except Exception:  # noqa: BLE001 - unsupported filters or colour spaces stay as they are
+        return None
+    if image.mode not in ('L', 'RGB'):
+        return None
+    return np.asarray(image)
+
+
+def _tinted(bgr: 'np.ndarray', gray: 'np.ndarray') -> bool:
+    """
+    Whether the paper or the ink has a colour. Pale paper and thin strokes are too
+    unsaturated (or too few) for ``resolution.colour_mode`` to call the page colour.
+    """
+    lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB).astype(np.float32)
+    chroma = np.hypot(lab[:, :, 1] - 128, lab[:, :, 2] - 128)
+    _, paper = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    paper = paper.astype(bool)
+    if paper.any() and float(chroma[paper].mean()) > _PAPER_TINT:
+        return True
+    return bool((~paper).any()) and float(np.median(chroma[~paper])) > _INK_TINT
+
+
+def classify(array: 'np.ndarray') -> str:
+    """``bitonal``, ``mrc`` (text on a background) or ``photo``."""
+    scale = min(1.0, _ANALYSIS_WIDTH / array.shape[1])
+    conversion = cv2.COLOR_GRAY2BGR if array.ndim == 2 else cv2.COLOR_RGB2BGR
+    # Averaging would turn the edges of black-on-white text into mid-tones, so the
+    # bitonal test only looks at pixel values taken from the scan as they are.
+    picked = cv2.resize(array, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+    picked = cv2.cvtColor(picked, conversion)
+    if resolution.colour_mode(picked) == 'bitonal' and (
+        array.ndim == 2 or not _tinted(picked, cv2.cvtColor(picked, cv2.COLOR_BGR2GRAY))
+    ):
+        return 'bitonal'
+    sample = cv2.resize(array, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    bgr = cv2.cvtColor(sample, conversion)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    if ink.mean() > _MAX_TEXT_INK:
+        # Otsu splits photos roughly in half; printed pages are mostly paper.
+        return 'photo'
+    return 'mrc' if resolution.estimate_x_height(gray, resolution.ANALYSIS_DPI) else 'photo'
+
+
+def _gray(array: 'np.ndarray') -> 'np.ndarray':
+    return array if array.ndim == 2 else cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+
+
+def _ccitt_g4(paper: 'np.ndarray') -> bytes | None:
+    """
+    CCITT G4 data for ``paper`` (True = white) as ``BlackIs1=false`` expects it. The
+    fax coder writes set bits as black runs, so the ink is passed in as the set bits.
+    """
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    ink = Image.fromarray(~paper)
+    ink.save(buffer, 'TIFF', compression='group4', tiffinfo={278: paper.shape[0]})
+    with Image.open(io.BytesIO(buffer.getvalue())) as tiff:
+        offsets, counts = tiff.tag_v2.get(273), tiff.tag_v2.get(279)
+    if not offsets or len(offsets) != 1:
+        return None
+    return buffer.getvalue()[offsets[0]:offsets[0] + counts[0]]
+
+
+def _jbig2(paper: 'np.ndarray', binary: str) -> bytes | None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / 'mask.png'
+        cv2.imwrite(str(path), paper.astype(np.uint8) * 255, [cv2.IMWRITE_PNG_BILEVEL, 1])
+        result = subprocess.run([binary, '-p', str(path)], capture_output=True, timeout=120)
+    if result.returncode != 0 or not result.stdout:
+        log.debug('jbig2 failed: %s', result.stderr.decode('utf-8', 'ignore'))
+        return None
+    return result.stdout
+
+
+def _bilevel_stream(pdf, paper: 'np.ndarray', report: CompressionReport, image_mask: bool = False):
+    """1-bit image of ``paper`` (True = white). As an image mask, black (0) is painted."""
+    import pikepdf
+    from pikepdf import Array, Dictionary, Name
+
+    height, width = paper.shape
+    stream = None
+    binary = _jbig2_binary()
+    if binary:
+        data = _jbig2(paper, binary)
+        if data is not None:
+            stream = pikepdf.Stream(pdf, data)
+            stream.Filter = Name.JBIG2Decode
+            report.encoder = 'jbig2'
+    if stream is None:
+        flate = zlib.compress(np.packbits(paper, axis=1).tobytes(), 9)
+        g4 = _ccitt_g4(paper)
+        if g4 is not None and len(g4) < len(flate):
+            stream = pikepdf.Stream(pdf, g4)
+            stream.Filter = Name.CCITTFaxDecode
+            stream.DecodeParms = Dictionary(K=-1, Columns=width, Rows=height, BlackIs1=False)
+            report.encoder = report.encoder or 'ccitt'
+        else:
+            stream = pikepdf.Stream(pdf, flate)
+            stream.Filter = Name.FlateDecode
+            report.encoder = report.encoder or 'flate'
+    stream.Type = Name.XObject
+    stream.Subtype = Name.Image
+    stream.Width = width
+    stream.Height = height
+    stream.BitsPerComponent = 1
+    if image_mask:
+        stream.ImageMask = True
+        stream.Decode = Array([0, 1])
+    else:
+        stream.ColorSpace = Name.DeviceGray
+    return stream
+
+
+def encode_jpeg(array: 'np.ndarray', target_psnr: float) -> bytes:
+    """Lowest quality in ``_JPEG_QUALITIES`` whose PSNR stays at or above ``target_psnr``."""
+    image = array if array.ndim == 2 else cv2.cvtColor(array, cv2.COLOR_RGB2BGR)
+    best = None
+    for quality in _JPEG_QUALITIES:
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            break
+        decoded = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+        if best is not None and cv2.PSNR(image, decoded) < target_psnr:
+            break
+        best = encoded
+    return best.tobytes()
+
+
+def _jpeg_stream(pdf, array: 'np.ndarray', target_psnr: float):
+    import pikepdf
+    from pikepdf import Name
+
+    stream = pikepdf.Stream(pdf, encode_jpeg(array, target_psnr))
+    stream.Type = Name.XObject
+    stream.Subtype = Name.Image
+    stream.Filter = Name.DCTDecode
+    stream.Width = array.shape[1]
+    stream.Height = array.shape[0]
+    stream.BitsPerComponent = 8
+    stream.ColorSpace = Name.DeviceGray if array.ndim == 2 else Name.DeviceRGB
+    return stream
+
+
+def _layer_average(array: 'np.ndarray', weight: 'np.ndarray', factor: int, fill: int) -> 'np.ndarray':
+    """Downsample ``array`` by ``factor`` averaging only pixels where ``weight`` is set."""
+    size = (max(1, array.shape[1] // factor), max(1, array.shape[0] // factor))
+    weight = weight.astype(np.float32)
+    values = array.astype(np.float32)
+    if values.ndim == 3:
+        weighted = values * weight[:, :, None]
+    else:
+        weighted = values * weight
+    total = cv2.resize(weighted, size, interpolation=cv2.INTER_AREA)
+    share = cv2.resize(weight, size, interpolation=cv2.INTER_AREA)
+    if total.ndim == 3:
+        share = share[:, :, None]
+    layer = np.where(share > 1e-3, total / np.maximum(share, 1e-3), fill)
+    return np.clip(layer, 0, 255).astype(np.uint8)
+
+
+def _mrc_form(pdf, array: 'np.ndarray', report: CompressionReport):
+    import pikepdf
+    from pikepdf import Array, Dictionary, Name
+
+    paper = preprocess.binarise(_gray(array), _SCAN_DPI) > 0
+    ink = ~paper
+    target = settings.OCR_COMPRESSION_JPEG_PSNR
+    background = _layer_average(array, paper, settings.OCR_COMPRESSION_BACKGROUND_SCALE, 255)
+    foreground = _layer_average(array, ink, settings.OCR_COMPRESSION_BACKGROUND_SCALE * 2, 0)
+
+    bg = pdf.make_indirect(_jpeg_stream(pdf, background, target))
+    fg = _jpeg_stream(pdf, foreground, target)
+    fg.Mask = pdf.make_indirect(_bilevel_stream(pdf, paper, report, image_mask=True))
+    fg = pdf.make_indirect(fg)
+
+    form = pikepdf.Stream(pdf, _FORM_CONTENT)
+    form.Type = Name.XObject
+    form.Subtype = Name.Form
+    form.BBox = Array([0, 0, 1, 1])
+    form.Resources = Dictionary(XObject=Dictionary(Bg=bg, Fg=fg))
+    return form
+
+
+def _rewrite_image(pdf, raw, report: CompressionReport):
+    array = _decode_image(raw)
+    if array is None:
+        report.images['kept'] += 1
+        return None
+    kind = classify(array)
+    report.images[kind] += 1
+    if kind == 'bitonal':
+        return _bilevel_stream(pdf, preprocess.binarise(_gray(array), _SCAN_DPI) > 0, report)
+    if kind == 'mrc':
+        return _mrc_form(pdf, array, report)
+    return _jpeg_stream(pdf, array, settings.OCR_COMPRESSION_JPEG_PSNR)
+
+
+def _compressed_size(stream) -> int:
+    try:
+        return len(stream.read_raw_bytes())
+    except Exception:  # noqa: BLE001
+        return 0
+
+
+def _form_size(form) -> int:
+    resources = form.Resources.XObject
+    fg = resources.Fg
+    return sum(_compressed_size(item) for item in (resources.Bg, fg, fg.Mask))
+
+
+def compress_pdf(source: Path, destination: Path) -> CompressionReport:
+    """Rewrite the page images of ``source`` into ``destination``."""
+    import pikepdf
+    from pikepdf import Name
+
+    report = CompressionReport(before=source.stat().st_size)
+    replaced: dict[tuple[int, int], object] = {}
+    with pikepdf.open(source) as pdf:
+
+        def visit(resources, depth: int = 0) -> None:
+            xobjects = resources.get('/XObject') if resources is not None else None
+            if xobjects is None or depth > 8:
+                return
+            for key in list(xobjects.keys()):
+                item = xobjects[key]
+                if item.get('/Subtype') == Name.Form:
+                    visit(item.get('/Resources'), depth + 1)
+                    continue
+                if item.get('/Subtype') != Name.Image:
+                    continue
+                identity = item.objgen
+                if identity not in replaced:
+                    replacement = _rewrite_image(pdf, item, report)
+                    if replacement is not None:
+                        new_size = (
+                            _form_size(replacement)
+                            if replacement.get('/Subtype') == Name.Form
+                            else _compressed_size(replacement)
+                        )
+                        if new_size >= _compressed_size(item):
+                            replacement = None
+                    replaced[identity] = pdf.make_indirect(replacement) if replacement is not None else None
+                if replaced[identity] is not None:
+                    xobjects[key] = replaced[identity]
+
+        for page in pdf.pages:
+            visit(page.obj.get('/Resources'))
+        report.pages = len(pdf.pages)
+        pdf.save(destination)
+    report.after = destination.stat().st_size
+    return report
+
+
+def _verify(path: Path, pages: int) -> None:
+    """Raise ``RuntimeError`` unless ``path`` is a PDF with ``pages`` pages."""
+    import pikepdf
+
+    try:
+        with pikepdf.open(path) as pdf:
+            found = len(pdf.pages)
+    except pikepdf.PdfError as exc:
+        raise RuntimeError(f'Compressed PDF {path.name} cannot be opened: {exc}') from exc
+    if found != pages:
+        raise RuntimeError(f'Compressed PDF {path.name} has {found} pages instead of {pages}.')
+
+
+def _swap(field_file, compressed: Path, pages: int) -> None:
+    """
+    Replace the stored file with ``compressed``. On local storage the new bytes are
+    written next to the target and renamed over it, so readers see either version.
+    The original is kept until the swapped file has been read back, and put back if
+    that fails.
+    """
+    target = media.local_path(field_file.storage, field_file.name)
+    if target is not None:
+        staging = target.with_name(f'.{target.name}.compressed')
+        backup = target.with_name(f'.{target.name}.original')
+        shutil.copyfile(compressed, staging)
+        backup.unlink(missing_ok=True)
+        try:
+            os.link(target, backup)
+        except OSError:  # no hard links on this filesystem
+            shutil.copyfile(target, backup)
+        try:
+            os.replace(staging, target)
+            _verify(target, pages)
+        except Exception:
+            os.replace(backup, target)
+            raise
+        backup.unlink()
+        return
+    previous = field_file.name
+    with compressed.open('rb') as stream:
+        field_file.save(Path(previous).name, stream, save=False)
+    if field_file.name == previous:
+        # Storage that overwrote in place; nothing older is left to fall back on.
+        field_file.instance.save(update_fields=[field_file.field.name])
+        return
+    if field_file.storage.size(field_file.name) != compressed.stat().st_size:
+        field_file.storage.delete(field_file.name)
+        field_file.name = previous
+        raise RuntimeError(f'Compressed copy of {previous} was not stored completely.')
+    field_file.instance.save(update_fields=[field_file.field.name])
+    field_file.storage.delete(previous)
+
+
+def _update_state(job_id, **values) -> None:
+    with transaction.atomic():
+        job = OcrJob.objects.select_for_update().filter(pk=job_id).first()
+        if job is None:
+            return
+        options = job.options or {}
+        options['compression'] = {**(options.get('compression') or {}), **values}
+        job.options = options
+        job.save(update_fields=['options'])
+
+
+def _stale(state: dict) -> bool:
+    return (state.get('started_at') or 0) < time.time() - settings.OCR_COMPRESSION_STALE_SECONDS
+
+
+def _start(job_id) -> bool:
+    """Mark the job ``running`` unless another process is compressing it right now."""
+    with transaction.atomic():
+        job = OcrJob.objects.select_for_update().filter(pk=job_id).first()
+        if job is None:
+            return False
+        options = job.options or {}
+        state = options.get('compression') or {}
+        if state.get('status') == 'running' and not _stale(state):
+            return False
+        options['compression'] = {**state, 'status': 'running', 'started_at': time.time()}
+        job.options = options
+        job.save(update_fields=['options'])
+    return True
+
+
+def compress_job(job_id) -> dict | None:
+    """
+    Compress the processed PDF of a completed job; returns the stored report. Raises
+    :class:`GovernorBusy` (the job stays pending) when no governor unit frees up.
+    """
+    job = OcrJob.objects.filter(pk=job_id, status=OcrJob.Status.COMPLETED).first()
+    if job is None or not job.processed_file:
+        return None
+    try:
+        with governor.admit('compression'), tempfile.TemporaryDirectory() as temp_dir:
+            if not _start(job.id):
+                log.info('Job %s is already being compressed.', job.id)
+                return None
+            started = time.perf_counter()
+            output = Path(temp_dir) / 'output.pdf'
+            tiering.ensure_hot(job.processed_file)
+            with media.local_copy(job.processed_file, Path(temp_dir)) as source:
+                report = compress_pdf(source, output)
+            state = report.as_dict()
+            saving = 1 - report.after / report.before if report.before else 0.0
+            if not OcrJob.objects.filter(pk=job.id).exists():
+                # Deleted while compressing; writing the file back would orphan it.
+                return None
+            if saving >= settings.OCR_COMPRESSION_MIN_SAVING:
+                _verify(output, report.pages)
+                _swap(job.processed_file, output, report.pages)
+                copies = StoredDocument.objects.filter(ocr_job=job).exclude(processed_file='')
+                for document in copies:
+                    # Archived copies are left alone; their storage no longer holds the file.
+                    stored = document.processed_file
+                    if stored.storage.exists(stored.name) and stored.size == report.before:
+                        _swap(document.processed_file, output, report.pages)
+                state['status'] = 'done'
+            else:
+                state.update(status='skipped', after=report.before)
+    except GovernorBusy:
+        raise
+    except Exception as exc:  # noqa: BLE001 - the uncompressed output stays usable
+        log.exception('Compression failed for job %s', job.id)
+        _update_state(job.id, status='failed', error=str(exc))
+        return None
+    state['seconds'] = round(time.perf_counter() - started, 3)
+    _update_state(job.id, **state)
+    metrics.record_compression(state['before'], state['after'])
+    log.info('Compressed job %s: %d -> %d bytes (%s).', job.id, state['before'], state['after'], state['status'])
+    return state
+
+
+def _compress_in_background(job_id) -> None:
+    try:
+        while True:
+            try:
+                compress_job(job_id)
+            except GovernorBusy:
+                # OCR jobs hold every unit; this thread has nothing better to do than wait.
+                continue
+            break
+    except Exception:  # noqa: BLE001
+        log.exception('Background compression crashed for job %s', job_id)
+    finally:
+        connection.close()
+
+
+def _background_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OCR_COMPRESSION_WORKERS, thread_name_prefix='portal-compress'
+            )
+        return _executor
+
+
+def schedule(job: OcrJob) -> bool:
+    """
+    Mark a completed job for compression. With ``OCR_COMPRESSION=background`` it runs
+    on a thread of this process; with ``queue`` it waits for ``manage.py compress_outputs``.
+    """
+    mode = settings.OCR_COMPRESSION
+    if mode not in {'background', 'queue'} or not available() or not job.processed_file:
+        return False
+    job.options = {**(job.options or {}), 'compression': {'status': 'pending'}}
+    job.save(update_fields=['options'])
+    if mode == 'background':
+        transaction.on_commit(lambda: _background_executor().submit(_compress_in_background, job.id))
+    return True
+
+
+def pending_jobs():
+    return OcrJob.objects.filter(
+        status=OcrJob.Status.COMPLETED, options__compression__status='pending'
+    ).order_by('created_at')
+
+
+def requeue_stale() -> int:
+    """Put jobs left ``running`` by a process that died mid-compression back in the queue."""
+    running = OcrJob.objects.filter(
+        status=OcrJob.Status.COMPLETED, options__compression__status='running'
+    ).values_list('id', 'options')
+    requeued = 0
+    for job_id, options in running:
+        if _stale(options['compression']):
+            log.warning('Compression of job %s was interrupted; queueing it again.', job_id)
+            _update_state(job_id, status='pending')
+            requeued += 1
+    return requeued
+
+
+def summarize(options_list) -> dict | None:
+    """Total before/after bytes over an iterable of ``OcrJob.options``."""
+    jobs = before = after = 0
+    for options in options_list:
+        state = (options or {}).get('compression') or {}
+        if state.get('status') not in {'done', 'skipped'}:
+            continue
+        jobs += 1
+        before += state.get('before') or 0
+        after += state.get('after') or 0
+    if not jobs:
+        return None
+    return {
+        'jobs': jobs,
+        'before': before,
+        'after': after,
+        'saved': before - after,
+        'ratio': round(after / before, 3) if before else None,
+    }
+
+
+def library_summary(folder) -> dict | None:
+    return summarize(
+        OcrJob.objects.filter(documents__folder=folder).values_list('options', flat=True)
+    )
@@ -26,6 +26,7 @@ MENU_CHOICES = [
 OCR_ENGINE_CHOICES = [
     ('ocrmypdf', 'OCRmyPDF'),
     ('docling', 'Docling'),
+    ('auto', 'Rutare adaptivă'),
 ]
 
 
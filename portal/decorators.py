@@ -2,41 +2,65 @@ from __future__ import annotations
 
 from functools import wraps
 
+from asgiref.sync import iscoroutinefunction
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from .models import PortalAccess
 
 
+def _denied_response(request, user, access, menu_key):
+    home_url = reverse('portal:home')
+    if access is None:
+        messages.error(
+            request,
+            'Contul tău nu este încă înregistrat în portal. Trimite o solicitare de acces.',
+        )
+        return redirect(home_url)
+    if access.status != PortalAccess.Status.APPROVED and not user.is_staff:
+        messages.warning(
+            request,
+            'Solicitarea ta este în așteptare sau a fost revocată. Contactează administratorul.',
+        )
+        return redirect(home_url)
+    if menu_key and menu_key not in access.allowed_menus and not user.is_staff:
+        messages.error(
+            request,
+            'Nu ai permisiunea de a accesa acest modul. Te rugăm să contactezi administratorul.',
+        )
+        return redirect(home_url)
+    return None
+
+
 def portal_menu_required(menu_key: str | None = None):
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def _async_wrapped(request, *args, **kwargs):
+                user = await request.auser()
+                if not user.is_authenticated:
+                    return redirect_to_login(request.get_full_path())
+                access, _ = await PortalAccess.objects.aget_or_create(user=user)
+                denied = _denied_response(request, user, access, menu_key)
+                if denied is not None:
+                    return denied
+                return await view_func(request, *args, **kwargs)
+
+            return _async_wrapped
+
         @login_required
         @wraps(view_func)
         def _wrapped(request, *args, **kwargs):
             access = getattr(request.user, 'portal_access', None)
             if access is None:
                 access, _ = PortalAccess.objects.get_or_create(user=request.user)
-            home_url = reverse('portal:home')
-            if access is None:
-                messages.error(
-                    request,
-                    'Contul tău nu este încă înregistrat în portal. Trimite o solicitare de acces.',
-                )
-                return redirect(home_url)
-            if access.status != PortalAccess.Status.APPROVED and not request.user.is_staff:
-                messages.warning(
-                    request,
-                    'Solicitarea ta este în așteptare sau a fost revocată. Contactează administratorul.',
-                )
-                return redirect(home_url)
-            if menu_key and menu_key not in access.allowed_menus and not request.user.is_staff:
-                messages.error(
-                    request,
-                    'Nu ai permisiunea de a accesa acest modul. Te rugăm să contactezi administratorul.',
-                )
-                return redirect(home_url)
+            denied = _denied_response(request, request.user, access, menu_key)
+            if denied is not None:
+                return denied
             return view_func(request, *args, **kwargs)
 
         return _wrapped
@@ -7,6 +7,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.core.validators import FileExtensionValidator
 
+from .capabilities import language_choices
 from .constants import FOLDER_COLOR_CHOICES, LANGUAGE_CHOICES, MENU_CHOICES
 from .models import LibraryFolder, PortalAccess, PortalSettings, StoredDocument, WordDocument
 from .widgets import ToggleCheckboxSelectMultiple, ToggleSwitchInput
@@ -130,6 +131,7 @@ class OcrRequestForm(forms.Form):
                 'accept': 'application/pdf',
             }
         )
+        self.fields['languages'].choices = language_choices()
         self.fields['languages'].widget.attrs.update({'class': 'input-control', 'size': '8'})
         for name in (
             'optimize_level',
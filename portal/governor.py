@@ -0,0 +1,179 @@
+"""
+Resource governor for OCR jobs. The container's cgroup CPU quota and memory limit are
+split into *units* of ``OCR_JOB_CPUS`` CPUs and ``OCR_JOB_MEMORY_MB`` of memory. Every
+job holds units while its engine runs (Docling, with its models in memory, needs
+more than one) and is told exactly how many CPUs it may use: OCRmyPDF's ``jobs``,
+Docling's thread count, and the OpenMP/BLAS/OpenCV thread pools of the process.
+
+Units are lock files under ``OCR_GOVERNOR_DIR`` taken with ``flock``, so gunicorn
+workers, their threads and local ``ocr_worker`` processes share one budget, and a
+crashed process releases its units automatically. Jobs that do not fit wait for
+admission instead of oversubscribing the container.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator
+
+from django.conf import settings
+
+from ocrsite import cgroup
+
+log = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+_POLL_SECONDS = 0.5
+# Native thread pools size themselves from the host CPU count unless told otherwise.
+THREAD_ENV = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+class GovernorBusy(RuntimeError):
+    """No units were free within ``OCR_GOVERNOR_WAIT_SECONDS``; the job may run later."""
+
+
+@dataclass(slots=True)
+class Capacity:
+    cpus: int
+    memory: int | None
+    job_cpus: int
+    units: int
+
+
+@dataclass(slots=True)
+class Budget:
+    engine: str
+    cpus: int
+    units: int
+    waited: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {'engine': self.engine, 'cpus': self.cpus, 'units': self.units, 'waited': round(self.waited, 3)}
+
+
+def capacity() -> Capacity:
+    cpus = settings.OCR_GOVERNOR_CPUS or cgroup.cpu_count()
+    job_cpus = max(1, min(cpus, settings.OCR_JOB_CPUS or cpus))
+    units = max(1, cpus // job_cpus)
+    memory = cgroup.memory_limit()
+    if memory:
+        usable = memory - settings.OCR_GOVERNOR_RESERVE_MB * _MB
+        units = max(1, min(units, usable // (settings.OCR_JOB_MEMORY_MB * _MB)))
+    return Capacity(cpus=cpus, memory=memory, job_cpus=job_cpus, units=units)
+
+
+def units_for(engine: str, total: int) -> int:
+    if engine == 'docling':
+        return min(total, max(1, math.ceil(settings.OCR_DOCLING_JOB_MEMORY_MB / settings.OCR_JOB_MEMORY_MB)))
+    return 1
+
+
+def apply_thread_limits() -> None:
+    """
+    Cap the process-wide native thread pools at one job's CPU budget. Runs at start-up,
+    before NumPy/OpenCV/onnxruntime create their pools; explicit env values win.
+    """
+    if not settings.OCR_GOVERNOR:
+        return
+    job_cpus = str(capacity().job_cpus)
+    for name in THREAD_ENV:
+        os.environ.setdefault(name, job_cpus)
+    from .preprocess import cv2
+
+    if cv2 is not None:
+        cv2.setNumThreads(int(os.environ['OMP_NUM_THREADS']))
+
+
+def _memory_pressure(cap: Capacity) -> bool:
+    if not cap.memory:
+        return False
+    working_set = cgroup.memory_working_set()
+    return working_set is not None and working_set > cap.memory * settings.OCR_GOVERNOR_MEMORY_HIGH
+
+
+def _try_units(directory: Path, total: int, needed: int) -> list[IO]:
+    """All-or-nothing: lock ``needed`` free unit files, or none."""
+    held: list[IO] = []
+    for index in range(total):
+        handle = (directory / f'unit-{index}').open('a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            continue
+        held.append(handle)
+        if len(held) == needed:
+            return held
+    _release(held)
+    return []
+
+
+def _release(handles: list[IO]) -> None:
+    for handle in handles:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+@contextmanager
+def admit(engine: str) -> Iterator[Budget]:
+    """
+    Wait until the job fits, then hold its units for the duration of the block.
+    Raises :class:`GovernorBusy` after ``OCR_GOVERNOR_WAIT_SECONDS`` without admission.
+    """
+    cap = capacity()
+    if not settings.OCR_GOVERNOR:
+        yield Budget(engine, cap.job_cpus, 0)
+        return
+
+    needed = units_for(engine, cap.units)
+    directory = Path(settings.OCR_GOVERNOR_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    started = time.monotonic()
+    deadline = started + settings.OCR_GOVERNOR_WAIT_SECONDS
+    held: list[IO] = []
+    with (directory / 'admission.lock').open('a') as gate:
+        while True:
+            if not _memory_pressure(cap):
+                # Taking units under one lock keeps multi-unit jobs from deadlocking.
+                fcntl.flock(gate, fcntl.LOCK_EX)
+                try:
+                    held = _try_units(directory, cap.units, needed)
+                finally:
+                    fcntl.flock(gate, fcntl.LOCK_UN)
+            if held:
+                break
+            if time.monotonic() >= deadline:
+                raise GovernorBusy('Serverul procesează deja numărul maxim de documente. Încearcă din nou în câteva minute.')
+            time.sleep(_POLL_SECONDS)
+
+    budget = Budget(engine, cap.job_cpus, needed, time.monotonic() - started)
+    if budget.waited > 1:
+        log.info('OCR job admitted after %.1fs (%d/%d units).', budget.waited, needed, cap.units)
+    try:
+        yield budget
+    finally:
+        _release(held)
+
+
+def in_use() -> int:
+    """Units currently held by any process (for the admin console)."""
+    directory = Path(settings.OCR_GOVERNOR_DIR)
+    if not settings.OCR_GOVERNOR or not directory.exists():
+        return 0
+    busy = 0
+    for index in range(capacity().units):
+        with (directory / f'unit-{index}').open('a') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                busy += 1
+            else:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    return busy
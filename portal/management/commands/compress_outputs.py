@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal import compression
+from portal.governor import GovernorBusy
+from portal.models import OcrJob
+
+
+class Command(BaseCommand):
+    help = 'Compress processed PDFs waiting for the output compression stage (or given jobs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', help='Compress these jobs instead of the pending queue.')
+        parser.add_argument(
+            '--backlog',
+            action='store_true',
+            help='Also queue completed jobs that were never compressed (e.g. from before the stage existed).',
+        )
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many jobs.')
+
+    def handle(self, *args, **options):
+        if not compression.available():
+            raise CommandError('Output compression needs pikepdf and opencv-python-headless.')
+
+        if options['job_ids']:
+            job_ids = options['job_ids']
+        else:
+            if options['backlog']:
+                backlog = OcrJob.objects.filter(status=OcrJob.Status.COMPLETED).exclude(
+                    options__has_key='compression'
+                )
+                for job in backlog.exclude(processed_file='').exclude(processed_file__isnull=True):
+                    job.options = {**(job.options or {}), 'compression': {'status': 'pending'}}
+                    job.save(update_fields=['options'])
+            requeued = compression.requeue_stale()
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'{requeued} interrupted jobs queued again.'))
+            job_ids = list(compression.pending_jobs().values_list('id', flat=True))
+        if options['limit']:
+            job_ids = job_ids[: options['limit']]
+
+        before = after = 0
+        for job_id in job_ids:
+            try:
+                state = compression.compress_job(job_id)
+            except GovernorBusy:
+                self.stdout.write(self.style.WARNING(f'{job_id}: OCR jobs hold every unit; left pending.'))
+                break
+            if state is None:
+                self.stdout.write(self.style.WARNING(f'{job_id}: not compressed'))
+                continue
+            before += state['before']
+            after += state['after']
+            self.stdout.write(
+                f"{job_id}: {state['status']} {state['before']} -> {state['after']} bytes "
+                f"in {state['seconds']}s {state['images']}"
+            )
+        if before:
+            self.stdout.write(
+                self.style.SUCCESS(f'{len(job_ids)} jobs: {before} -> {after} bytes ({1 - after / before:.1%} saved).')
+            )
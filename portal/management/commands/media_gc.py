@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portal import retention
+
+
+class Command(BaseCommand):
+    help = 'Delete orphaned media files and apply the retention rules for jobs and Word documents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted.')
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=settings.OCR_GC_GRACE_HOURS,
+            help='Keep unreferenced files younger than this.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=settings.OCR_GC_DELETE_RATE,
+            help='Maximum deletions per second (0 = unlimited).',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='File names checked per database query.')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many orphaned files.')
+        parser.add_argument(
+            '--rule',
+            action='append',
+            choices=sorted(retention.retention_rules()),
+            help='Only apply these retention rules (repeatable).',
+        )
+        parser.add_argument('--skip-orphans', action='store_true', help='Only apply the retention rules.')
+        parser.add_argument('--skip-retention', action='store_true', help='Only delete orphaned files.')
+
+    def handle(self, *args, **options):
+        report = retention.GcReport()
+        limiter = retention.RateLimiter(options['rate'])
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        # Retention first, so files of expired rows are removed in the same run.
+        if not options['skip_retention']:
+            retention.apply_retention(report, dry_run, batch_size, limiter, options['rule'])
+        if not options['skip_orphans']:
+            retention.collect_orphans(
+                report,
+                timedelta(hours=options['grace_hours']),
+                dry_run,
+                batch_size,
+                limiter,
+                options['limit'],
+            )
+            retention.prune_tier_entries(report, dry_run, batch_size, limiter)
+
+        verb = 'would delete' if dry_run else 'deleted'
+        for rule, count in report.expired.items():
+            self.stdout.write(f'retention {rule}: {verb} {count} rows')
+        self.stdout.write(
+            f'scanned {report.scanned} files, {report.orphans} orphaned '
+            f'({report.orphan_bytes / 1024 / 1024:.1f} MB), {verb} {report.deleted if not dry_run else report.orphans}'
+        )
+        self.stdout.write(f'stale tier entries: {report.stale_entries}')
+        self.stdout.write(self.style.SUCCESS('Dry run, nothing deleted.' if dry_run else 'Done.'))
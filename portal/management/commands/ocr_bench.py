@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.benchmark import (
+    OPTION_PRESETS,
+    CorpusSpec,
+    available_engines,
+    build_report,
+    compare_reports,
+    generate_corpus,
+    load_report,
+    run_benchmark,
+)
+
+
+def _csv(value: str) -> list[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the installed OCR engines on a deterministic synthetic corpus.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', type=_csv, help='Comma separated engines (default: all installed).')
+        parser.add_argument(
+            '--presets',
+            type=_csv,
+            default=['default'],
+            help=f"Comma separated option presets: {', '.join(OPTION_PRESETS)}.",
+        )
+        parser.add_argument('--dpis', type=_csv, default=['150', '300'])
+        parser.add_argument('--languages', type=_csv, default=['eng', 'ron'])
+        parser.add_argument('--pages', type=int, default=2, help='Pages per corpus document.')
+        parser.add_argument('--seed', type=int, default=1337)
+        parser.add_argument('--quick', action='store_true', help='Single DPI, no skew or noise variants.')
+        parser.add_argument('--corpus-dir', type=Path, help='Keep the generated corpus in this directory.')
+        parser.add_argument('--output', type=Path, help='Write the JSON report to this path.')
+        parser.add_argument('--baseline', type=Path, help='Compare against a previous JSON report.')
+
+    def handle(self, *args, **options):
+        presets = options['presets']
+        unknown = [name for name in presets if name not in OPTION_PRESETS]
+        if unknown:
+            raise CommandError(f"Unknown presets: {', '.join(unknown)}")
+
+        installed = available_engines()
+        engines = options['engines'] or installed
+        missing = [engine for engine in engines if engine not in installed]
+        if missing:
+            raise CommandError(f"Engines not available: {', '.join(missing)}")
+        if not engines:
+            raise CommandError('No OCR engine is installed.')
+
+        spec = CorpusSpec(
+            dpis=tuple(int(dpi) for dpi in options['dpis']),
+            languages=tuple(options['languages']),
+            pages=options['pages'],
+            seed=options['seed'],
+        )
+        if options['quick']:
+            spec.dpis = spec.dpis[:1]
+            spec.skews = (0.0,)
+            spec.noise_levels = (0.0,)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus_dir = options['corpus_dir'] or Path(temp_dir)
+            documents = generate_corpus(corpus_dir, spec)
+            self.stdout.write(f'Generated {len(documents)} documents in {corpus_dir}.')
+            results = run_benchmark(documents, engines, presets)
+
+        report = build_report(results, spec)
+        for row in report['results']:
+            self.stdout.write(
+                '{engine:<9} {preset:<15} {pages_per_second:>7} pages/s  '
+                'p50 {latency_p50:>7}s  p95 {latency_p95:>7}s  '
+                'acc {char_accuracy:.4f}  ocr {ocr_megapixels} MP  rss {peak_rss_kb} KB  '
+                'failures {failures}'.format(**row)
+            )
+
+        if options['baseline']:
+            for row in compare_reports(report, load_report(options['baseline'])):
+                self.stdout.write(
+                    '{engine:<9} {preset:<15} Δpages/s {pages_per_second}  '
+                    'Δp95 {latency_p95}  Δacc {char_accuracy}  ΔMP {ocr_megapixels}'.format(**row)
+                )
+
+        if options['output']:
+            options['output'].write_text(json.dumps(report, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Report saved to {options['output']}."))
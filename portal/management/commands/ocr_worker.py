@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portal import metrics, warmup, workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Run an OCR worker that leases queued jobs from the shared database (OCR_EXECUTION=queue), '
+        'or resumes interrupted inline jobs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--name', help='Worker name (default: <hostname>-<pid>).')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs.')
+        parser.add_argument('--exit-when-idle', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--no-warmup', action='store_true', help='Skip importing the OCR engines up front.')
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=settings.OCR_WORKER_METRICS_PORT,
+            help='Serve Prometheus metrics of this worker on this port (default: OCR_WORKER_METRICS_PORT, 0 = off).',
+        )
+
+    def handle(self, *args, **options):
+        if not workers.enabled():
+            self.stderr.write(
+                self.style.WARNING(
+                    'OCR_EXECUTION is not "queue": the web tier runs jobs inline and this worker '
+                    'only resumes jobs interrupted by a web process that died.'
+                )
+            )
+        if not options['no_warmup']:
+            warmup.warm_up()
+        if metrics.serve(options['metrics_port']):
+            self.stdout.write(f"Metrics on port {options['metrics_port']}.")
+
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            # Finish the current job; an interrupted one would only be retried elsewhere.
+            self.stdout.write('Stopping after the current job...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        worker = workers.register(options['name'])
+        self.stdout.write(f'Worker {worker.name} waiting for jobs.')
+        try:
+            stats = workers.run(worker, stop, options['max_jobs'], options['exit_when_idle'])
+        finally:
+            workers.deregister(worker)
+        self.stdout.write(
+            self.style.SUCCESS(f'Worker {worker.name}: {stats.completed} completed, {stats.failed} failed.')
+        )
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from portal.capabilities import load_probes, missing_languages, probe_tesseract
+from portal.warmup import warm_up
+
+
+def _csv(value: str) -> list[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the capability registry: load each OCR engine once and list Tesseract languages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engines', type=_csv, help='Comma separated engines (default: OCR_WARMUP_ENGINES).')
+
+    def handle(self, *args, **options):
+        seconds = warm_up(options['engines'])
+        tesseract = probe_tesseract(force=True)
+        probes = load_probes()
+        if not probes:
+            self.stdout.write('No OCR engine is installed.')
+            return
+        for engine, probe in sorted(probes.items()):
+            status = self.style.SUCCESS('ok') if probe['ok'] else self.style.ERROR('failed')
+            line = f"{engine:<10} {status} version={probe.get('version') or '-'}"
+            if engine in seconds:
+                line += f' warm-up={seconds[engine]:.2f}s'
+            if probe.get('error'):
+                line += f" error={probe['error']}"
+            self.stdout.write(line)
+
+        if tesseract.get('version'):
+            self.stdout.write(
+                f"tesseract  version={tesseract['version']} languages={','.join(tesseract['languages'])}"
+            )
+            missing = missing_languages()
+            if missing:
+                self.stdout.write(
+                    self.style.WARNING(f"Missing traineddata for portal languages: {', '.join(missing)}")
+                )
+        else:
+            self.stdout.write(self.style.WARNING('tesseract was not found on PATH.'))
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal import tiering
+
+
+def _megabytes(nbytes: int) -> str:
+    return f'{nbytes / 1024 / 1024:.1f} MB'
+
+
+class Command(BaseCommand):
+    help = 'Report media storage tiers and move cold files to the archive tier.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--migrate', action='store_true', help='Archive the files selected by the tier policy.')
+        parser.add_argument('--dry-run', action='store_true', help='List the files --migrate would archive.')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many files.')
+
+    def handle(self, *args, **options):
+        if options['migrate'] or options['dry_run']:
+            try:
+                moves = tiering.migrate(dry_run=options['dry_run'], limit=options['limit'])
+            except RuntimeError as exc:
+                raise CommandError(str(exc)) from exc
+            for move in moves:
+                archived = '' if options['dry_run'] else f' -> {_megabytes(move.archived_size)}'
+                self.stdout.write(f'{move.reason:<6} {move.name}: {_megabytes(move.size)}{archived}')
+            moved = sum(move.size for move in moves)
+            verb = 'would move' if options['dry_run'] else 'moved'
+            self.stdout.write(self.style.SUCCESS(f'{len(moves)} files ({_megabytes(moved)}) {verb} to the archive tier.'))
+
+        report = tiering.report()
+        archive = report['archive']
+        self.stdout.write(f"hot:     {report['hot']['files']} files, {_megabytes(report['hot']['bytes'])}")
+        self.stdout.write(
+            f"archive: {archive['files']} files, {_megabytes(archive['bytes'])} "
+            f"stored as {_megabytes(archive['stored_bytes'])}"
+        )
+        self.stdout.write(f"rehydrated since archiving: {report['rehydrated']} files")
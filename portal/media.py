@@ -0,0 +1,84 @@
+"""
+Helpers that keep the portal independent of where media lives: ``MEDIA_ROOT`` or an
+S3-compatible bucket (``OCR_MEDIA_STORAGE=s3``). Engines need real files, so they ask
+for :func:`local_copy`, which only downloads when the storage has no local path;
+downloads from remote storage redirect to a presigned URL instead of proxying bytes.
+"""
+
+from __future__ import annotations
+
+import shutil
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+
+from django.conf import settings
+from django.utils.http import content_disposition_header
+from django.utils.module_loading import import_string
+
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def local_path(storage, name: str) -> Path | None:
+    """Filesystem path of a stored file, or ``None`` for remote storage."""
+    try:
+        return Path(storage.path(name))
+    except NotImplementedError:
+        return None
+
+
+def is_local(storage) -> bool:
+    return local_path(storage, '') is not None
+
+
+@contextmanager
+def local_copy(field_file, directory: Path, filename: str = 'input.pdf') -> Iterator[Path]:
+    """
+    Yield a path to read ``field_file`` from: the stored file itself on local storage,
+    otherwise a copy streamed into ``directory``. Callers must treat it as read-only
+    and write their own outputs into ``directory``.
+    """
+    path = local_path(field_file.storage, field_file.name)
+    if path is not None:
+        yield path
+        return
+    destination = directory / filename
+    with field_file.storage.open(field_file.name, 'rb') as stored, destination.open('wb') as copy:
+        shutil.copyfileobj(stored, copy, COPY_CHUNK_SIZE)
+    try:
+        yield destination
+    finally:
+        destination.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def _signing_storage():
+    # Presigning is offline, so a second client with the public endpoint signs URLs
+    # for the browser while the nodes keep using the private one.
+    backend = settings.STORAGES['default']
+    options = {**backend.get('OPTIONS', {}), 'endpoint_url': settings.OCR_S3_PUBLIC_ENDPOINT_URL}
+    return import_string(backend['BACKEND'])(**options)
+
+
+def inline_url(field_file) -> str:
+    """URL the browser can open directly (e.g. the preview iframe)."""
+    if settings.OCR_S3_PUBLIC_ENDPOINT_URL and not is_local(field_file.storage):
+        return _signing_storage().url(field_file.name, expire=settings.OCR_MEDIA_URL_EXPIRE)
+    return field_file.url
+
+
+def presigned_url(field_file, filename: str, content_type: str | None = None) -> str | None:
+    """
+    Short-lived download URL handing the transfer to the object store, or ``None``
+    when the file is local (or presigning is disabled) and must be streamed.
+    """
+    storage = field_file.storage
+    if not settings.OCR_MEDIA_PRESIGNED or is_local(storage):
+        return None
+    parameters = {'ResponseContentDisposition': content_disposition_header(True, filename)}
+    if content_type:
+        parameters['ResponseContentType'] = content_type
+    if settings.OCR_S3_PUBLIC_ENDPOINT_URL:
+        storage = _signing_storage()
+    return storage.url(field_file.name, parameters=parameters, expire=settings.OCR_MEDIA_URL_EXPIRE)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+
+try:
+    import prometheus_client  # type: ignore  # noqa: F401
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+else:
+    PROMETHEUS_AVAILABLE = True
+
+
+class _NoopMetric:
+    """Stand-in used when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs) -> '_NoopMetric':
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+
+_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_OCR_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+_SCRATCH_BUCKETS = tuple(2**power * 1024 * 1024 for power in range(4, 17, 2))
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    OCR_JOBS = Counter('ocr_jobs_total', 'Finished OCR jobs.', ['engine', 'status'])
+    OCR_JOBS_IN_PROGRESS = Gauge(
+        'ocr_jobs_in_progress',
+        'OCR jobs currently running in this deployment.',
+        multiprocess_mode='livesum',
+    )
+    OCR_PAGES = Counter('ocr_pages_total', 'Pages processed by OCR engines.', ['engine'])
+    OCR_ENGINE_SECONDS = Histogram(
+        'ocr_engine_seconds', 'Wall time spent in an OCR engine per job.', ['engine'], buckets=_OCR_BUCKETS
+    )
+    OCR_STAGE_SECONDS = Histogram(
+        'ocr_stage_seconds', 'Wall time per OCR job stage.', ['stage'], buckets=_OCR_BUCKETS
+    )
+    DOWNLOAD_BYTES = Counter('portal_download_bytes_total', 'Bytes served by download views.', ['view'])
+    CACHE_EVENTS = Counter('portal_cache_events_total', 'Cache lookups.', ['cache', 'result'])
+    HTTP_SECONDS = Histogram(
+        'portal_http_request_seconds',
+        'Request latency per view.',
+        ['view', 'method', 'status'],
+        buckets=_LATENCY_BUCKETS,
+    )
+    DB_QUERIES = Histogram(
+        'portal_db_queries_per_request', 'Database queries per request.', ['view'], buckets=_QUERY_BUCKETS
+    )
+    COMPRESSION_BYTES = Counter(
+        'ocr_compression_bytes_total', 'Processed PDF bytes around output compression.', ['state']
+    )
+    TIER_MOVES = Counter('ocr_tier_moves_total', 'Media files moved between storage tiers.', ['direction'])
+    TIER_BYTES = Counter('ocr_tier_bytes_total', 'Uncompressed bytes moved between storage tiers.', ['direction'])
+    SCRATCH_EVENTS = Counter(
+        'ocr_scratch_events_total', 'Scratch reservations, spills and overruns per tier.', ['tier', 'event']
+    )
+    SCRATCH_PEAK_BYTES = Histogram(
+        'ocr_scratch_peak_bytes', 'Peak scratch space used per OCR job.', ['tier'], buckets=_SCRATCH_BUCKETS
+    )
+else:
+    OCR_JOBS = OCR_JOBS_IN_PROGRESS = OCR_PAGES = OCR_ENGINE_SECONDS = _NoopMetric()
+    OCR_STAGE_SECONDS = DOWNLOAD_BYTES = CACHE_EVENTS = HTTP_SECONDS = DB_QUERIES = _NoopMetric()
+    COMPRESSION_BYTES = TIER_MOVES = TIER_BYTES = SCRATCH_EVENTS = SCRATCH_PEAK_BYTES = _NoopMetric()
+
+
+def record_download(view: str, nbytes: int) -> None:
+    DOWNLOAD_BYTES.labels(view=view).inc(nbytes)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_compression(before: int, after: int) -> None:
+    COMPRESSION_BYTES.labels(state='before').inc(before)
+    COMPRESSION_BYTES.labels(state='after').inc(after)
+
+
+def record_tier_move(direction: str, nbytes: int) -> None:
+    TIER_MOVES.labels(direction=direction).inc()
+    TIER_BYTES.labels(direction=direction).inc(nbytes)
+
+
+def record_scratch_event(tier: str, event: str) -> None:
+    SCRATCH_EVENTS.labels(tier=tier, event=event).inc()
+
+
+def record_scratch_peak(tier: str, nbytes: int) -> None:
+    SCRATCH_PEAK_BYTES.labels(tier=tier).observe(nbytes)
+
+
+def record_job(engine: str, status: str, seconds: float, pages: int, timings: dict) -> None:
+    OCR_JOBS.labels(engine=engine, status=status).inc()
+    OCR_ENGINE_SECONDS.labels(engine=engine).observe(seconds)
+    if pages:
+        OCR_PAGES.labels(engine=engine).inc(pages)
+    for stage, entry in (timings.get('stages') or {}).items():
+        OCR_STAGE_SECONDS.labels(stage=stage).observe(entry.get('s', 0.0))
+
+
+def _job_state_family():
+    from django.db.models import Count
+    from prometheus_client.core import GaugeMetricFamily
+
+    from .models import OcrJob
+
+    family = GaugeMetricFamily('ocr_jobs_by_status', 'OCR jobs stored per status.', labels=['status'])
+    counts = dict.fromkeys(OcrJob.Status.values, 0)
+    for row in OcrJob.objects.values('status').annotate(total=Count('id')):
+        counts[row['status']] = row['total']
+    for status, total in counts.items():
+        family.add_metric([status], total)
+    return family
+
+
+class _JobStateCollector:
+    def collect(self):
+        yield _job_state_family()
+
+
+def _process_registry():
+    from prometheus_client import REGISTRY, CollectorRegistry
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def serve(port: int, address: str = '0.0.0.0') -> bool:
+    """
+    Expose this process's metrics over HTTP on ``port`` (``ocr_worker``: queue workers
+    run in their own containers, so the web tier's /metrics never sees their jobs).
+    Job counts per status come from the database and stay on the web endpoint.
+    """
+    if not PROMETHEUS_AVAILABLE or not port:
+        return False
+    from prometheus_client import start_http_server
+
+    start_http_server(port, addr=address, registry=_process_registry())
+    return True
+
+
+def render_latest() -> tuple[bytes, str]:
+    """
+    Render every metric in the text exposition format. With PROMETHEUS_MULTIPROC_DIR set
+    (gunicorn with several workers) the per-process files are merged on each scrape.
+    """
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+
+    registry = _process_registry()
+    job_registry = CollectorRegistry()
+    job_registry.register(_JobStateCollector())
+    return generate_latest(registry) + generate_latest(job_registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+from .profiling import RequestProfile, save_trace
+
+log = logging.getLogger(__name__)
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match else '') or 'unresolved'
+
+
+class RequestMetricsMiddleware:
+    """
+    Observe latency and database query count per resolved view. The middleware is
+    async-capable so ASGI requests to async views never hop to a sync thread; on that
+    path queries run on executor threads and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        self._observe(request, response, time.perf_counter() - started)
+        metrics.DB_QUERIES.labels(view=_view_name(request)).observe(counter.count)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _observe(request, response, elapsed: float) -> None:
+        metrics.HTTP_SECONDS.labels(
+            view=_view_name(request), method=request.method, status=str(response.status_code)
+        ).observe(elapsed)
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile a random fraction of requests (``PROFILING_SAMPLE_RATE``) plus staff requests
+    carrying the ``X-Portal-Profile`` header. Unsampled requests only pay for one
+    ``random()`` call. Sync-only: under ASGI, enabling it makes Django run the
+    middleware chain in a thread.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+    def _should_profile(self, request) -> bool:
+        if request.META.get('HTTP_X_PORTAL_PROFILE') and getattr(request.user, 'is_staff', False):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile(request)
+        with connection.execute_wrapper(profile.sql), profile:
+            response = self.get_response(request)
+        try:
+            save_trace(profile.build_trace(response))
+        except OSError:
+            log.warning('Could not store request profile for %s.', request.path, exc_info=True)
+        return response
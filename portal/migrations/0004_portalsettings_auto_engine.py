@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2025-10-20 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0003_portalsettings"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="portalsettings",
+            name="ocr_engine",
+            field=models.CharField(
+                choices=[
+                    ("ocrmypdf", "OCRmyPDF"),
+                    ("docling", "Docling"),
+                    ("auto", "Rutare adaptivă"),
+                ],
+                default="ocrmypdf",
+                max_length=32,
+            ),
+        ),
+    ]
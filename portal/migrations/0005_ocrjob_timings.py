@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2025-10-21 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0004_portalsettings_auto_engine"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrjob",
+            name="timings",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
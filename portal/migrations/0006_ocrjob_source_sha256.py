@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2025-10-22 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0005_ocrjob_timings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrjob",
+            name="source_sha256",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
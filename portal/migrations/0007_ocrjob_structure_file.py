@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2025-10-22 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0006_ocrjob_source_sha256"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrjob",
+            name="structure_file",
+            field=models.FileField(blank=True, null=True, upload_to="structure/"),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2025-10-23 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0007_ocrjob_structure_file"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TieredFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                (
+                    "tier",
+                    models.CharField(
+                        choices=[("hot", "Hot"), ("archive", "Archive")],
+                        db_index=True,
+                        default="hot",
+                        max_length=16,
+                    ),
+                ),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("archived_size", models.PositiveBigIntegerField(default=0)),
+                ("last_accessed_at", models.DateTimeField(blank=True, null=True)),
+                ("moved_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2025-10-27 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0009_ocrworker_ocrjob_leasing"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("engine", models.CharField(max_length=16)),
+                ("first_page", models.PositiveIntegerField()),
+                ("last_page", models.PositiveIntegerField()),
+                (
+                    "pdf_file",
+                    models.FileField(blank=True, upload_to="checkpoints/"),
+                ),
+                (
+                    "text_file",
+                    models.FileField(blank=True, upload_to="checkpoints/"),
+                ),
+                (
+                    "structure_file",
+                    models.FileField(blank=True, upload_to="checkpoints/"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="portal.ocrjob",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["first_page"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("job", "first_page"),
+                        name="portal_jobchunk_unique_start",
+                    )
+                ],
+            },
+        ),
+    ]
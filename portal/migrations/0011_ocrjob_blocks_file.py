@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("portal", "0010_jobchunk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocrjob",
+            name="blocks_file",
+            field=models.FileField(blank=True, null=True, upload_to="blocks/"),
+        ),
+    ]
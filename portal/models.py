@@ -1,12 +1,11 @@
-import importlib.util
 import logging
 import uuid
-from functools import lru_cache
 from pathlib import Path
 
 from django.contrib.auth import get_user_model
 from django.core.files.storage import default_storage
 from django.db import DatabaseError, models
+from django.utils import timezone
 
 from .constants import FOLDER_COLOR_CHOICES, LANGUAGE_LOOKUP, MENU_CHOICES, OCR_ENGINE_CHOICES
 
@@ -14,38 +13,11 @@ from .constants import FOLDER_COLOR_CHOICES, LANGUAGE_LOOKUP, MENU_CHOICES, OCR_
 log = logging.getLogger(__name__)
 
 
-@lru_cache(maxsize=1)
-def _docling_ready() -> bool:
-    """Best-effort probe to determine if Docling can be used."""
-
-    if importlib.util.find_spec('docling') is None:
-        return False
-
-    try:  # pragma: no cover - runtime environment probe
-        from docling.document_converter import DocumentConverter
-    except Exception:  # noqa: BLE001 - import-time issues mean Docling is unusable
-        log.debug('Docling import failed.', exc_info=True)
-        return False
-
-    try:
-        # Instantiate lazily to surface dependency issues (opencv, rapidocr, etc.).
-        converter = DocumentConverter()  # type: ignore[call-arg]
-    except TypeError:
-        # Signature changes shouldn't mark the engine as unavailable.
-        return True
-    except Exception:  # noqa: BLE001 - we want to swallow any startup issue
-        log.debug('Docling is installed but failed to initialize.', exc_info=True)
-        return False
-    else:
-        del converter
-
-    return True
-
-
 class PortalSettings(models.Model):
     class OcrEngine(models.TextChoices):
         OCRMYPDF = 'ocrmypdf', 'OCRmyPDF'
         DOCLING = 'docling', 'Docling'
+        AUTO = 'auto', 'Rutare adaptivă'
 
     id = models.PositiveSmallIntegerField(primary_key=True, default=1, editable=False)
     ocr_engine = models.CharField(
@@ -76,7 +48,9 @@ class PortalSettings(models.Model):
 
     @staticmethod
     def docling_available() -> bool:
-        return _docling_ready()
+        from .capabilities import docling_available
+
+        return docling_available()
 
 
 class PortalAccess(models.Model):
@@ -167,8 +141,14 @@ class OcrJob(models.Model):
         default=Status.PENDING,
     )
     source_file = models.FileField(upload_to='uploads/')
+    source_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     processed_file = models.FileField(upload_to='processed/', blank=True, null=True)
     sidecar_file = models.FileField(upload_to='sidecars/', blank=True, null=True)
+    # Per-page words and boxes (see portal.ocrdata) for search and highlighting.
+    structure_file = models.FileField(upload_to='structure/', blank=True, null=True)
+    # Headings, lists and tables of a Docling result (see portal.wordexport), so a later
+    # Word conversion of the same PDF keeps them without running Docling again.
+    blocks_file = models.FileField(upload_to='blocks/', blank=True, null=True)
     destination_folder = models.ForeignKey(
         LibraryFolder,
         on_delete=models.SET_NULL,
@@ -177,7 +157,18 @@ class OcrJob(models.Model):
         related_name='ocr_jobs',
     )
     options = models.JSONField(default=dict, blank=True)
+    timings = models.JSONField(default=dict, blank=True)
     error_message = models.TextField(blank=True)
+    # Queue execution (portal.workers): the worker holding the job and until when.
+    lease_owner = models.ForeignKey(
+        'OcrWorker',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='leased_jobs',
+    )
+    lease_expires_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -200,13 +191,14 @@ class OcrJob(models.Model):
     def ensure_directories(self) -> None:
         """
         Ensure the default storage has placeholders for upload/processed folders when
-        using a local filesystem backend. On other storages this is a no-op.
+        using a local filesystem backend. On other storages (object stores have no
+        directories) this is a no-op.
         """
-        if not hasattr(default_storage, 'path'):
-            return
-
         for folder in ('uploads', 'processed', 'libraries', 'sidecars'):
-            storage_path = Path(default_storage.path(folder))
+            try:
+                storage_path = Path(default_storage.path(folder))
+            except NotImplementedError:
+                return
             storage_path.mkdir(parents=True, exist_ok=True)
 
     def language_labels(self) -> str:
@@ -264,3 +256,82 @@ class WordDocument(models.Model):
 
     def __str__(self) -> str:
         return self.title
+
+
+class TieredFile(models.Model):
+    """
+    Storage tier of a media file, keyed by its storage name. Rows exist for files that
+    were accessed through the portal or moved to the archive tier (see portal.tiering).
+    """
+
+    class Tier(models.TextChoices):
+        HOT = 'hot', 'Hot'
+        ARCHIVE = 'archive', 'Archive'
+
+    name = models.CharField(max_length=255, unique=True)
+    tier = models.CharField(max_length=16, choices=Tier.choices, default=Tier.HOT, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    archived_size = models.PositiveBigIntegerField(default=0)
+    last_accessed_at = models.DateTimeField(blank=True, null=True)
+    moved_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_tier_display()})'
+
+
+class OcrWorker(models.Model):
+    """An ``ocr_worker`` process registered in the shared database (see portal.workers)."""
+
+    class Status(models.TextChoices):
+        IDLE = 'idle', 'Idle'
+        BUSY = 'busy', 'Busy'
+        STOPPED = 'stopped', 'Stopped'
+
+    name = models.CharField(max_length=128, unique=True)
+    hostname = models.CharField(max_length=255, blank=True)
+    pid = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.IDLE)
+    started_at = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(default=timezone.now, db_index=True)
+    jobs_completed = models.PositiveIntegerField(default=0)
+    jobs_failed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_status_display()})'
+
+
+class JobChunk(models.Model):
+    """
+    A finished page range of a long OCR job (see portal.checkpoints). A retried job
+    skips the ranges stored here; the rows and their files are dropped once the job ends.
+    """
+
+    job = models.ForeignKey(OcrJob, on_delete=models.CASCADE, related_name='chunks')
+    # 'ocrmypdf' or 'docling'; chunks of another engine are not reused.
+    engine = models.CharField(max_length=16)
+    # 1-based, inclusive.
+    first_page = models.PositiveIntegerField()
+    last_page = models.PositiveIntegerField()
+    pdf_file = models.FileField(upload_to='checkpoints/', blank=True)
+    text_file = models.FileField(upload_to='checkpoints/', blank=True)
+    structure_file = models.FileField(upload_to='checkpoints/', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['first_page']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'first_page'], name='portal_jobchunk_unique_start'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.job_id} p{self.first_page}-{self.last_page}'
+
+    @property
+    def pages(self) -> int:
+        return self.last_page - self.first_page + 1
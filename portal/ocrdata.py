@@ -0,0 +1,283 @@
+"""
+Per-page structured OCR output (words, boxes, confidence) in a compact container
+with a page index, so one page can be read without loading the whole document.
+
+Layout: ``MAGIC``, one zlib-compressed JSON block per page, a compressed term
+index ``{term: [page, ...]}``, a JSON index ``{"pages": [[page, offset, length],
+...], "terms": [offset, length]}`` and a fixed trailer with the index offset.
+Each page block is columnar: ``{"p", "w", "h", "t": [...], "x0": [...], ...}``.
+Boxes are normalised to ``0..BOX_SCALE`` with a top-left origin.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import struct
+import unicodedata
+import xml.etree.ElementTree as ET
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+MAGIC = b'OCRPAGES1\n'
+TRAILER = struct.Struct('<Q8s')
+TRAILER_MAGIC = b'OCRPIDX!'
+BOX_SCALE = 10000
+
+_HOCR_BBOX = re.compile(r'bbox (\d+) (\d+) (\d+) (\d+)')
+_HOCR_CONF = re.compile(r'x_wconf (\d+)')
+_EDGE_PUNCTUATION = re.compile(r'^\W+|\W+$')
+
+
+def normalize_term(text: str) -> str:
+    """Case- and diacritic-insensitive form of a word (``Ștefan,`` -> ``stefan``)."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _EDGE_PUNCTUATION.sub('', stripped.casefold())
+
+
+def tokenize(text: str) -> list[str]:
+    return [term for term in (normalize_term(part) for part in text.split()) if term]
+
+
+@dataclass(slots=True)
+class PageWords:
+    page: int
+    width: float
+    height: float
+    words: list[str] = field(default_factory=list)
+    boxes: list[tuple[int, int, int, int]] = field(default_factory=list)
+    confidence: list[int] = field(default_factory=list)
+
+    def add(self, text: str, x0: float, y0: float, x1: float, y1: float, conf: int = -1) -> None:
+        """Add a word with a box in page units (top-left origin)."""
+        sx, sy = BOX_SCALE / (self.width or 1), BOX_SCALE / (self.height or 1)
+        self.words.append(text)
+        self.boxes.append((round(x0 * sx), round(y0 * sy), round(x1 * sx), round(y1 * sy)))
+        self.confidence.append(conf)
+
+    def to_dict(self) -> dict:
+        columns = list(zip(*self.boxes)) if self.boxes else [(), (), (), ()]
+        return {
+            'p': self.page,
+            'w': self.width,
+            'h': self.height,
+            't': self.words,
+            'x0': list(columns[0]),
+            'y0': list(columns[1]),
+            'x1': list(columns[2]),
+            'y1': list(columns[3]),
+            'c': self.confidence,
+            # Search terms per entry, precomputed so queries skip Unicode normalisation.
+            'n': [' '.join(tokenize(word)) for word in self.words],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PageWords':
+        return cls(
+            page=data['p'],
+            width=data['w'],
+            height=data['h'],
+            words=data['t'],
+            boxes=list(zip(data['x0'], data['y0'], data['x1'], data['y1'])),
+            confidence=data['c'],
+        )
+
+
+def _compress(data) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+class PageWriter:
+    """
+    Incremental form of :func:`write_pages` for callers that produce pages over time
+    (e.g. window by window); only the page index and term lists stay in memory.
+    """
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self.stream = stream
+        self.index: list[list[int]] = []
+        self.terms: dict[str, list[int]] = {}
+        stream.write(MAGIC)
+        self.offset = len(MAGIC)
+
+    def add(self, page: PageWords) -> None:
+        block = _compress(page.to_dict())
+        self.stream.write(block)
+        self.index.append([page.page, self.offset, len(block)])
+        self.offset += len(block)
+        for term in set(tokenize(' '.join(page.words))):
+            self.terms.setdefault(term, []).append(page.page)
+
+    def close(self) -> int:
+        """Write the term block, index and trailer; returns how many pages were stored."""
+        terms_block = _compress(self.terms)
+        self.stream.write(terms_block)
+        terms_location = [self.offset, len(terms_block)]
+        end = self.offset + len(terms_block)
+        self.stream.write(json.dumps({'pages': self.index, 'terms': terms_location}, separators=(',', ':')).encode('utf-8'))
+        self.stream.write(TRAILER.pack(end, TRAILER_MAGIC))
+        return len(self.index)
+
+
+def write_pages(stream: IO[bytes], pages: Iterable[PageWords]) -> int:
+    """Write pages in order and return how many were stored."""
+    writer = PageWriter(stream)
+    for page in pages:
+        writer.add(page)
+    return writer.close()
+
+
+def read_index(stream: IO[bytes]) -> tuple[dict[int, tuple[int, int]], dict[str, list[int]]]:
+    """Page locations and the term index; cheap enough to cache per stored file."""
+    stream.seek(-TRAILER.size, 2)
+    end = stream.tell()
+    index_offset, marker = TRAILER.unpack(stream.read(TRAILER.size))
+    if marker != TRAILER_MAGIC:
+        raise ValueError('Not a structured OCR result.')
+    stream.seek(index_offset)
+    index = json.loads(stream.read(end - index_offset))
+    if isinstance(index, list):
+        # Results written before the term index existed: rebuild it from the pages.
+        pages = {page: (offset, length) for page, offset, length in index}
+        terms: dict[str, list[int]] = {}
+        for page in PageReader(stream, (pages, {})):
+            for term in set(tokenize(' '.join(page.words))):
+                terms.setdefault(term, []).append(page.page)
+        return pages, terms
+    pages = {page: (offset, length) for page, offset, length in index['pages']}
+    offset, length = index['terms']
+    stream.seek(offset)
+    terms = json.loads(zlib.decompress(stream.read(length)))
+    return pages, terms
+
+
+class PageReader:
+    """Random access to the pages of a stored result; only the index is read up front."""
+
+    def __init__(self, stream: IO[bytes], index: tuple[dict, dict] | None = None) -> None:
+        self.stream = stream
+        self.index, self.terms = index or read_index(stream)
+
+    @property
+    def pages(self) -> list[int]:
+        return sorted(self.index)
+
+    def _page_data(self, number: int) -> dict | None:
+        location = self.index.get(number)
+        if location is None:
+            return None
+        offset, length = location
+        self.stream.seek(offset)
+        return json.loads(zlib.decompress(self.stream.read(length)))
+
+    def page(self, number: int) -> PageWords | None:
+        data = self._page_data(number)
+        return PageWords.from_dict(data) if data is not None else None
+
+    def __iter__(self) -> Iterator[PageWords]:
+        for number in self.pages:
+            yield self.page(number)
+
+    def search(self, query: str, limit: int = 200) -> list[dict]:
+        """
+        Occurrences of ``query`` (a word or phrase) with their boxes. Candidate pages come
+        from the term index, so only pages containing every query term are decompressed.
+        """
+        needle = tokenize(query)
+        if not needle:
+            return []
+        candidates = None
+        for term in needle:
+            pages = set(self.terms.get(term, ()))
+            candidates = pages if candidates is None else candidates & pages
+            if not candidates:
+                return []
+
+        hits: list[dict] = []
+        size = len(needle)
+        for number in sorted(candidates):
+            data = self._page_data(number)
+            normalised = data.get('n') or [' '.join(tokenize(word)) for word in data['t']]
+            # Entries may be single words (hOCR) or whole lines (Docling); flatten them
+            # to a token stream that remembers which entry each token came from.
+            stream_terms, owners = [], []
+            for position, terms in enumerate(normalised):
+                for term in terms.split():
+                    stream_terms.append(term)
+                    owners.append(position)
+            for start in range(len(stream_terms) - size + 1):
+                if stream_terms[start] != needle[0] or stream_terms[start:start + size] != needle:
+                    continue
+                entries = sorted(set(owners[start:start + size]))
+                hits.append(
+                    {
+                        'page': number,
+                        'width': data['w'],
+                        'height': data['h'],
+                        'rects': [
+                            [
+                                round(data[column][entry] / BOX_SCALE, 4)
+                                for column in ('x0', 'y0', 'x1', 'y1')
+                            ]
+                            for entry in entries
+                        ],
+                        'text': ' '.join(data['t'][entry] for entry in entries),
+                    }
+                )
+                if len(hits) >= limit:
+                    return hits
+        return hits
+
+
+def parse_hocr(path: Path, page: int) -> PageWords:
+    """Words of one Tesseract hOCR page; boxes are in image pixels before scaling."""
+    root = ET.parse(path).getroot()
+    result = None
+    for element in root.iter():
+        css = element.get('class', '')
+        title = element.get('title', '')
+        if css == 'ocr_page':
+            bbox = _HOCR_BBOX.search(title)
+            width, height = (int(bbox.group(3)), int(bbox.group(4))) if bbox else (0, 0)
+            result = PageWords(page=page, width=width, height=height)
+        elif css == 'ocrx_word' and result is not None:
+            text = ''.join(element.itertext()).strip()
+            bbox = _HOCR_BBOX.search(title)
+            if not text or not bbox:
+                continue
+            conf = _HOCR_CONF.search(title)
+            result.add(text, *(int(value) for value in bbox.groups()), int(conf.group(1)) if conf else -1)
+    return result or PageWords(page=page, width=0, height=0)
+
+
+def hocr_pages(directory: Path) -> Iterator[PageWords]:
+    """Pages exported by ``portal.ocrmypdf_plugin``, named ``<page>.hocr``."""
+    files = sorted(directory.glob('*.hocr'), key=lambda path: int(path.stem))
+    for path in files:
+        yield parse_hocr(path, int(path.stem))
+
+
+def docling_pages(document) -> list[PageWords]:
+    """
+    Text items of a Docling document with their layout boxes. Docling exposes boxes per
+    item rather than per word, so each entry is a line or paragraph; confidence is unknown.
+    """
+    pages: dict[int, PageWords] = {}
+    for item, _depth in document.iterate_items():
+        text = (getattr(item, 'text', '') or '').strip()
+        if not text:
+            continue
+        for provenance in getattr(item, 'prov', None) or []:
+            number = provenance.page_no
+            if number not in pages:
+                size = document.pages[number].size
+                pages[number] = PageWords(page=number, width=size.width, height=size.height)
+            page = pages[number]
+            bbox = provenance.bbox
+            if hasattr(bbox, 'to_top_left_origin'):
+                bbox = bbox.to_top_left_origin(page_height=page.height)
+            page.add(text, bbox.l, bbox.t, bbox.r, bbox.b)
+    return [pages[number] for number in sorted(pages)]
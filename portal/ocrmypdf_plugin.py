@@ -0,0 +1,61 @@
+"""
+OCRmyPDF plugin loaded with ``plugins=['portal.ocrmypdf_plugin']``:
+
+* ``portal_hocr_dir=<directory>`` keeps Tesseract's per-page hOCR; each OCR'd page
+  is copied to ``<page>.hocr``.
+* ``portal_ocr_colour='grey'|'bitonal'`` converts the image sent to Tesseract (chosen
+  by ``portal.resolution``); the page image in the output PDF is left untouched.
+"""
+
+from __future__ import annotations
+
+import re
+import shutil
+from pathlib import Path
+
+from ocrmypdf import hookimpl
+from ocrmypdf.builtin_plugins.tesseract_ocr import TesseractOcrEngine
+from PIL import Image
+
+# OCRmyPDF names intermediate files "<1-based page, 6 digits>_<step>".
+_PAGE_PREFIX = re.compile(r'^(\d+)_')
+
+
+@hookimpl
+def add_options(parser):
+    group = parser.add_argument_group('Portal', 'Options added by the OCR portal')
+    group.add_argument('--portal-hocr-dir', default=None, help='Copy per-page hOCR into this directory.')
+    group.add_argument(
+        '--portal-ocr-colour',
+        choices=['grey', 'bitonal'],
+        default=None,
+        help='Convert the OCR image to greyscale or black and white.',
+    )
+
+
+@hookimpl
+def filter_ocr_image(page, image):
+    mode = getattr(page.options, 'portal_ocr_colour', None)
+    if mode == 'grey' and image.mode not in ('L', '1'):
+        converted = image.convert('L')
+    elif mode == 'bitonal' and image.mode != '1':
+        converted = image.convert('L').convert('1', dither=Image.Dither.NONE)
+    else:
+        return image
+    converted.info.update(image.info)
+    return converted
+
+
+class HocrExportingEngine(TesseractOcrEngine):
+    @staticmethod
+    def generate_hocr(input_file, output_hocr, output_text, options):
+        TesseractOcrEngine.generate_hocr(input_file, output_hocr, output_text, options)
+        target = getattr(options, 'portal_hocr_dir', None)
+        match = _PAGE_PREFIX.match(Path(output_hocr).name)
+        if target and match and Path(output_hocr).exists():
+            shutil.copyfile(output_hocr, Path(target) / f'{int(match.group(1))}.hocr')
+
+
+@hookimpl
+def get_ocr_engine():
+    return HocrExportingEngine()
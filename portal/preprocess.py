@@ -0,0 +1,282 @@
+"""
+Page preprocessing on NumPy arrays (OpenCV) as a faster alternative to OCRmyPDF's
+``--deskew`` / ``--remove-background`` / ``--clean-final``, which shell out to
+unpaper and Tesseract per page. Each page is rasterised once and every step runs
+on the in-memory image; the cleaned pages are reassembled into an image PDF that
+is handed to the OCR engine. Pages that already have a text layer (born-digital
+pages of a mixed PDF) are passed through untouched unless the job forces OCR.
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import tempfile
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+try:  # pragma: no cover - optional dependency
+    import cv2  # type: ignore
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    cv2 = None  # type: ignore
+    np = None  # type: ignore
+
+OPENCV_AVAILABLE = cv2 is not None
+
+log = logging.getLogger(__name__)
+
+# Widest skew corrected; larger angles are almost always rotated pages, not skew.
+MAX_SKEW_DEGREES = 5.0
+# Deskew is estimated on a downscaled copy of this width.
+_SKEW_SAMPLE_WIDTH = 1000
+# Characters of extractable text from which a page counts as born-digital (a stamp or
+# a page number on a scan stays below this).
+_TEXT_PAGE_CHARS = 20
+
+
+@dataclass(slots=True)
+class PreprocessOptions:
+    deskew: bool = False
+    background: bool = False
+    denoise: bool = False
+    borders: bool = False
+    dpi: int = 300
+    # Threshold pages even without background removal (set when grey levels carry no text).
+    bitonal: bool = False
+    # Leave pages with a text layer as they are (off when the job forces OCR).
+    keep_text_pages: bool = True
+
+    @classmethod
+    def from_job_options(cls, options: dict, dpi: int = 300) -> 'PreprocessOptions':
+        clean = bool(options.get('clean_final'))
+        return cls(
+            deskew=bool(options.get('deskew')),
+            background=bool(options.get('remove_background')) or clean,
+            denoise=clean,
+            borders=clean,
+            dpi=dpi,
+            keep_text_pages=not options.get('force_ocr'),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.deskew or self.background or self.denoise or self.borders
+
+    @property
+    def bilevel(self) -> bool:
+        """Whether pages are thresholded to 1 bit; background removal alone keeps grey."""
+        return self.denoise or self.borders or self.bitonal
+
+
+def available() -> bool:
+    if not OPENCV_AVAILABLE:
+        return False
+    try:
+        import img2pdf  # noqa: F401
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def text_pages(pdf_path: Path) -> tuple[int, set[int]]:
+    """Page count of ``pdf_path`` and the (0-based) indexes of pages with a text layer."""
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(str(pdf_path))
+    try:
+        found = set()
+        for index in range(len(document)):
+            page = document[index]
+            textpage = page.get_textpage()
+            if textpage.count_chars() >= _TEXT_PAGE_CHARS:
+                found.add(index)
+            textpage.close()
+            page.close()
+        return len(document), found
+    finally:
+        document.close()
+
+
+def rasterise(pdf_path: Path, dpi: int, skip: set[int] = frozenset()) -> Iterator['np.ndarray']:
+    """Render each page (except the indexes in ``skip``) once as an 8-bit greyscale array."""
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(str(pdf_path))
+    try:
+        for index in range(len(document)):
+            if index in skip:
+                continue
+            page = document[index]
+            bitmap = page.render(scale=dpi / 72, grayscale=True)
+            array = bitmap.to_numpy()
+            if array.ndim == 3:
+                array = array[:, :, 0]
+            yield np.ascontiguousarray(array)
+            page.close()
+    finally:
+        document.close()
+
+
+def _ink_mask(gray: 'np.ndarray') -> 'np.ndarray':
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return mask
+
+
+def _projection_score(mask: 'np.ndarray', angle: float) -> float:
+    height, width = mask.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    rotated = cv2.warpAffine(mask, matrix, (width, height), flags=cv2.INTER_NEAREST)
+    # Text lines aligned with the rows give the most uneven row profile.
+    return float(np.var(rotated.sum(axis=1, dtype=np.int64)))
+
+
+def estimate_skew(gray: 'np.ndarray') -> float:
+    """Skew angle in degrees via a coarse-to-fine projection profile search."""
+    scale = min(1.0, _SKEW_SAMPLE_WIDTH / gray.shape[1])
+    sample = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    mask = _ink_mask(sample)
+    if not mask.any():
+        return 0.0
+
+    best = 0.0
+    for step, span in ((1.0, MAX_SKEW_DEGREES), (0.1, 1.0)):
+        angles = np.arange(best - span, best + span + step / 2, step)
+        scores = [_projection_score(mask, float(angle)) for angle in angles]
+        best = float(angles[int(np.argmax(scores))])
+    return round(best, 2)
+
+
+def rotate(gray: 'np.ndarray', angle: float) -> 'np.ndarray':
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def flatten_background(gray: 'np.ndarray', dpi: int) -> 'np.ndarray':
+    """Divide out the paper background (stains, shading, tint), keeping grey levels."""
+    size = max(3, int(dpi / 20) | 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+    background = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
+    return cv2.divide(gray, background, scale=255)
+
+
+def binarise(gray: 'np.ndarray', dpi: int) -> 'np.ndarray':
+    """Flatten the paper background, then Otsu-threshold to black text on white."""
+    _, binary = cv2.threshold(flatten_background(gray, dpi), 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    return binary
+
+
+def denoise(binary: 'np.ndarray', dpi: int) -> 'np.ndarray':
+    """Drop specks: ink components smaller than a full stop at this resolution."""
+    min_area = max(2, int((dpi / 300) ** 2 * 6))
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+    keep = stats[:, cv2.CC_STAT_AREA] >= min_area
+    keep[0] = False
+    return np.where(keep[labels], 0, 255).astype(np.uint8)
+
+
+def clear_borders(binary: 'np.ndarray') -> 'np.ndarray':
+    """
+    Whiten dark scanner borders: ink components touching an edge and spanning more than
+    half of it. The page keeps its size so OCR coordinates still match the original.
+    """
+    height, width = binary.shape
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+    left, top = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    right = left + stats[:, cv2.CC_STAT_WIDTH]
+    bottom = top + stats[:, cv2.CC_STAT_HEIGHT]
+    touches = (left == 0) | (top == 0) | (right == width) | (bottom == height)
+    spans = (stats[:, cv2.CC_STAT_WIDTH] > width / 2) | (stats[:, cv2.CC_STAT_HEIGHT] > height / 2)
+    remove = touches & spans
+    remove[0] = False
+    if not remove.any():
+        return binary
+    cleaned = binary.copy()
+    cleaned[remove[labels]] = 255
+    return cleaned
+
+
+def preprocess_pdf(
+    source: Path,
+    destination: Path,
+    options: PreprocessOptions,
+    stage: Callable[[str], object] | None = None,
+) -> list[float | None]:
+    """
+    Write a cleaned PDF of ``source`` to ``destination`` at ``options.dpi`` and return
+    the skew corrected on each page, ``None`` for pages with a text layer, which are
+    copied unchanged (a PDF with only such pages is copied as is). ``stage`` is an
+    optional ``JobTracer.stage``-like callable used to time each step across all pages.
+    """
+    import img2pdf
+
+    stage = stage or (lambda name: nullcontext())
+    total, kept = text_pages(source) if options.keep_text_pages else (0, set())
+    if kept and len(kept) == total:
+        shutil.copyfile(source, destination)
+        return [None] * total
+    angles: list[float | None] = []
+    bilevel = options.bilevel
+    # Page images stay next to the output, in the job's scratch directory.
+    with tempfile.TemporaryDirectory(dir=destination.parent) as temp_dir:
+        page_files = []
+        pages = rasterise(source, options.dpi, skip=kept)
+        while True:
+            while len(angles) in kept:
+                angles.append(None)
+            with stage('pre_rasterise'):
+                gray = next(pages, None)
+            if gray is None:
+                break
+            angle = 0.0
+            if options.deskew:
+                with stage('pre_deskew'):
+                    angle = estimate_skew(gray)
+                    if abs(angle) >= 0.1:
+                        gray = rotate(gray, angle)
+            angles.append(angle)
+            if bilevel:
+                with stage('pre_binarise'):
+                    gray = binarise(gray, options.dpi)
+            elif options.background:
+                with stage('pre_background'):
+                    gray = flatten_background(gray, options.dpi)
+            if options.denoise:
+                with stage('pre_denoise'):
+                    gray = denoise(gray, options.dpi)
+            if options.borders:
+                with stage('pre_borders'):
+                    gray = clear_borders(gray)
+            with stage('pre_encode'):
+                path = Path(temp_dir) / f'{len(page_files):06d}.png'
+                params = [cv2.IMWRITE_PNG_BILEVEL, 1] if bilevel else []
+                cv2.imwrite(str(path), gray, params)
+                page_files.append(str(path))
+
+        if not page_files:
+            raise ValueError('PDF-ul nu conține pagini.')
+        with stage('pre_assemble'):
+            layout = img2pdf.get_fixed_dpi_layout_fun((options.dpi, options.dpi))
+            images = destination if not kept else Path(temp_dir) / 'images.pdf'
+            with images.open('wb') as output:
+                img2pdf.convert(page_files, layout_fun=layout, outputstream=output)
+            if kept:
+                _merge_pages(source, images, angles, destination)
+    return angles
+
+
+def _merge_pages(source: Path, images: Path, angles: list[float | None], destination: Path) -> None:
+    """Put the cleaned page images in place of the scanned pages of ``source``."""
+    import pikepdf
+
+    with pikepdf.open(source) as pdf, pikepdf.open(images) as cleaned:
+        scanned = (index for index, angle in enumerate(angles) if angle is not None)
+        for image_page, index in zip(cleaned.pages, scanned):
+            pdf.pages[index] = image_page
+        pdf.save(destination)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+_TEMPLATE_MARKER = f'{os.sep}django{os.sep}template{os.sep}'
+
+
+@lru_cache(maxsize=1)
+def _path_prefixes() -> tuple[str, ...]:
+    return tuple(sorted({str(settings.BASE_DIR), *filter(None, sys.path)}, key=len, reverse=True))
+
+
+@lru_cache(maxsize=8192)
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for prefix in _path_prefixes():
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Periodically capture the stack of one thread from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.template_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='portal-profiler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            in_template = False
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                in_template = in_template or _TEMPLATE_MARKER in frame.f_code.co_filename
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+                self.template_samples += int(in_template)
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.stacks.values())
+
+
+class _SqlTimer:
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def profile_dir() -> Path:
+    path = Path(getattr(settings, 'PROFILING_DIR', settings.DATA_DIR / 'profiles'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_trace(trace: dict) -> None:
+    """Persist a trace and keep only the slowest ``PROFILING_KEEP`` on disk."""
+    directory = profile_dir()
+    target = directory / f"{trace['id']}.json"
+    temp = target.with_suffix('.tmp')
+    temp.write_text(json.dumps(trace), encoding='utf-8')
+    os.replace(temp, target)
+
+    keep = getattr(settings, 'PROFILING_KEEP', 20)
+    traces = list_traces()
+    for stale in traces[keep:]:
+        (directory / f"{stale['id']}.json").unlink(missing_ok=True)
+
+
+def list_traces() -> list[dict]:
+    traces = []
+    for path in profile_dir().glob('*.json'):
+        try:
+            trace = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        trace.pop('stacks', None)
+        traces.append(trace)
+    return sorted(traces, key=lambda item: item['duration'], reverse=True)
+
+
+def load_trace(trace_id: str) -> dict | None:
+    try:
+        trace_id = uuid.UUID(str(trace_id)).hex
+    except ValueError:
+        return None
+    path = profile_dir() / f'{trace_id}.json'
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def to_collapsed(trace: dict) -> str:
+    return ''.join(f'{stack} {count}\n' for stack, count in trace['stacks'].items())
+
+
+def to_speedscope(trace: dict) -> dict:
+    frames: list[dict] = []
+    index: dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in trace['stacks'].items():
+        sample = []
+        for label in stack.split(';'):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({'name': label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(count * trace['interval'])
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'exporter': 'ocrsite',
+        'name': f"{trace['method']} {trace['path']}",
+        'activeProfileIndex': 0,
+        'shared': {'frames': frames},
+        'profiles': [
+            {
+                'type': 'sampled',
+                'name': trace['view'],
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }
+        ],
+    }
+
+
+class RequestProfile:
+    """Context manager wrapping one sampled request."""
+
+    def __init__(self, request) -> None:
+        self.request = request
+        self.sql = _SqlTimer()
+        self.sampler = StackSampler(
+            threading.get_ident(), getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        )
+        self.started = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> 'RequestProfile':
+        self.started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.duration = time.perf_counter() - self.started
+        self.sampler.stop()
+
+    def build_trace(self, response) -> dict:
+        duration = self.duration
+        samples = self.sampler.sample_count
+        match = getattr(self.request, 'resolver_match', None)
+        return {
+            'id': uuid.uuid4().hex,
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': self.request.method,
+            'path': self.request.path,
+            'view': (match.view_name if match else '') or 'unresolved',
+            'status': response.status_code,
+            'duration': round(duration, 4),
+            'sql_count': self.sql.count,
+            'sql_seconds': round(self.sql.seconds, 4),
+            # Estimated from the share of stack samples that were inside the template engine.
+            'template_seconds': round(duration * self.sampler.template_samples / samples, 4)
+            if samples
+            else 0.0,
+            'interval': self.sampler.interval,
+            'samples': samples,
+            'stacks': dict(self.sampler.stacks),
+        }
@@ -0,0 +1,191 @@
+"""
+Adaptive OCR resolution. A few sample pages are rendered at a low resolution to
+measure the x-height of the body text and how much colour the page carries; from
+that we pick the smallest DPI that still gives Tesseract ``OCR_TARGET_XHEIGHT_PX``
+pixels per lowercase letter, and whether OCR can run on a grey or bitonal image.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from . import preprocess
+from .preprocess import cv2, np
+from .routing import _sample_indexes
+
+log = logging.getLogger(__name__)
+
+ANALYSIS_DPI = 150
+# Analysis needs at least this many letter-sized components to trust the x-height.
+_MIN_GLYPHS = 30
+# Saturated pixels above this share of the page mean colour carries information.
+_COLOUR_SHARE = 0.01
+# Mid-tone pixels (neither ink nor paper) below this share make thresholding lossless.
+_MIDTONE_SHARE = 0.03
+_DPI_STEP = 50
+
+# Least to most aggressive; a document uses the most conservative mode of its pages.
+MODES = ('colour', 'grey', 'bitonal')
+
+
+@dataclass(slots=True)
+class PageResolution:
+    page: int
+    x_height_pt: float | None
+    dpi: int
+    mode: str
+
+
+@dataclass(slots=True)
+class ResolutionPlan:
+    native_dpi: int
+    dpi: int
+    mode: str
+    page_inches: float
+    pages: list[PageResolution] = field(default_factory=list)
+
+    @property
+    def reduced(self) -> bool:
+        return 0 < self.dpi < self.native_dpi
+
+    def ocrmypdf_kwargs(self) -> dict:
+        """
+        OCRmyPDF options applying the plan to the image sent to Tesseract only; the
+        output PDF keeps the original images. The colour mode needs the portal plugin.
+        """
+        kwargs: dict = {}
+        if self.reduced and tesseract_downsample_supported():
+            kwargs['tesseract_downsample_large_images'] = True
+            kwargs['tesseract_downsample_above'] = math.ceil(self.page_inches * self.dpi)
+        if self.mode != 'colour':
+            kwargs['portal_ocr_colour'] = self.mode
+        return kwargs
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data['reduced'] = self.reduced
+        return data
+
+
+def available() -> bool:
+    return preprocess.OPENCV_AVAILABLE and preprocess.available()
+
+
+@lru_cache(maxsize=1)
+def tesseract_downsample_supported() -> bool:
+    """
+    Whether the installed OCRmyPDF has ``--tesseract-downsample-above``. Older releases
+    reject the option, so their jobs run at the native resolution instead.
+    """
+    try:
+        from ocrmypdf.builtin_plugins import tesseract_ocr
+    except ImportError:
+        return False
+    parser = argparse.ArgumentParser(add_help=False)
+    try:
+        tesseract_ocr.add_options(parser=parser)
+        options, _ = parser.parse_known_args([])
+    except Exception:  # noqa: BLE001 - a plugin API change only disables the reduction
+        log.debug('Could not inspect the OCRmyPDF Tesseract options.', exc_info=True)
+        return False
+    if not hasattr(options, 'tesseract_downsample_above'):
+        log.warning('OCRmyPDF has no --tesseract-downsample-above; OCR runs at the native resolution.')
+        return False
+    return True
+
+
+def estimate_x_height(gray: 'np.ndarray', dpi: int) -> float | None:
+    """
+    x-height in points: the most frequent height among letter-sized ink components.
+    Lowercase letters without ascenders dominate running text, so the mode is stable
+    against capitals, descenders and punctuation.
+    """
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Below 4 px (2 pt at the analysis DPI) components are specks, not letters.
+    letters = (
+        (heights >= 4)
+        & (heights <= dpi // 2)
+        & (widths <= heights * 3)
+        & (areas >= 0.15 * widths * heights)
+    )
+    if int(letters.sum()) < _MIN_GLYPHS:
+        return None
+    mode = int(np.bincount(heights[letters]).argmax())
+    return round(mode * 72 / dpi, 2)
+
+
+def colour_mode(bgr: 'np.ndarray') -> str:
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    saturated = (hsv[:, :, 1] > 60) & (hsv[:, :, 2] > 40)
+    if saturated.mean() > _COLOUR_SHARE:
+        return 'colour'
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    midtones = (gray > 64) & (gray < 192)
+    return 'bitonal' if midtones.mean() < _MIDTONE_SHARE else 'grey'
+
+
+def required_dpi(x_height_pt: float | None, native_dpi: int) -> int:
+    """
+    Smallest DPI (in steps of 50) reaching the target x-height, capped at the native
+    DPI. Pages without measurable text return 0 and do not constrain the document.
+    """
+    if not x_height_pt or native_dpi <= 0:
+        return 0
+    target = settings.OCR_TARGET_XHEIGHT_PX * 72 / x_height_pt
+    dpi = max(settings.OCR_ADAPTIVE_MIN_DPI, math.ceil(target / _DPI_STEP) * _DPI_STEP)
+    return min(dpi, native_dpi)
+
+
+def plan_resolution(pdf_path: Path, native_dpi: int, sample_size: int | None = None) -> ResolutionPlan | None:
+    """
+    Analyse evenly spaced sample pages of ``pdf_path`` and return the document plan,
+    or ``None`` when OpenCV/pypdfium2 are missing. ``native_dpi`` is the resolution of
+    the embedded scans (``routing.profile_document``); vector pages (0) are never reduced.
+    """
+    if not available():
+        return None
+    import pypdfium2 as pdfium
+
+    sample_size = sample_size or settings.OCR_ROUTING_SAMPLE_PAGES
+    pages: list[PageResolution] = []
+    document = pdfium.PdfDocument(str(pdf_path))
+    try:
+        page_inches = max(
+            (max(document.get_page_size(index)) / 72 for index in range(len(document))),
+            default=0.0,
+        )
+        for index in _sample_indexes(len(document), sample_size):
+            page = document[index]
+            try:
+                array = page.render(scale=ANALYSIS_DPI / 72).to_numpy()
+            finally:
+                page.close()
+            if array.ndim == 2:
+                array = cv2.cvtColor(array, cv2.COLOR_GRAY2BGR)
+            bgr = np.ascontiguousarray(array[:, :, :3])
+            x_height = estimate_x_height(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), ANALYSIS_DPI)
+            pages.append(PageResolution(index + 1, x_height, required_dpi(x_height, native_dpi), colour_mode(bgr)))
+    finally:
+        document.close()
+    if not pages:
+        return None
+
+    # One setting covers the whole OCRmyPDF run, so the most demanding page wins.
+    return ResolutionPlan(
+        native_dpi=native_dpi,
+        dpi=max((page.dpi for page in pages), default=0) or native_dpi,
+        mode=min((page.mode for page in pages), key=MODES.index),
+        page_inches=round(page_inches, 2),
+        pages=pages,
+    )
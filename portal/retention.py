@@ -0,0 +1,255 @@
+"""
+Media garbage collection and retention (``manage.py media_gc``).
+
+Orphans are files under a ``FileField`` upload directory that no row references
+(failed uploads, copies replaced by re-archiving, cascaded library deletions) and
+archive-tier copies without a ``TieredFile`` entry. The storage tree is walked
+lazily and checked against the database one batch of names at a time, so memory
+stays flat on volumes with millions of files. Files younger than the grace period
+are never touched: uploads are written before their row is saved.
+
+Retention rules delete whole rows (and their files) once they are older than the
+configured number of days; ``0`` keeps them forever.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+from django.utils import timezone
+
+from . import tiering
+from .models import JobChunk, OcrJob, StoredDocument, TieredFile, WordDocument
+
+log = logging.getLogger(__name__)
+
+FILE_MODELS = (OcrJob, StoredDocument, WordDocument, JobChunk)
+
+
+@dataclass(slots=True)
+class GcReport:
+    scanned: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    deleted: int = 0
+    stale_entries: int = 0
+    expired: dict[str, int] = field(default_factory=dict)
+
+
+class RateLimiter:
+    """Spaces out deletions to at most ``rate`` per second (``0`` = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def file_fields() -> list[tuple[type[models.Model], str, str]]:
+    """``(model, field name, upload directory)`` for every stored file."""
+    return [
+        (model, model_field.name, model_field.upload_to.rstrip('/'))
+        for model in FILE_MODELS
+        for model_field in model._meta.get_fields()
+        if isinstance(model_field, models.FileField)
+    ]
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def walk(storage, directory: str) -> Iterator[tuple[str, int, datetime]]:
+    """Yield ``(name, size, modified)`` for every file below ``directory``."""
+    try:
+        root = storage.path(directory)
+    except NotImplementedError:
+        root = None
+    if root is None:
+        if not storage.exists(directory):
+            return
+        directories, files = storage.listdir(directory)
+        for filename in files:
+            name = f'{directory}/{filename}'
+            yield name, storage.size(name), storage.get_modified_time(name)
+        for subdirectory in directories:
+            yield from walk(storage, f'{directory}/{subdirectory}')
+        return
+
+    stack = [(root, directory)]
+    while stack:
+        path, prefix = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{prefix}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, name))
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+                    yield name, stat.st_size, modified
+
+
+def referenced(names: list[str], fields: Iterable[tuple[type[models.Model], str]]) -> set[str]:
+    found: set[str] = set()
+    for model, field_name in fields:
+        found.update(model.objects.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True))
+    return found
+
+
+def _delete(storage, name: str, dry_run: bool, limiter: RateLimiter) -> None:
+    if dry_run:
+        return
+    limiter.wait()
+    storage.delete(name)
+
+
+def collect_orphans(
+    report: GcReport,
+    grace: timedelta,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    limiter: RateLimiter | None = None,
+    limit: int = 0,
+) -> None:
+    limiter = limiter or RateLimiter(0)
+    cutoff = timezone.now() - grace
+    fields = file_fields()
+    archive_storage = tiering.archive_storage()
+    for directory in sorted({upload_dir for _, _, upload_dir in fields}):
+        owners = [(model, name) for model, name, upload_dir in fields if upload_dir == directory]
+        for batch in _batches(walk(default_storage, directory), batch_size):
+            report.scanned += len(batch)
+            old = [entry for entry in batch if entry[2] < cutoff]
+            if not old:
+                continue
+            live = referenced([name for name, _, _ in old], owners)
+            for name, size, _ in old:
+                if name in live:
+                    continue
+                if limit and report.orphans >= limit:
+                    return
+                report.orphans += 1
+                report.orphan_bytes += size
+                log.info('Orphaned media file %s (%d bytes)', name, size)
+                _delete(default_storage, name, dry_run, limiter)
+                if not dry_run:
+                    report.deleted += 1
+                    tiering.discard(name)
+
+        # Archived copies belong to their TieredFile entry, not to a row directly.
+        for batch in _batches(walk(archive_storage, directory), batch_size):
+            report.scanned += len(batch)
+            old = {
+                name[: -len(tiering.ARCHIVE_SUFFIX)]: (name, size)
+                for name, size, modified in batch
+                if modified < cutoff and name.endswith(tiering.ARCHIVE_SUFFIX)
+            }
+            if not old:
+                continue
+            live = set(
+                TieredFile.objects.filter(name__in=list(old), tier=TieredFile.Tier.ARCHIVE).values_list(
+                    'name', flat=True
+                )
+            )
+            for original, (name, size) in old.items():
+                if original in live:
+                    continue
+                if limit and report.orphans >= limit:
+                    return
+                report.orphans += 1
+                report.orphan_bytes += size
+                log.info('Orphaned archive file %s (%d bytes)', name, size)
+                _delete(archive_storage, name, dry_run, limiter)
+                if not dry_run:
+                    report.deleted += 1
+
+
+def prune_tier_entries(
+    report: GcReport, dry_run: bool = False, batch_size: int = 500, limiter: RateLimiter | None = None
+) -> None:
+    """Drop ``TieredFile`` rows (and archived copies) of files no row references any more."""
+    limiter = limiter or RateLimiter(0)
+    owners = [(model, name) for model, name, _ in file_fields()]
+    last_pk = 0
+    while True:
+        batch = list(TieredFile.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'name')[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        live = referenced([name for _, name in batch], owners)
+        for _, name in batch:
+            if name in live:
+                continue
+            report.stale_entries += 1
+            if not dry_run:
+                limiter.wait()
+                tiering.discard(name)
+
+
+def retention_rules() -> dict[str, tuple[models.QuerySet, int]]:
+    """Rule name -> (rows it applies to, days kept)."""
+    unfinished = [OcrJob.Status.FAILED, OcrJob.Status.PENDING, OcrJob.Status.PROCESSING]
+    return {
+        # Pending/processing rows this old belong to a worker that died mid-run.
+        'failed_jobs': (OcrJob.objects.filter(status__in=unfinished), settings.OCR_RETENTION_FAILED_DAYS),
+        'jobs': (OcrJob.objects.filter(status=OcrJob.Status.COMPLETED), settings.OCR_RETENTION_JOB_DAYS),
+        'word': (WordDocument.objects.all(), settings.OCR_RETENTION_WORD_DAYS),
+    }
+
+
+def purge(instance: models.Model) -> None:
+    """Delete a row together with its hot and archived files."""
+    for model_field in instance._meta.get_fields():
+        if isinstance(model_field, models.FileField):
+            stored = getattr(instance, model_field.name)
+            if stored:
+                tiering.delete(stored)
+    instance.delete()
+
+
+def apply_retention(
+    report: GcReport,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    limiter: RateLimiter | None = None,
+    rules: Iterable[str] | None = None,
+) -> None:
+    limiter = limiter or RateLimiter(0)
+    now = timezone.now()
+    for rule, (queryset, days) in retention_rules().items():
+        if days <= 0 or (rules is not None and rule not in rules):
+            continue
+        expired = queryset.filter(updated_at__lt=now - timedelta(days=days))
+        if dry_run:
+            report.expired[rule] = expired.count()
+            continue
+        report.expired[rule] = 0
+        # Re-query after each batch instead of holding a cursor open across deletes.
+        while batch := list(expired.order_by('pk')[:batch_size]):
+            for instance in batch:
+                limiter.wait()
+                purge(instance)
+            report.expired[rule] += len(batch)
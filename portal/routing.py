@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass, field
+
+from django.conf import settings
+
+from .models import OcrJob, PortalSettings
+
+try:  # pragma: no cover - optional dependency, shared with portal.preprocess
+    import cv2  # type: ignore
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    cv2 = None  # type: ignore
+    np = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+_TEXT_OPERATORS = {'Tj', 'TJ', "'", '"'}
+_RULING_OPERATORS = {'re', 'l'}
+
+
+@dataclass(slots=True)
+class DocumentProfile:
+    page_count: int = 0
+    sampled_pages: int = 0
+    text_pages: int = 0
+    image_dpi: int = 0
+    ruling_ops: int = 0
+    # From sample pages rendered at OCR_ROUTING_RASTER_DPI (scans have no vector rulings).
+    raster_pages: int = 0
+    table_joints: int = 0
+    columns: int = 0
+
+    @property
+    def has_text_layer(self) -> bool:
+        return self.sampled_pages > 0 and self.text_pages == self.sampled_pages
+
+    @property
+    def layout_complexity(self) -> float:
+        """Average number of ruling operators (lines, rectangles) per sampled page."""
+        if not self.sampled_pages:
+            return 0.0
+        return round(self.ruling_ops / self.sampled_pages, 1)
+
+    @property
+    def table_density(self) -> float:
+        """Average number of ruled-grid crossings per rendered page."""
+        if not self.raster_pages:
+            return 0.0
+        return round(self.table_joints / self.raster_pages, 1)
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data['has_text_layer'] = self.has_text_layer
+        data['layout_complexity'] = self.layout_complexity
+        data['table_density'] = self.table_density
+        return data
+
+
+@dataclass(slots=True)
+class RoutingDecision:
+    engine: str
+    reason: str
+    overrides: dict = field(default_factory=dict)
+
+
+def _sample_indexes(page_count: int, sample_size: int) -> list[int]:
+    if page_count <= sample_size:
+        return list(range(page_count))
+    step = page_count / sample_size
+    return sorted({int(step * index + step / 2) for index in range(sample_size)})
+
+
+def _page_image_dpi(page) -> int:
+    try:
+        x0, _, x1, _ = (float(value) for value in page.mediabox)
+    except Exception:  # noqa: BLE001 - malformed boxes just skip the estimate
+        return 0
+    width_inches = abs(x1 - x0) / 72
+    if width_inches <= 0:
+        return 0
+    best = 0
+    for image in page.images.values():
+        try:
+            pixel_width = int(image.Width)
+        except Exception:  # noqa: BLE001
+            continue
+        best = max(best, int(pixel_width / width_inches))
+    return best
+
+
+def _raster_layout(gray) -> tuple[int, int]:
+    """
+    ``(grid crossings, text columns)`` of a rendered page. Table rulings are the long
+    horizontal and vertical strokes left by a morphological opening; columns are runs
+    of inked x positions separated by wide blank gutters once the rulings are removed.
+    """
+    height, width = gray.shape
+    ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+    horizontal = cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, width // 20), 1))
+    )
+    vertical = cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, height // 30)))
+    )
+    grow = np.ones((5, 5), np.uint8)
+    crossings = cv2.bitwise_and(cv2.dilate(horizontal, grow), cv2.dilate(vertical, grow))
+    joints = cv2.connectedComponents(crossings)[0] - 1
+
+    text = cv2.subtract(ink, cv2.bitwise_or(horizontal, vertical))
+    occupied = (text > 0).sum(axis=0) > max(2, height // 100)
+    gutter, narrowest = max(3, width // 40), max(3, width // 10)
+    columns = run = blank = 0
+    for inked in occupied:
+        if inked:
+            run += 1 + (blank if blank < gutter else 0)
+            blank = 0
+        else:
+            blank += 1
+            if blank >= gutter and run:
+                columns += int(run >= narrowest)
+                run = 0
+    columns += int(run >= narrowest)
+    return joints, columns
+
+
+def _profile_raster(stream, indexes: list[int], profile: DocumentProfile) -> None:
+    import pypdfium2 as pdfium
+
+    stream.seek(0)
+    document = pdfium.PdfDocument(stream)
+    try:
+        for index in indexes:
+            page = document[index]
+            try:
+                array = page.render(scale=settings.OCR_ROUTING_RASTER_DPI / 72, grayscale=True).to_numpy()
+            finally:
+                page.close()
+            if array.ndim == 3:
+                array = array[:, :, 0]
+            joints, columns = _raster_layout(np.ascontiguousarray(array))
+            profile.raster_pages += 1
+            profile.table_joints += joints
+            profile.columns = max(profile.columns, columns)
+    finally:
+        document.close()
+
+
+def profile_document(stream, sample_size: int | None = None, raster: bool = False) -> DocumentProfile:
+    """
+    Build a cheap profile of a PDF by reading its structure with pikepdf. Only a few
+    evenly spaced pages are inspected. With ``raster``, the sampled pages of a scan
+    (no text layer) are also rendered at low resolution to find tables and columns,
+    which leave no vector operators in an image-only page.
+    """
+    profile = DocumentProfile()
+    try:
+        import pikepdf
+    except ImportError:  # pragma: no cover - pikepdf ships with ocrmypdf
+        return profile
+
+    if sample_size is None:
+        sample_size = getattr(settings, 'OCR_ROUTING_SAMPLE_PAGES', 3)
+
+    try:
+        with pikepdf.open(stream) as pdf:
+            profile.page_count = len(pdf.pages)
+            for index in _sample_indexes(profile.page_count, sample_size):
+                page = pdf.pages[index]
+                has_text = False
+                for _, operator in pikepdf.parse_content_stream(page):
+                    name = str(operator)
+                    if name in _TEXT_OPERATORS:
+                        has_text = True
+                    elif name in _RULING_OPERATORS:
+                        profile.ruling_ops += 1
+                profile.sampled_pages += 1
+                profile.text_pages += int(has_text)
+                profile.image_dpi = max(profile.image_dpi, _page_image_dpi(page))
+    except Exception:  # noqa: BLE001 - a profile is advisory, never fatal
+        log.debug('Document profiling failed.', exc_info=True)
+        return profile
+
+    if raster and not profile.has_text_layer and cv2 is not None and settings.OCR_ROUTING_RASTER_DPI:
+        try:
+            _profile_raster(stream, _sample_indexes(profile.page_count, sample_size), profile)
+        except Exception:  # noqa: BLE001
+            log.debug('Raster layout analysis failed.', exc_info=True)
+    return profile
+
+
+def count_pages(job: OcrJob) -> int:
+    try:
+        import pikepdf
+    except ImportError:  # pragma: no cover - pikepdf ships with ocrmypdf
+        return 0
+    try:
+        with job.source_file.open('rb') as source, pikepdf.open(source) as pdf:
+            return len(pdf.pages)
+    except Exception:  # noqa: BLE001 - page counts are informational
+        log.debug('Could not count pages for job %s.', job.id, exc_info=True)
+        return 0
+
+
+def _user_choices(options: dict) -> set[str]:
+    """Options the user set away from the upload form's defaults."""
+    from .forms import OcrRequestForm
+
+    fields = OcrRequestForm.base_fields
+    return {
+        name
+        for name, value in options.items()
+        if name in fields and bool(value) != bool(fields[name].initial)
+    }
+
+
+def choose_engine(profile: DocumentProfile, docling_available: bool) -> RoutingDecision:
+    table_threshold = getattr(settings, 'OCR_ROUTING_TABLE_THRESHOLD', 40)
+    docling_max_pages = getattr(settings, 'OCR_ROUTING_DOCLING_MAX_PAGES', 200)
+
+    if profile.has_text_layer:
+        return RoutingDecision(
+            PortalSettings.OcrEngine.OCRMYPDF,
+            'text-layer',
+            {'skip_text': True, 'force_ocr': False},
+        )
+
+    complex_layout = (
+        profile.layout_complexity >= table_threshold
+        or profile.table_density >= settings.OCR_ROUTING_RASTER_TABLE_THRESHOLD
+        or profile.columns >= settings.OCR_ROUTING_COLUMNS
+    )
+    if complex_layout and docling_available and profile.page_count <= docling_max_pages:
+        return RoutingDecision(PortalSettings.OcrEngine.DOCLING, 'complex-layout')
+
+    overrides = {}
+    if profile.image_dpi >= 400:
+        # Dense scans gain little from extra image cleanup; keep Tesseract on the fast path.
+        overrides = {'remove_background': False, 'clean_final': False}
+    reason = 'complex-layout-fallback' if complex_layout else 'plain-text'
+    return RoutingDecision(PortalSettings.OcrEngine.OCRMYPDF, reason, overrides)
+
+
+def route_job(job: OcrJob) -> RoutingDecision:
+    with job.source_file.open('rb') as source:
+        profile = profile_document(source, raster=True)
+
+    decision = choose_engine(profile, PortalSettings.docling_available())
+    options = job.options or {}
+    # Routing only fills in defaults: what the user chose on the form is kept.
+    chosen = _user_choices(options)
+    applied = {name: value for name, value in decision.overrides.items() if name not in chosen}
+    kept = {name: options[name] for name in decision.overrides if name in chosen}
+    options.update(applied)
+    options['pages'] = profile.page_count
+    options['routing'] = {
+        'engine': decision.engine,
+        'reason': decision.reason,
+        'overrides': applied,
+        'kept': kept,
+        'profile': profile.as_dict(),
+    }
+    job.options = options
+    log.info(
+        'Routed job %s to %s (%s, %d pages).',
+        job.id,
+        decision.engine,
+        decision.reason,
+        profile.page_count,
+    )
+    return decision
+
+
+def record_outcome(job: OcrJob, engine: str, duration: float, status: str) -> None:
+    routing = (job.options or {}).get('routing')
+    if routing is None:
+        return
+    routing['outcome'] = {
+        'engine': engine,
+        'status': status,
+        'seconds': round(duration, 3),
+    }
+
+
+def routing_summary(options_list) -> dict | None:
+    """
+    Compare routed jobs (an iterable of ``OcrJob.options``) against an "always Docling"
+    baseline. The Docling rate is measured from completed jobs that actually ran on Docling.
+    """
+    totals: dict[str, dict[str, float]] = {}
+    for options in options_list:
+        routing = (options or {}).get('routing') or {}
+        outcome = routing.get('outcome') or {}
+        if outcome.get('status') != OcrJob.Status.COMPLETED:
+            continue
+        pages = (routing.get('profile') or {}).get('page_count') or 0
+        bucket = totals.setdefault(outcome['engine'], {'jobs': 0, 'pages': 0, 'seconds': 0.0})
+        bucket['jobs'] += 1
+        bucket['pages'] += pages
+        bucket['seconds'] += outcome.get('seconds') or 0.0
+
+    if not totals:
+        return None
+
+    for bucket in totals.values():
+        seconds = bucket['seconds']
+        bucket['pages_per_second'] = round(bucket['pages'] / seconds, 2) if seconds else 0.0
+
+    pages = sum(bucket['pages'] for bucket in totals.values())
+    seconds = sum(bucket['seconds'] for bucket in totals.values())
+    docling_rate = totals.get(PortalSettings.OcrEngine.DOCLING, {}).get('pages_per_second')
+    docling_estimate = round(pages / docling_rate, 1) if docling_rate else None
+    return {
+        'engines': totals,
+        'pages': pages,
+        'seconds': round(seconds, 1),
+        'docling_estimate': docling_estimate,
+        'speedup': round(docling_estimate / seconds, 2) if docling_estimate and seconds else None,
+    }
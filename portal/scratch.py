@@ -0,0 +1,336 @@
+"""
+Scratch space for OCR jobs. OCRmyPDF keeps several rasterised copies of every page
+while it works, so a large scan needs gigabytes of temporary space; concurrent jobs
+writing to the container's root filesystem fail at random once it fills up.
+
+Every job works in its own directory on one of two tiers: ``OCR_SCRATCH_TMPFS_DIR``
+(RAM-backed, small) when the estimated footprint fits ``OCR_SCRATCH_TMPFS_MAX_MB``, else
+the ``OCR_SCRATCH_DIR`` volume. The footprint is estimated from page count and DPI and
+reserved before the job starts. Reservations are ledger files under ``.ledger`` in each
+tier, held with ``flock``; a crashed process drops its reservation and the next
+admission removes the leftover directory. Jobs that do not fit wait for space
+(``OCR_SCRATCH_WAIT_SECONDS``, ``OCR_SCRATCH_INLINE_WAIT_SECONDS`` inside a web request)
+and then raise :class:`ScratchUnavailable`; a job larger than a whole tier raises
+:class:`ScratchTooLarge` at once.
+
+OCRmyPDF has no work-folder option: it takes its work folder (and Tesseract and
+Ghostscript their temporaries) from ``TMPDIR``. :func:`run_in` therefore runs it in a
+child process whose ``TMPDIR`` is the job directory, so those files are counted against
+the reservation while the web process keeps its own ``TMPDIR`` for its other threads.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Callable, TypeVar
+
+from django.conf import settings
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+_POLL_SECONDS = 1.0
+LEDGER = '.ledger'
+# Letter/A4-sized pages; the estimate only needs the order of magnitude.
+PAGE_SQUARE_INCHES = 8.27 * 11.69
+# Bytes per page assumed when the page count cannot be read before the job starts.
+_BYTES_PER_PAGE_GUESS = 100 * 1024
+
+# Children of run_in() are forked from this server; it imports OCRmyPDF once, in a
+# process without the web process's threads.
+_FORKSERVER_PRELOAD = ['ocrmypdf']
+
+T = TypeVar('T')
+
+
+class ScratchUnavailable(RuntimeError):
+    """No tier had room for the job within the wait; it may fit later."""
+
+
+class ScratchTooLarge(RuntimeError):
+    """The job needs more than a whole tier; waiting or retrying cannot help."""
+
+
+@dataclass(slots=True)
+class Estimate:
+    pages: int
+    dpi: int
+    input_bytes: int
+    nbytes: int
+
+
+def configure() -> None:
+    """Point the process temporary directory (and child processes) at the scratch volume."""
+    multiprocessing.set_forkserver_preload(_FORKSERVER_PRELOAD)
+    root = Path(settings.OCR_SCRATCH_DIR)
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        log.warning('Scratch directory %s is not writable; using %s.', root, tempfile.gettempdir())
+        return
+    tempfile.tempdir = str(root)
+    os.environ['TMPDIR'] = str(root)
+
+
+def _use_tempdir(path: str) -> None:
+    tempfile.tempdir = os.environ['TMPDIR'] = path
+
+
+def run_in(directory: Path, function: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Call ``function`` (importable, with picklable arguments) in a child process whose
+    temporary files, and those of the programs it starts, go to ``directory``. Its
+    exceptions are raised here; a child that dies (e.g. killed for memory) raises
+    ``RuntimeError``.
+    """
+    context = multiprocessing.get_context('forkserver')
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=context, initializer=_use_tempdir, initargs=(str(directory),)
+    ) as pool:
+        try:
+            return pool.submit(function, *args, **kwargs).result()
+        except BrokenProcessPool as exc:
+            raise RuntimeError('Procesul OCR s-a oprit neașteptat (posibil din lipsă de memorie).') from exc
+
+
+def tiers() -> list[tuple[str, Path]]:
+    available = []
+    # Only an existing mount: creating the directory would put it on the root filesystem.
+    if settings.OCR_SCRATCH_TMPFS_DIR and Path(settings.OCR_SCRATCH_TMPFS_DIR).is_dir():
+        available.append(('tmpfs', Path(settings.OCR_SCRATCH_TMPFS_DIR)))
+    available.append(('volume', Path(settings.OCR_SCRATCH_DIR)))
+    return available
+
+
+def estimate(input_bytes: int, pages: int, dpi: int) -> int:
+    """Rasterised pages at ``dpi`` plus copies of the input and output PDFs."""
+    raster = pages * PAGE_SQUARE_INCHES * dpi * dpi * settings.OCR_SCRATCH_BYTES_PER_PIXEL
+    return int(raster + 3 * input_bytes + settings.OCR_SCRATCH_BASE_MB * _MB)
+
+
+def estimate_job(job) -> Estimate:
+    from . import bounded, media, tiering
+
+    tiering.ensure_hot(job.source_file)
+    input_bytes = job.source_file.size
+    options = job.options or {}
+    profile = (options.get('routing') or {}).get('profile') or {}
+    pages = options.get('pages') or profile.get('page_count') or 0
+    if not pages:
+        path = media.local_path(job.source_file.storage, job.source_file.name)
+        pages = bounded.page_count(path) if path is not None else 0
+    pages = pages or max(1, input_bytes // _BYTES_PER_PAGE_GUESS)
+    # The scan's own DPI when known; OCR never needs more than that.
+    dpi = profile.get('image_dpi') or settings.OCR_SCRATCH_DEFAULT_DPI
+    dpi = max(72, min(dpi, settings.OCR_SCRATCH_DEFAULT_DPI * 2))
+    return Estimate(pages, dpi, input_bytes, estimate(input_bytes, pages, dpi))
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    else:
+                        total += entry.stat(follow_symlinks=False).st_blocks * 512
+                except OSError:
+                    continue
+    return total
+
+
+def _outstanding(root: Path) -> int:
+    """
+    Space promised to running jobs but not yet written. Entries whose owner died are
+    unlocked; they are removed together with the directory they left behind.
+    """
+    outstanding = 0
+    for entry in (root / LEDGER).glob('*.lease'):
+        try:
+            handle = entry.open('r')
+        except FileNotFoundError:  # released since the listing
+            continue
+        with handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                reserved, _, directory = handle.read().partition(' ')
+                outstanding += max(0, int(reserved or 0) - directory_size(Path(directory)))
+                continue
+            _, _, directory = handle.read().partition(' ')
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+            entry.unlink(missing_ok=True)
+            log.info('Removed stale scratch reservation %s.', entry.name)
+    return outstanding
+
+
+def capacity(root: Path) -> int:
+    """The most any single job can get on ``root``, with nothing else running."""
+    return shutil.disk_usage(root).total - settings.OCR_SCRATCH_HEADROOM_MB * _MB
+
+
+def available(root: Path) -> int:
+    return shutil.disk_usage(root).free - settings.OCR_SCRATCH_HEADROOM_MB * _MB - _outstanding(root)
+
+
+def _try_reserve(tier: str, root: Path, nbytes: int, label: str) -> 'Reservation | None':
+    ledger = root / LEDGER
+    ledger.mkdir(parents=True, exist_ok=True)
+    with (ledger / 'admission.lock').open('a') as gate:
+        fcntl.flock(gate, fcntl.LOCK_EX)
+        try:
+            if available(root) < nbytes:
+                return None
+            token = f'{label}-{uuid.uuid4().hex[:8]}'
+            directory = root / token
+            directory.mkdir()
+            handle = (ledger / f'{token}.lease').open('w')
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.write(f'{nbytes} {directory}')
+            handle.flush()
+            return Reservation(tier, directory, nbytes, handle)
+        finally:
+            fcntl.flock(gate, fcntl.LOCK_UN)
+
+
+def _check_capacity(candidates: list[tuple[str, Path]], nbytes: int) -> None:
+    capacities = []
+    for _, root in candidates:
+        try:
+            capacities.append(capacity(root))
+        except OSError:
+            continue
+    if capacities and nbytes > max(capacities):
+        metrics.record_scratch_event('none', 'too_large')
+        raise ScratchTooLarge(
+            'Documentul este prea mare pentru spațiul temporar al serverului '
+            f'(necesar {nbytes // _MB} MB, maxim {max(capacities) // _MB} MB).'
+        )
+
+
+def reserve(nbytes: int, label: str = 'job', wait: float | None = None) -> 'Reservation':
+    """
+    Reserve ``nbytes`` on the fastest tier that has room, waiting up to ``wait``
+    seconds (default ``OCR_SCRATCH_WAIT_SECONDS``) for running jobs to finish when
+    none has. Small jobs that find tmpfs full spill to the volume.
+    """
+    candidates = [
+        (tier, root)
+        for tier, root in tiers()
+        if tier != 'tmpfs' or nbytes <= settings.OCR_SCRATCH_TMPFS_MAX_MB * _MB
+    ]
+    _check_capacity(candidates, nbytes)
+    started = time.monotonic()
+    deadline = started + (settings.OCR_SCRATCH_WAIT_SECONDS if wait is None else wait)
+    while True:
+        for tier, root in candidates:
+            try:
+                reservation = _try_reserve(tier, root, nbytes, label)
+            except OSError:
+                log.warning('Scratch tier %s (%s) is unusable.', tier, root, exc_info=True)
+                continue
+            if reservation is not None:
+                reservation.waited = time.monotonic() - started
+                if tier != candidates[0][0]:
+                    reservation.spills.append(f'{candidates[0][0]}_full')
+                return reservation
+        if time.monotonic() >= deadline:
+            metrics.record_scratch_event('none', 'unavailable')
+            raise ScratchUnavailable(
+                'Nu există suficient spațiu temporar pentru acest document. Încearcă din nou mai târziu.'
+            )
+        time.sleep(_POLL_SECONDS)
+
+
+def reserve_for(job, wait: float | None = None) -> 'Reservation':
+    need = estimate_job(job)
+    reservation = reserve(need.nbytes, f'job-{job.pk}', wait)
+    reservation.estimate = need
+    return reservation
+
+
+class Reservation:
+    """
+    A job's scratch directory and its ledger entry. Used as a context manager: a
+    background thread samples the directory size, and on exit the directory is
+    removed and the reservation released.
+    """
+
+    def __init__(self, tier: str, path: Path, nbytes: int, handle: IO) -> None:
+        self.tier = tier
+        self.path = path
+        self.nbytes = nbytes
+        self.estimate: Estimate | None = None
+        self.waited = 0.0
+        self.peak = 0
+        self.spills: list[str] = []
+        self._handle = handle
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f'scratch-{path.name}', daemon=True)
+
+    def measure(self) -> int:
+        used = directory_size(self.path)
+        self.peak = max(self.peak, used)
+        if used > self.nbytes and 'overrun' not in self.spills:
+            self.spills.append('overrun')
+            metrics.record_scratch_event(self.tier, 'overrun')
+            log.warning(
+                'Scratch %s uses %d MB, over its %d MB reservation.', self.path.name, used // _MB, self.nbytes // _MB
+            )
+        return used
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(settings.OCR_SCRATCH_SAMPLE_SECONDS):
+            self.measure()
+
+    def as_dict(self) -> dict:
+        data = {
+            'tier': self.tier,
+            'reserved_mb': round(self.nbytes / _MB, 1),
+            'peak_mb': round(self.peak / _MB, 1),
+            'waited': round(self.waited, 3),
+            'spills': list(self.spills),
+        }
+        if self.estimate is not None:
+            data.update(pages=self.estimate.pages, dpi=self.estimate.dpi)
+        return data
+
+    def __enter__(self) -> 'Reservation':
+        metrics.record_scratch_event(self.tier, 'reserved')
+        for spill in self.spills:
+            metrics.record_scratch_event(self.tier, spill)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._sampler.join()
+        self.measure()
+        metrics.record_scratch_peak(self.tier, self.peak)
+        shutil.rmtree(self.path, ignore_errors=True)
+        lease = Path(self._handle.name)
+        lease.unlink(missing_ok=True)
+        fcntl.flock(self._handle, fcntl.LOCK_UN)
+        self._handle.close()
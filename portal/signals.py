@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import tiering
 from .constants import MENU_CHOICES
-from .models import PortalAccess
+from .models import JobChunk, OcrJob, PortalAccess, StoredDocument, WordDocument
 
 
 @receiver(post_save, sender=get_user_model())
@@ -16,3 +18,24 @@ def ensure_portal_access(sender, instance, created, **kwargs):
             access.status = PortalAccess.Status.APPROVED
             access.allowed_menus = [key for key, _ in MENU_CHOICES]
             access.save(update_fields=['status', 'allowed_menus', 'updated_at'])
+
+
+@receiver(post_delete, sender=OcrJob)
+@receiver(post_delete, sender=StoredDocument)
+@receiver(post_delete, sender=WordDocument)
+def discard_archived_files(sender, instance, **kwargs):
+    # Deleting a row (or its folder) removes the archived copies of its files too.
+    for field in instance._meta.get_fields():
+        if isinstance(field, FileField):
+            name = getattr(instance, field.name).name
+            if name:
+                tiering.discard(name)
+
+
+@receiver(post_delete, sender=JobChunk)
+def delete_chunk_files(sender, instance, **kwargs):
+    # Checkpoints are never archived or shared, so their files go with the row
+    # (including when the job is deleted).
+    for field_file in (instance.pdf_file, instance.text_file, instance.structure_file):
+        if field_file:
+            field_file.delete(save=False)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import mimetypes
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+from . import media, metrics, tiering
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+
+async def _aiter_file(field_file, chunk_size: int = STREAM_CHUNK_SIZE):
+    # Blocking reads go to the default executor (not the thread-sensitive one), so
+    # many concurrent downloads never queue behind each other or behind sync views.
+    stream = await sync_to_async(field_file.storage.open, thread_sensitive=False)(field_file.name, 'rb')
+    try:
+        while True:
+            chunk = await sync_to_async(stream.read, thread_sensitive=False)(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(stream.close, thread_sensitive=False)()
+
+
+async def file_response(request, field_file, filename: str, view: str):
+    """
+    Serve a stored file as an attachment. Files on remote storage are handed off with a
+    redirect to a presigned URL. Under ASGI the body is an async iterator so the event
+    loop is never blocked; under WSGI a regular FileResponse (with sendfile support) is
+    returned.
+    """
+    await sync_to_async(tiering.ensure_hot, thread_sensitive=False)(field_file)
+    size = await sync_to_async(lambda: field_file.size, thread_sensitive=False)()
+    metrics.record_download(view, size)
+
+    content_type, encoding = mimetypes.guess_type(filename)
+    url = await sync_to_async(media.presigned_url, thread_sensitive=False)(field_file, filename, content_type)
+    if url:
+        return HttpResponseRedirect(url)
+
+    if not isinstance(request, ASGIRequest):
+        stream = await sync_to_async(field_file.storage.open, thread_sensitive=False)(field_file.name, 'rb')
+        return FileResponse(stream, as_attachment=True, filename=filename)
+
+    response = StreamingHttpResponse(
+        _aiter_file(field_file),
+        content_type=content_type or 'application/octet-stream',
+    )
+    response['Content-Length'] = str(size)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,42 @@
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+import pikepdf
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from .. import tiering
+from ..models import OcrJob
+
+
+class MediaTestCase(TestCase):
+    """Runs each test against an empty MEDIA_ROOT and archive root."""
+
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp(prefix='portal-tests-'))
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, OCR_ARCHIVE_ROOT=self.media_root / 'archive'
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        tiering.archive_storage.cache_clear()
+        self.addCleanup(tiering.archive_storage.cache_clear)
+        self.user = get_user_model().objects.create_user('reader', password='secret')
+
+    def make_job(self, **fields) -> OcrJob:
+        job = OcrJob.objects.create(user=self.user, **fields)
+        job.source_file.save('scan.pdf', ContentFile(make_pdf(1)), save=True)
+        return job
+
+
+def make_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    with pikepdf.new() as pdf:
+        for _ in range(pages):
+            pdf.add_blank_page(page_size=(595, 842))
+        pdf.save(buffer)
+    return buffer.getvalue()
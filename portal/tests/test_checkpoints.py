@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pikepdf
+
+from .. import checkpoints
+from ..bounded import Window
+from ..models import JobChunk
+from ..ocrdata import PageWords
+from .base import MediaTestCase, make_pdf
+
+
+class CheckpointTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.make_job()
+        self.work_dir = self.media_root / 'work'
+        self.work_dir.mkdir()
+        self.source = self.work_dir / 'source.pdf'
+        self.source.write_bytes(make_pdf(6))
+
+    def save_chunk(self, start: int, end: int, engine: str = 'ocrmypdf', text: str | None = None) -> JobChunk:
+        window = Window(start, end)
+        part = checkpoints.extract(self.source, window, self.work_dir / f'part-{start}.pdf')
+        text_path = self.work_dir / f'part-{start}.txt'
+        text_path.write_text(text if text is not None else f'pages {start}-{end}\n', encoding='utf-8')
+        pages = [PageWords(page, 100, 100, ['word']) for page in range(1, window.pages + 1)]
+        return checkpoints.save(
+            self.job, engine, window, part, text_path, checkpoints.shift_pages(pages, start - 1)
+        )
+
+    def test_plan_splits_remaining_pages(self):
+        self.assertEqual(
+            checkpoints.plan(7, start=3, size=2), [Window(3, 4), Window(5, 6), Window(7, 7)]
+        )
+
+    def test_completed_keeps_contiguous_chunks_of_the_engine(self):
+        self.save_chunk(1, 2)
+        self.save_chunk(3, 4)
+        gap = self.save_chunk(6, 6)
+
+        chunks = checkpoints.completed(self.job, 'ocrmypdf')
+
+        self.assertEqual([(chunk.first_page, chunk.last_page) for chunk in chunks], [(1, 2), (3, 4)])
+        self.assertEqual(checkpoints.next_page(chunks), 5)
+        self.assertFalse(JobChunk.objects.filter(pk=gap.pk).exists())
+        self.assertFalse(self.job.chunks.filter(first_page=6).exists())
+
+    def test_completed_drops_chunks_of_another_engine(self):
+        self.save_chunk(1, 3, engine='docling')
+        self.assertEqual(checkpoints.completed(self.job, 'ocrmypdf'), [])
+        self.assertFalse(self.job.chunks.exists())
+
+    def test_saving_the_same_range_replaces_the_chunk(self):
+        self.save_chunk(1, 2, text='first attempt\n')
+        self.save_chunk(1, 2, text='second attempt\n')
+        chunk = self.job.chunks.get()
+        with chunk.text_file.open('rb') as stream:
+            self.assertEqual(stream.read(), b'second attempt\n')
+
+    def test_assemble_joins_pdf_text_and_structure(self):
+        self.save_chunk(1, 2)
+        self.save_chunk(3, 6)
+        chunks = checkpoints.completed(self.job, 'ocrmypdf')
+        output_dir = self.work_dir / 'out'
+        output_dir.mkdir()
+
+        text_bytes = checkpoints.assemble(chunks, output_dir, self.source, 6)
+
+        sidecar = (output_dir / 'sidecar.txt').read_text(encoding='utf-8')
+        self.assertEqual(sidecar, 'pages 1-2\npages 3-6\n')
+        self.assertEqual(text_bytes, len(sidecar.encode('utf-8')))
+        with pikepdf.open(output_dir / 'output.pdf') as pdf:
+            self.assertEqual(len(pdf.pages), 6)
+        pages = [page.page for page in checkpoints.structure_pages(chunks, output_dir)]
+        self.assertEqual(pages, [1, 2, 3, 4, 5, 6])
+
+    def test_assemble_copies_source_when_chunks_miss_pages(self):
+        chunk = self.save_chunk(1, 2)
+        chunk.pdf_file.delete(save=True)
+        output_dir = self.work_dir / 'out'
+        output_dir.mkdir()
+
+        checkpoints.assemble([chunk], output_dir, self.source, 6)
+
+        self.assertEqual((output_dir / 'output.pdf').read_bytes(), self.source.read_bytes())
+
+    def test_discard_deletes_rows_and_files(self):
+        chunk = self.save_chunk(1, 2)
+        path = Path(chunk.pdf_file.path)
+        self.assertEqual(checkpoints.discard(self.job), 1)
+        self.assertFalse(self.job.chunks.exists())
+        self.assertFalse(path.exists())
@@ -0,0 +1,186 @@
+import io
+import random
+import time
+from unittest import mock
+
+import numpy as np
+import pikepdf
+import pypdfium2
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from PIL import Image, ImageDraw, ImageFont
+
+from .. import compression
+from ..governor import GovernorBusy
+from ..models import OcrJob
+from .base import MediaTestCase
+
+
+def text_block(height: int = 400, width: int = 300) -> np.ndarray:
+    """Bilevel page (True = paper) with a bar and a column of ink."""
+    paper = np.ones((height, width), bool)
+    paper[100:120, 50:250] = False
+    paper[200:300, 100:110] = False
+    return paper
+
+
+def scanned_page(paper=255, ink=0, mode: str = 'L') -> np.ndarray:
+    """A4 page at 300 DPI of running text drawn without anti-aliasing."""
+    image = Image.new(mode, (2480, 3508), paper)
+    draw = ImageDraw.Draw(image)
+    draw.fontmode = '1'
+    font = ImageFont.truetype(settings.OCR_BENCH_FONT, 42)
+    rng = random.Random(7)
+    for line in range(60):
+        words = (''.join(rng.choice('acemnorsuvwxz') for _ in range(rng.randint(2, 9))) for _ in range(14))
+        draw.text((150, 150 + line * 52), ' '.join(words), font=font, fill=ink)
+    return np.asarray(image)
+
+
+def render(stream_factory, size: tuple[int, int]) -> np.ndarray:
+    """Draw the image XObject built by ``stream_factory(pdf)`` over a page; True = white."""
+    height, width = size
+    with pikepdf.new() as pdf:
+        page = pdf.add_blank_page(page_size=(width, height))
+        page.Resources = pikepdf.Dictionary(
+            XObject=pikepdf.Dictionary(Im0=pdf.make_indirect(stream_factory(pdf)))
+        )
+        page.Contents = pdf.make_stream(f'q 0 g {width} 0 0 {height} 0 0 cm /Im0 Do Q'.encode())
+        buffer = io.BytesIO()
+        pdf.save(buffer)
+    document = pypdfium2.PdfDocument(buffer.getvalue())
+    try:
+        image = document[0].render(scale=1).to_pil().convert('L')
+    finally:
+        document.close()
+    return np.asarray(image) > 127
+
+
+class BilevelStreamTests(SimpleTestCase):
+    def setUp(self):
+        # Without jbig2, and with Flate made to lose, the page is written as CCITT G4.
+        for patcher in (
+            mock.patch.object(compression, '_jbig2_binary', return_value=None),
+            mock.patch.object(compression.zlib, 'compress', return_value=b'\0' * 10**6),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_ccitt_image_decodes_to_the_same_pixels(self):
+        paper = text_block()
+        report = compression.CompressionReport()
+
+        decoded = render(lambda pdf: compression._bilevel_stream(pdf, paper, report), paper.shape)
+
+        self.assertEqual(report.encoder, 'ccitt')
+        np.testing.assert_array_equal(decoded, paper)
+
+    def test_ccitt_mask_paints_only_the_ink(self):
+        paper = text_block()
+        report = compression.CompressionReport()
+
+        decoded = render(
+            lambda pdf: compression._bilevel_stream(pdf, paper, report, image_mask=True), paper.shape
+        )
+
+        np.testing.assert_array_equal(decoded, paper)
+
+
+class ClassifyTests(SimpleTestCase):
+    def test_black_text_on_white_is_bitonal(self):
+        self.assertEqual(compression.classify(scanned_page()), 'bitonal')
+
+    def test_text_on_grey_or_cream_paper_is_mrc(self):
+        self.assertEqual(compression.classify(scanned_page(paper=190, ink=20)), 'mrc')
+        cream = scanned_page(paper=(250, 240, 215), ink=(0, 0, 0), mode='RGB')
+        self.assertEqual(compression.classify(cream), 'mrc')
+
+
+def scanned_pdf() -> bytes:
+    """One-page PDF holding ``scanned_page()`` as an 8-bit greyscale image."""
+    page_image = scanned_page()
+    buffer = io.BytesIO()
+    with pikepdf.new() as pdf:
+        page = pdf.add_blank_page(page_size=(595, 842))
+        image = pikepdf.Stream(pdf, page_image.tobytes())
+        image.Type = pikepdf.Name.XObject
+        image.Subtype = pikepdf.Name.Image
+        image.Width, image.Height = page_image.shape[1], page_image.shape[0]
+        image.ColorSpace = pikepdf.Name.DeviceGray
+        image.BitsPerComponent = 8
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=pdf.make_indirect(image)))
+        page.Contents = pdf.make_stream(b'q 595 0 0 842 0 0 cm /Im0 Do Q')
+        pdf.save(buffer, compress_streams=True)
+    return buffer.getvalue()
+
+
+class CompressJobTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        overrides = self.settings(OCR_GOVERNOR_DIR=self.media_root / 'governor')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.job = self.make_job(status=OcrJob.Status.COMPLETED)
+        self.job.processed_file.save('scan_ocr.pdf', ContentFile(scanned_pdf()), save=True)
+
+    def state(self) -> dict:
+        self.job.refresh_from_db()
+        return self.job.options['compression']
+
+    def set_state(self, **state) -> None:
+        self.job.options = {'compression': state}
+        self.job.save(update_fields=['options'])
+
+    def test_compresses_and_swaps_the_processed_file(self):
+        before = self.job.processed_file.size
+
+        state = compression.compress_job(self.job.pk)
+
+        self.assertEqual(state['status'], 'done')
+        self.assertEqual(state['images'], {'bitonal': 1})
+        self.assertEqual(self.state()['status'], 'done')
+        with pikepdf.open(self.job.processed_file.path) as pdf:
+            self.assertEqual(len(pdf.pages), 1)
+        self.assertLess(self.job.processed_file.size, before)
+
+    def test_busy_governor_leaves_the_job_pending(self):
+        self.set_state(status='pending')
+
+        with mock.patch('portal.governor.admit', side_effect=GovernorBusy('busy')):
+            with self.assertRaises(GovernorBusy):
+                compression.compress_job(self.job.pk)
+
+        self.assertEqual(self.state()['status'], 'pending')
+        self.assertEqual(list(compression.pending_jobs()), [self.job])
+
+    def test_running_job_is_not_compressed_twice(self):
+        self.set_state(status='running', started_at=time.time())
+
+        self.assertIsNone(compression.compress_job(self.job.pk))
+        self.assertEqual(compression.requeue_stale(), 0)
+        self.assertEqual(self.state()['status'], 'running')
+
+    def test_interrupted_job_is_queued_again(self):
+        with self.settings(OCR_COMPRESSION_STALE_SECONDS=60):
+            self.set_state(status='running', started_at=time.time() - 120)
+
+            with self.assertLogs('portal.compression', 'WARNING'):
+                self.assertEqual(compression.requeue_stale(), 1)
+
+        self.assertEqual(self.state()['status'], 'pending')
+
+
+class SummarizeTests(SimpleTestCase):
+    def test_counts_only_finished_jobs(self):
+        summary = compression.summarize(
+            [
+                {'compression': {'status': 'done', 'before': 1000, 'after': 400}},
+                {'compression': {'status': 'skipped', 'before': 500, 'after': 500}},
+                {'compression': {'status': 'running'}},
+                None,
+            ]
+        )
+
+        self.assertEqual(summary, {'jobs': 2, 'before': 1500, 'after': 900, 'saved': 600, 'ratio': 0.6})
+        self.assertIsNone(compression.summarize([{'compression': {'status': 'failed'}}]))
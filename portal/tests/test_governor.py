@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import governor, workers
+from ..governor import GovernorBusy
+from ..models import OcrJob
+from .base import MediaTestCase
+
+_MB = 1024 * 1024
+
+
+class GovernorTests(SimpleTestCase):
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp(prefix='portal-governor-'))
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overrides = self.settings(
+            OCR_GOVERNOR=True,
+            OCR_GOVERNOR_DIR=directory,
+            OCR_GOVERNOR_CPUS=4,
+            OCR_JOB_CPUS=2,
+            OCR_JOB_MEMORY_MB=500,
+            OCR_DOCLING_JOB_MEMORY_MB=1500,
+            OCR_GOVERNOR_RESERVE_MB=300,
+            OCR_GOVERNOR_WAIT_SECONDS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for name, value in (('memory_limit', None), ('memory_working_set', None)):
+            patcher = mock.patch(f'ocrsite.cgroup.{name}', return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_capacity_splits_cpus_and_memory(self):
+        self.assertEqual(governor.capacity().units, 2)
+        with mock.patch('ocrsite.cgroup.memory_limit', return_value=1300 * _MB):
+            cap = governor.capacity()
+        self.assertEqual((cap.cpus, cap.job_cpus, cap.units), (4, 2, 2))
+        with mock.patch('ocrsite.cgroup.memory_limit', return_value=800 * _MB):
+            self.assertEqual(governor.capacity().units, 1)
+
+    def test_docling_needs_units_for_its_memory(self):
+        self.assertEqual(governor.units_for('ocrmypdf', 4), 1)
+        self.assertEqual(governor.units_for('docling', 4), 3)
+        self.assertEqual(governor.units_for('docling', 2), 2)
+
+    def test_admit_holds_units_until_the_block_ends(self):
+        with governor.admit('ocrmypdf') as first, governor.admit('ocrmypdf') as second:
+            self.assertEqual((first.cpus, first.units, second.units), (2, 1, 1))
+            self.assertEqual(governor.in_use(), 2)
+            with self.assertRaises(GovernorBusy):
+                with governor.admit('ocrmypdf'):
+                    pass
+        self.assertEqual(governor.in_use(), 0)
+
+    def test_multi_unit_job_waits_for_all_its_units(self):
+        with governor.admit('ocrmypdf'):
+            with self.assertRaises(GovernorBusy):
+                with governor.admit('docling'):
+                    pass
+            self.assertEqual(governor.in_use(), 1)
+        with governor.admit('docling') as budget:
+            self.assertEqual(budget.units, 2)
+
+    def test_memory_pressure_blocks_admission(self):
+        with mock.patch('ocrsite.cgroup.memory_limit', return_value=2000 * _MB), mock.patch(
+            'ocrsite.cgroup.memory_working_set', return_value=1900 * _MB
+        ):
+            with self.assertRaises(GovernorBusy):
+                with governor.admit('ocrmypdf'):
+                    pass
+
+    def test_disabled_governor_admits_everything(self):
+        with self.settings(OCR_GOVERNOR=False):
+            with governor.admit('docling') as budget:
+                self.assertEqual(budget.units, 0)
+                self.assertEqual(governor.in_use(), 0)
+
+
+class BusyWorkerTests(MediaTestCase):
+    def test_process_requeues_jobs_the_governor_cannot_admit(self):
+        worker = workers.register('test-worker')
+        job = self.make_job()
+        claimed = workers.claim(worker)
+
+        with mock.patch('portal.views._run_ocr', side_effect=GovernorBusy('no units')):
+            with self.assertLogs('portal.workers'):
+                self.assertIsNone(workers.process(worker, claimed))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OcrJob.Status.PENDING)
+        self.assertEqual(job.attempts, 0)
+        self.assertIsNone(job.lease_owner_id)
@@ -0,0 +1,67 @@
+import io
+
+from django.test import TestCase
+
+from ..ocrdata import PageReader, PageWords, read_index, write_pages
+
+
+class OcrDataTests(TestCase):
+    def make_pages(self) -> list[PageWords]:
+        first = PageWords(1, 600, 800)
+        first.add('Ștefan,', 10, 20, 60, 40, 95)
+        first.add('cel', 70, 20, 90, 40, 90)
+        first.add('Mare', 100, 20, 140, 40, 88)
+        second = PageWords(2, 600, 800)
+        # Docling stores whole lines as one entry.
+        second.add('Despre ȘTEFAN cel Mare', 10, 10, 300, 30)
+        return [first, second]
+
+    def write(self, pages) -> io.BytesIO:
+        stream = io.BytesIO()
+        self.assertEqual(write_pages(stream, pages), len(pages))
+        stream.seek(0)
+        return stream
+
+    def test_round_trip(self):
+        reader = PageReader(self.write(self.make_pages()))
+
+        self.assertEqual(reader.pages, [1, 2])
+        page = reader.page(1)
+        self.assertEqual(page.words, ['Ștefan,', 'cel', 'Mare'])
+        self.assertEqual(page.confidence, [95, 90, 88])
+        self.assertEqual(page.boxes[0], (167, 250, 1000, 500))
+        self.assertIsNone(reader.page(3))
+        self.assertEqual([page.page for page in reader], [1, 2])
+
+
+    def test_search_ignores_case_diacritics_and_punctuation(self):
+        reader = PageReader(self.write(self.make_pages()))
+
+        hits = reader.search('stefan')
+
+        self.assertEqual([hit['page'] for hit in hits], [1, 2])
+        self.assertEqual(hits[0]['text'], 'Ștefan,')
+        self.assertEqual(hits[0]['rects'], [[0.0167, 0.025, 0.1, 0.05]])
+
+    def test_search_matches_phrases_across_entries(self):
+        reader = PageReader(self.write(self.make_pages()))
+
+        hits = reader.search('Ștefan cel mare')
+
+        self.assertEqual([hit['page'] for hit in hits], [1, 2])
+        self.assertEqual(hits[0]['text'], 'Ștefan, cel Mare')
+        self.assertEqual(len(hits[0]['rects']), 3)
+        self.assertEqual(hits[1]['text'], 'Despre ȘTEFAN cel Mare')
+        self.assertEqual(reader.search('cel stefan'), [])
+        self.assertEqual(reader.search('absent'), [])
+        self.assertEqual(reader.search('  '), [])
+
+
+    def test_term_index_lists_pages(self):
+        _, terms = read_index(self.write(self.make_pages()))
+        self.assertEqual(sorted(terms['stefan']), [1, 2])
+        self.assertEqual(terms['despre'], [2])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            read_index(io.BytesIO(b'%PDF-1.7 not a structured result' * 4))
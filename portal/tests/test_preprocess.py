@@ -0,0 +1,121 @@
+import io
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pikepdf
+from django.conf import settings
+from django.test import SimpleTestCase
+from PIL import Image, ImageDraw, ImageFont
+
+from ..preprocess import (
+    PreprocessOptions,
+    clear_borders,
+    denoise,
+    estimate_skew,
+    flatten_background,
+    preprocess_pdf,
+    rotate,
+    text_pages,
+)
+
+DPI = 150
+
+
+def text_image(lines: int = 25) -> np.ndarray:
+    """Greyscale A4 page at ``DPI`` with lines of running text."""
+    image = Image.new('L', (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.truetype(settings.OCR_BENCH_FONT, 22)
+    rng = random.Random(11)
+    for line in range(lines):
+        words = (''.join(rng.choice('acemnorsuvwxz') for _ in range(rng.randint(2, 8))) for _ in range(12))
+        draw.text((120, 150 + line * 40), ' '.join(words), font=font, fill=0)
+    return np.asarray(image)
+
+
+def mixed_pdf(path: Path) -> None:
+    """Page 1 has a text layer, page 2 is a scan."""
+    scan = io.BytesIO()
+    Image.fromarray(text_image()).save(scan, 'PDF', resolution=DPI)
+    with pikepdf.open(io.BytesIO(scan.getvalue())) as scanned, pikepdf.new() as pdf:
+        page = pdf.add_blank_page(page_size=(595, 842))
+        font = pdf.make_indirect(
+            pikepdf.Dictionary(Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica)
+        )
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        page.Contents = pdf.make_stream(b'BT /F1 12 Tf 72 720 Td (Born-digital page with a text layer) Tj ET')
+        pdf.pages.append(scanned.pages[0])
+        pdf.save(path)
+
+
+class OptionsTests(SimpleTestCase):
+    def test_job_options_map_to_steps(self):
+        options = PreprocessOptions.from_job_options({'deskew': True, 'remove_background': True}, dpi=200)
+        self.assertTrue(options.enabled)
+        self.assertTrue(options.background)
+        self.assertFalse(options.bilevel)
+        self.assertTrue(options.keep_text_pages)
+
+        clean = PreprocessOptions.from_job_options({'clean_final': True, 'force_ocr': True})
+        self.assertTrue(clean.background and clean.denoise and clean.borders and clean.bilevel)
+        self.assertFalse(clean.keep_text_pages)
+        self.assertFalse(PreprocessOptions.from_job_options({}).enabled)
+
+
+class StepTests(SimpleTestCase):
+    def test_estimate_skew_finds_the_rotation(self):
+        page = text_image()
+        self.assertAlmostEqual(estimate_skew(rotate(page, 2.0)), -2.0, delta=0.2)
+        self.assertAlmostEqual(estimate_skew(page), 0.0, delta=0.2)
+
+    def test_flatten_background_keeps_grey_levels(self):
+        page = np.full((300, 300), 200, np.uint8)
+        page[100:104, 50:250] = 100
+
+        flat = flatten_background(page, DPI)
+
+        self.assertGreater(int(flat[20, 20]), 250)
+        self.assertTrue(100 < int(flat[102, 150]) < 160)
+
+    def test_denoise_and_clear_borders(self):
+        binary = np.full((300, 300), 255, np.uint8)
+        binary[:, :12] = 0
+        binary[150, 150] = 0
+        binary[100:110, 50:250] = 0
+
+        cleaned = clear_borders(denoise(binary, 300))
+
+        self.assertEqual(int(cleaned[:, :12].min()), 255)
+        self.assertEqual(int(cleaned[150, 150]), 255)
+        self.assertEqual(int(cleaned[100:110, 50:250].max()), 0)
+
+
+class PreprocessPdfTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix='portal-preprocess-'))
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.source = self.work_dir / 'mixed.pdf'
+        mixed_pdf(self.source)
+
+    def test_text_pages_are_passed_through(self):
+        destination = self.work_dir / 'clean.pdf'
+
+        angles = preprocess_pdf(self.source, destination, PreprocessOptions(deskew=True, dpi=DPI))
+
+        self.assertIsNone(angles[0])
+        self.assertIsInstance(angles[1], float)
+        self.assertEqual(text_pages(destination), (2, {0}))
+        with pikepdf.open(destination) as pdf:
+            self.assertEqual(len(pdf.pages), 2)
+            self.assertEqual(len(pdf.pages[1].images), 1)
+
+    def test_forced_ocr_rasterises_every_page(self):
+        destination = self.work_dir / 'clean.pdf'
+        options = PreprocessOptions(background=True, dpi=DPI, keep_text_pages=False)
+
+        self.assertEqual(preprocess_pdf(self.source, destination, options), [0.0, 0.0])
+        self.assertEqual(text_pages(destination), (2, set()))
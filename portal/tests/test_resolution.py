@@ -0,0 +1,112 @@
+import random
+import shutil
+import sys
+import tempfile
+import types
+from pathlib import Path
+from unittest import mock
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase
+from PIL import Image, ImageDraw, ImageFont
+
+from .. import resolution
+from ..resolution import ResolutionPlan, colour_mode, plan_resolution, required_dpi
+
+
+def text_scan(path: Path, font_px: int, dpi: int = 300) -> None:
+    """Letter-size page of running text at ``dpi``, saved as an image-only PDF."""
+    image = Image.new('L', (int(8.5 * dpi), 11 * dpi), 255)
+    draw = ImageDraw.Draw(image)
+    draw.fontmode = '1'
+    font = ImageFont.truetype(settings.OCR_BENCH_FONT, font_px)
+    rng = random.Random(5)
+    for line in range(40):
+        words = (''.join(rng.choice('acemnorsuvwxz') for _ in range(rng.randint(2, 8))) for _ in range(12))
+        draw.text((dpi // 2, dpi // 2 + line * font_px * 5 // 4), ' '.join(words), font=font, fill=0)
+    image.save(path, resolution=dpi)
+
+
+def fake_ocrmypdf(*options: str) -> dict:
+    """``sys.modules`` entries for an OCRmyPDF whose Tesseract plugin adds ``options``."""
+
+    def add_options(parser):
+        for option in options:
+            parser.add_argument(option)
+
+    plugin = types.ModuleType('ocrmypdf.builtin_plugins.tesseract_ocr')
+    plugin.add_options = add_options
+    plugins = types.ModuleType('ocrmypdf.builtin_plugins')
+    plugins.tesseract_ocr = plugin
+    return {
+        'ocrmypdf': types.ModuleType('ocrmypdf'),
+        'ocrmypdf.builtin_plugins': plugins,
+        'ocrmypdf.builtin_plugins.tesseract_ocr': plugin,
+    }
+
+
+class RequiredDpiTests(SimpleTestCase):
+    def test_rounds_up_to_the_target_and_caps_at_native(self):
+        with self.settings(OCR_TARGET_XHEIGHT_PX=20, OCR_ADAPTIVE_MIN_DPI=150):
+            self.assertEqual(required_dpi(5.76, 600), 250)
+            self.assertEqual(required_dpi(5.76, 200), 200)
+            self.assertEqual(required_dpi(30.0, 600), 150)
+            self.assertEqual(required_dpi(None, 600), 0)
+            self.assertEqual(required_dpi(5.76, 0), 0)
+
+
+class ColourModeTests(SimpleTestCase):
+    def test_modes(self):
+        page = np.full((200, 200, 3), 255, np.uint8)
+        page[50:60, 20:180] = 0
+        self.assertEqual(colour_mode(page), 'bitonal')
+
+        shaded = page.copy()
+        shaded[100:180, 20:180] = 128
+        self.assertEqual(colour_mode(shaded), 'grey')
+
+        stamped = page.copy()
+        cv2.circle(stamped, (100, 140), 30, (0, 0, 220), -1)
+        self.assertEqual(colour_mode(stamped), 'colour')
+
+
+class PlanTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix='portal-resolution-'))
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        resolution.tesseract_downsample_supported.cache_clear()
+        self.addCleanup(resolution.tesseract_downsample_supported.cache_clear)
+
+    def test_dense_scan_is_planned_at_a_lower_dpi(self):
+        path = self.work_dir / 'scan.pdf'
+        text_scan(path, font_px=42)
+
+        with self.settings(OCR_TARGET_XHEIGHT_PX=20, OCR_ADAPTIVE_MIN_DPI=150):
+            plan = plan_resolution(path, native_dpi=300)
+
+        self.assertAlmostEqual(plan.pages[0].x_height_pt, 5.5, delta=0.5)
+        self.assertEqual(plan.dpi, 250)
+        self.assertTrue(plan.reduced)
+        self.assertEqual(plan.page_inches, 11.0)
+
+    def test_kwargs_use_downsampling_only_when_ocrmypdf_has_it(self):
+        plan = ResolutionPlan(native_dpi=600, dpi=300, mode='grey', page_inches=11.69)
+
+        with mock.patch.dict(
+            sys.modules, fake_ocrmypdf('--tesseract-downsample-large-images', '--tesseract-downsample-above')
+        ):
+            self.assertEqual(
+                plan.ocrmypdf_kwargs(),
+                {
+                    'tesseract_downsample_large_images': True,
+                    'tesseract_downsample_above': 3507,
+                    'portal_ocr_colour': 'grey',
+                },
+            )
+
+        resolution.tesseract_downsample_supported.cache_clear()
+        with mock.patch.dict(sys.modules, fake_ocrmypdf('--tesseract-timeout')):
+            with self.assertLogs('portal.resolution', 'WARNING'):
+                self.assertEqual(plan.ocrmypdf_kwargs(), {'portal_ocr_colour': 'grey'})
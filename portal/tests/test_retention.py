@@ -0,0 +1,43 @@
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from .. import retention
+from .base import MediaTestCase
+
+
+class RetentionTests(MediaTestCase):
+    def write_media(self, name: str, age: timedelta) -> Path:
+        path = self.media_root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'%PDF-1.4\n')
+        stamp = time.time() - age.total_seconds()
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_collect_orphans_dry_run_only_reports(self):
+        job = self.make_job()
+        live = self.write_media(job.source_file.name, timedelta(days=3))
+        orphan = self.write_media('uploads/orphan.pdf', timedelta(days=3))
+        recent = self.write_media('processed/recent.pdf', timedelta(minutes=5))
+        report = retention.GcReport()
+
+        retention.collect_orphans(report, grace=timedelta(days=1), dry_run=True)
+
+        self.assertEqual(report.orphans, 1)
+        self.assertEqual(report.orphan_bytes, orphan.stat().st_size)
+        self.assertEqual(report.deleted, 0)
+        self.assertGreaterEqual(report.scanned, 3)
+        self.assertTrue(orphan.exists())
+        self.assertTrue(live.exists())
+        self.assertTrue(recent.exists())
+
+    def test_collect_orphans_deletes_outside_dry_run(self):
+        orphan = self.write_media('uploads/orphan.pdf', timedelta(days=3))
+        report = retention.GcReport()
+
+        retention.collect_orphans(report, grace=timedelta(days=1))
+
+        self.assertEqual((report.orphans, report.deleted), (1, 1))
+        self.assertFalse(orphan.exists())
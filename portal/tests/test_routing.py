@@ -0,0 +1,143 @@
+import io
+from unittest import mock
+
+import cv2
+import numpy as np
+import pikepdf
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from ..models import PortalSettings
+from ..routing import DocumentProfile, _raster_layout, choose_engine, profile_document, route_job, routing_summary
+from .base import MediaTestCase
+
+OCRMYPDF = PortalSettings.OcrEngine.OCRMYPDF
+DOCLING = PortalSettings.OcrEngine.DOCLING
+
+
+def text_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    with pikepdf.new() as pdf:
+        for _ in range(pages):
+            page = pdf.add_blank_page(page_size=(595, 842))
+            page.Contents = pdf.make_stream(b'BT /F1 12 Tf 72 720 Td (Text) Tj ET')
+        pdf.save(buffer)
+    return buffer.getvalue()
+
+
+def scan_pdf(pixel_width: int) -> bytes:
+    """One A4 page showing a white image ``pixel_width`` pixels wide."""
+    buffer = io.BytesIO()
+    with pikepdf.new() as pdf:
+        page = pdf.add_blank_page(page_size=(595, 842))
+        image = pikepdf.Stream(pdf, b'\xff' * pixel_width * 8)
+        image.Type, image.Subtype = pikepdf.Name.XObject, pikepdf.Name.Image
+        image.Width, image.Height = pixel_width, 8
+        image.ColorSpace, image.BitsPerComponent = pikepdf.Name.DeviceGray, 8
+        page.Resources = pikepdf.Dictionary(XObject=pikepdf.Dictionary(Im0=image))
+        page.Contents = pdf.make_stream(b'q 595 0 0 842 0 0 cm /Im0 Do Q')
+        pdf.save(buffer)
+    return buffer.getvalue()
+
+
+class ChooseEngineTests(SimpleTestCase):
+    def test_text_layer_skips_ocr_of_existing_text(self):
+        profile = DocumentProfile(page_count=4, sampled_pages=3, text_pages=3)
+
+        decision = choose_engine(profile, docling_available=True)
+
+        self.assertEqual((decision.engine, decision.reason), (OCRMYPDF, 'text-layer'))
+        self.assertEqual(decision.overrides, {'skip_text': True, 'force_ocr': False})
+
+    def test_tables_and_columns_go_to_docling(self):
+        tables = DocumentProfile(page_count=2, sampled_pages=2, raster_pages=2, table_joints=40)
+        columns = DocumentProfile(page_count=2, sampled_pages=2, columns=3)
+
+        for profile in (tables, columns):
+            self.assertEqual(choose_engine(profile, docling_available=True).engine, DOCLING)
+            fallback = choose_engine(profile, docling_available=False)
+            self.assertEqual((fallback.engine, fallback.reason), (OCRMYPDF, 'complex-layout-fallback'))
+
+    def test_long_documents_stay_on_ocrmypdf(self):
+        profile = DocumentProfile(page_count=500, sampled_pages=3, columns=3)
+        with self.settings(OCR_ROUTING_DOCLING_MAX_PAGES=200):
+            self.assertEqual(choose_engine(profile, docling_available=True).engine, OCRMYPDF)
+
+    def test_dense_scans_skip_image_cleanup(self):
+        profile = DocumentProfile(page_count=1, sampled_pages=1, image_dpi=600)
+
+        decision = choose_engine(profile, docling_available=False)
+
+        self.assertEqual(decision.reason, 'plain-text')
+        self.assertEqual(decision.overrides, {'remove_background': False, 'clean_final': False})
+
+
+class ProfileTests(SimpleTestCase):
+    def test_profile_reads_text_layer_and_image_resolution(self):
+        text = profile_document(io.BytesIO(text_pdf(10)), sample_size=3)
+        self.assertEqual((text.page_count, text.sampled_pages, text.text_pages), (10, 3, 3))
+        self.assertTrue(text.has_text_layer)
+
+        scan = profile_document(io.BytesIO(scan_pdf(3400)))
+        self.assertFalse(scan.has_text_layer)
+        self.assertEqual(scan.image_dpi, 411)
+
+    def test_raster_layout_counts_grid_crossings_and_columns(self):
+        grid = np.full((1100, 850), 255, np.uint8)
+        for y in range(100, 1001, 100):
+            cv2.line(grid, (100, y), (750, y), 0, 2)
+        for x in range(100, 751, 130):
+            cv2.line(grid, (x, 100), (x, 1000), 0, 2)
+        self.assertEqual(_raster_layout(grid)[0], 60)
+
+        page = np.full((1100, 850), 255, np.uint8)
+        for left in (60, 320, 580):
+            for y in range(80, 1000, 20):
+                for x in range(left, left + 210, 10):
+                    cv2.rectangle(page, (x, y), (x + 5, y + 8), 0, -1)
+        self.assertEqual(_raster_layout(page), (0, 3))
+
+
+class RouteJobTests(MediaTestCase):
+    def test_user_choices_win_over_routing_defaults(self):
+        job = self.make_job(options={'remove_background': True})
+        job.source_file.save('scan.pdf', ContentFile(scan_pdf(3400)), save=True)
+
+        with mock.patch.object(PortalSettings, 'docling_available', return_value=False):
+            decision = route_job(job)
+
+        routing = job.options['routing']
+        self.assertEqual(decision.engine, OCRMYPDF)
+        self.assertEqual(routing['overrides'], {'clean_final': False})
+        self.assertEqual(routing['kept'], {'remove_background': True})
+        self.assertTrue(job.options['remove_background'])
+        self.assertEqual(job.options['pages'], 1)
+
+
+class RoutingSummaryTests(SimpleTestCase):
+    def routed(self, engine: str, pages: int, seconds: float, status: str = 'completed') -> dict:
+        return {
+            'routing': {
+                'profile': {'page_count': pages},
+                'outcome': {'engine': engine, 'status': status, 'seconds': seconds},
+            }
+        }
+
+    def test_compares_against_docling_rate(self):
+        summary = routing_summary(
+            [
+                self.routed(OCRMYPDF, 10, 5.0),
+                self.routed(DOCLING, 4, 8.0),
+                self.routed(DOCLING, 50, 1.0, status='failed'),
+                {},
+            ]
+        )
+
+        self.assertEqual(summary['engines'][OCRMYPDF]['pages_per_second'], 2.0)
+        self.assertEqual(summary['engines'][DOCLING]['jobs'], 1)
+        self.assertEqual((summary['pages'], summary['seconds']), (14, 13.0))
+        self.assertEqual(summary['docling_estimate'], 28.0)
+        self.assertEqual(summary['speedup'], 2.15)
+
+    def test_nothing_completed(self):
+        self.assertIsNone(routing_summary([self.routed(OCRMYPDF, 3, 1.0, status='failed')]))
@@ -0,0 +1,113 @@
+import fcntl
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import scratch, workers
+from ..models import OcrJob
+from ..scratch import ScratchTooLarge, ScratchUnavailable
+from .base import MediaTestCase
+
+_MB = 1024 * 1024
+
+
+class ScratchTests(SimpleTestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp(prefix='portal-scratch-'))
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        overrides = self.settings(
+            OCR_SCRATCH_DIR=self.root,
+            OCR_SCRATCH_TMPFS_DIR='',
+            OCR_SCRATCH_HEADROOM_MB=0,
+            OCR_SCRATCH_SAMPLE_SECONDS=60,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_estimate_counts_pages_and_input_copies(self):
+        with self.settings(OCR_SCRATCH_BYTES_PER_PIXEL=1, OCR_SCRATCH_BASE_MB=0):
+            expected = int(2 * scratch.PAGE_SQUARE_INCHES * 100 * 100 + 3 * 1000)
+            self.assertEqual(scratch.estimate(1000, pages=2, dpi=100), expected)
+
+    def test_reservation_owns_a_directory_until_exit(self):
+        with scratch.reserve(_MB, 'test') as workspace:
+            self.assertEqual(workspace.tier, 'volume')
+            self.assertEqual(workspace.path.parent, self.root)
+            (workspace.path / 'page.png').write_bytes(b'\0' * 8192)
+            self.assertEqual(len(list((self.root / scratch.LEDGER).glob('*.lease'))), 1)
+            # Space already written no longer counts as outstanding.
+            self.assertEqual(scratch._outstanding(self.root), _MB - scratch.directory_size(workspace.path))
+        self.assertFalse(workspace.path.exists())
+        self.assertEqual(list((self.root / scratch.LEDGER).glob('*.lease')), [])
+        self.assertGreaterEqual(workspace.peak, 8192)
+        self.assertEqual(workspace.as_dict()['tier'], 'volume')
+
+    def test_job_larger_than_the_volume_fails_at_once(self):
+        with self.assertRaises(ScratchTooLarge):
+            scratch.reserve(scratch.capacity(self.root) + 1, 'test', wait=60)
+
+    def test_job_that_does_not_fit_now_waits_then_gives_up(self):
+        with mock.patch.object(scratch, 'available', return_value=0):
+            with self.assertRaises(ScratchUnavailable):
+                scratch.reserve(_MB, 'test', wait=0)
+
+    def test_reservation_of_a_dead_process_is_cleaned_up(self):
+        ledger = self.root / scratch.LEDGER
+        ledger.mkdir()
+        left_behind = self.root / 'job-crashed'
+        left_behind.mkdir()
+        (ledger / 'job-crashed.lease').write_text(f'{_MB} {left_behind}')
+
+        self.assertEqual(scratch._outstanding(self.root), 0)
+        self.assertFalse(left_behind.exists())
+        self.assertEqual(list(ledger.glob('*.lease')), [])
+
+    def test_live_reservation_is_outstanding(self):
+        ledger = self.root / scratch.LEDGER
+        ledger.mkdir()
+        with (ledger / 'job-live.lease').open('w') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.write(f'{_MB} {self.root / "job-live"}')
+            handle.flush()
+            self.assertEqual(scratch._outstanding(self.root), _MB)
+
+
+class RunInTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp(prefix='portal-run-in-'))
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_child_and_its_programs_use_the_directory(self):
+        before = (tempfile.gettempdir(), os.environ.get('TMPDIR'))
+
+        self.assertEqual(scratch.run_in(self.directory, tempfile.gettempdir), str(self.directory))
+        output = scratch.run_in(self.directory, subprocess.check_output, ['sh', '-c', 'echo "$TMPDIR"'])
+
+        self.assertEqual(output.decode().strip(), str(self.directory))
+        self.assertEqual((tempfile.gettempdir(), os.environ.get('TMPDIR')), before)
+
+    def test_exceptions_reach_the_caller(self):
+        with self.assertRaises(ValueError):
+            scratch.run_in(self.directory, int, 'not a number')
+        with self.assertRaises(RuntimeError):
+            scratch.run_in(self.directory, os._exit, 1)
+
+
+class FullScratchWorkerTests(MediaTestCase):
+    def test_process_requeues_jobs_without_scratch_space(self):
+        worker = workers.register('test-worker')
+        job = self.make_job()
+        claimed = workers.claim(worker)
+
+        with mock.patch('portal.views._run_ocr', side_effect=ScratchUnavailable('no disk')):
+            with self.assertLogs('portal.workers'):
+                self.assertIsNone(workers.process(worker, claimed))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OcrJob.Status.PENDING)
+        self.assertEqual(job.attempts, 0)
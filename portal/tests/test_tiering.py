@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .. import tiering
+from ..models import OcrJob, TieredFile
+from .base import MediaTestCase
+
+
+class TieringTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.job = self.make_job(status=OcrJob.Status.COMPLETED)
+        self.job.processed_file.save('scan_ocr.pdf', ContentFile(b'%PDF-1.7 processed' * 100), save=True)
+        self.name = self.job.processed_file.name
+
+    def age(self, days: int) -> None:
+        OcrJob.objects.filter(pk=self.job.pk).update(updated_at=timezone.now() - timedelta(days=days))
+
+    def archived(self, name: str) -> bool:
+        return tiering.archive_storage().exists(name + tiering.ARCHIVE_SUFFIX)
+
+    def test_archive_and_rehydrate_keep_the_bytes(self):
+        content = default_storage.open(self.name).read()
+
+        move = tiering.archive(self.name, 'idle')
+
+        self.assertEqual(move.size, len(content))
+        self.assertFalse(default_storage.exists(self.name))
+        self.assertTrue(self.archived(self.name))
+        self.assertEqual(TieredFile.objects.get(name=self.name).tier, TieredFile.Tier.ARCHIVE)
+
+        tiering.ensure_hot(self.job.processed_file)
+
+        self.assertEqual(default_storage.open(self.name).read(), content)
+        self.assertFalse(self.archived(self.name))
+        entry = TieredFile.objects.get(name=self.name)
+        self.assertEqual(entry.tier, TieredFile.Tier.HOT)
+        self.assertIsNotNone(entry.last_accessed_at)
+
+    def test_migrate_moves_idle_and_old_source_files(self):
+        self.age(days=60)
+        with self.settings(OCR_TIER_IDLE_DAYS=30, OCR_TIER_SOURCE_DAYS=7):
+            moves = tiering.migrate()
+
+        self.assertEqual(
+            sorted((move.name, move.reason) for move in moves),
+            sorted([(self.name, 'idle'), (self.job.source_file.name, 'source')]),
+        )
+        self.assertEqual(tiering.migrate(), [])
+
+    def test_migrate_keeps_recently_opened_files(self):
+        self.age(days=60)
+        tiering.touch(self.name)
+
+        with self.settings(OCR_TIER_IDLE_DAYS=30):
+            moves = tiering.migrate()
+
+        self.assertNotIn(self.name, [move.name for move in moves])
+        self.assertTrue(default_storage.exists(self.name))
+
+    def test_file_opened_while_archiving_stays_hot(self):
+        write = tiering._write
+
+        def download_during_compression(*args):
+            tiering.ensure_hot(self.job.processed_file)
+            return write(*args)
+
+        self.age(days=60)
+        with self.settings(OCR_TIER_IDLE_DAYS=30, OCR_TIER_SOURCE_DAYS=365):
+            with mock.patch.object(tiering, '_write', side_effect=download_during_compression):
+                self.assertEqual(tiering.migrate(), [])
+
+        self.assertTrue(default_storage.exists(self.name))
+        self.assertFalse(self.archived(self.name))
+        self.assertEqual(TieredFile.objects.get(name=self.name).tier, TieredFile.Tier.HOT)
+
+    def test_delete_removes_the_archived_copy(self):
+        tiering.archive(self.name, 'idle')
+
+        tiering.delete(self.job.processed_file)
+
+        self.assertFalse(self.archived(self.name))
+        self.assertFalse(TieredFile.objects.filter(name=self.name).exists())
@@ -0,0 +1,19 @@
+import io
+
+from django.test import TestCase
+
+from ..wordexport import PAGE_BREAK, Heading, ListEntry, Table, read_blocks, write_blocks
+
+
+class WordBlocksTests(TestCase):
+    def test_round_trip_keeps_structure(self):
+        blocks = ['Introducere', Heading('Capitolul 1'), ListEntry('primul', ordered=True), PAGE_BREAK]
+        blocks.append(Table([['Nume', 'Valoare'], ['ș', '1']]))
+        stream = io.BytesIO()
+
+        self.assertEqual(write_blocks(stream, blocks), 5)
+        stream.seek(0)
+        restored = list(read_blocks(stream))
+
+        self.assertEqual(restored, blocks)
+        self.assertIs(restored[3], PAGE_BREAK)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from .. import workers
+from ..models import OcrJob, OcrWorker
+from .base import MediaTestCase
+
+
+class WorkerLeaseTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.worker = workers.register('test-worker')
+
+    def test_claim_takes_oldest_pending_job_once(self):
+        first = self.make_job()
+        second = self.make_job()
+        self.make_job(status=OcrJob.Status.COMPLETED)
+
+        claimed = workers.claim(self.worker)
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, OcrJob.Status.PROCESSING)
+        self.assertEqual(claimed.lease_owner_id, self.worker.pk)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNotNone(claimed.lease_expires_at)
+
+        self.assertEqual(workers.claim(self.worker).pk, second.pk)
+        self.assertIsNone(workers.claim(self.worker))
+
+    def test_reap_expired_requeues_then_fails(self):
+        past = timezone.now() - timedelta(minutes=5)
+        retry = self.make_job(
+            status=OcrJob.Status.PROCESSING, lease_owner=self.worker, lease_expires_at=past, attempts=1
+        )
+        exhausted = self.make_job(status=OcrJob.Status.PROCESSING, lease_expires_at=past, attempts=99)
+        running = self.make_job(
+            status=OcrJob.Status.PROCESSING,
+            lease_owner=self.worker,
+            lease_expires_at=timezone.now() + timedelta(minutes=5),
+            attempts=1,
+        )
+
+        with self.settings(OCR_JOB_MAX_ATTEMPTS=3):
+            self.assertEqual(workers.reap_expired(), 2)
+
+        retry.refresh_from_db()
+        self.assertEqual(retry.status, OcrJob.Status.PENDING)
+        self.assertIsNone(retry.lease_owner_id)
+        self.assertIsNone(retry.lease_expires_at)
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, OcrJob.Status.FAILED)
+        self.assertTrue(exhausted.error_message)
+        running.refresh_from_db()
+        self.assertEqual(running.status, OcrJob.Status.PROCESSING)
+
+    def test_release_requeues_without_counting_the_attempt(self):
+        job = self.make_job()
+        claimed = workers.claim(self.worker)
+
+        workers.release(self.worker, claimed)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OcrJob.Status.PENDING)
+        self.assertEqual(job.attempts, 0)
+        self.assertIsNone(job.lease_owner_id)
+
+    def test_release_ignores_job_leased_by_another_worker(self):
+        self.make_job()
+        claimed = workers.claim(self.worker)
+        other = workers.register('other-worker')
+
+        workers.release(other, claimed)
+
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, OcrJob.Status.PROCESSING)
+        self.assertEqual(claimed.lease_owner_id, self.worker.pk)
+
+
+    def test_process_fails_job_on_engine_error(self):
+        job = self.make_job()
+        claimed = workers.claim(self.worker)
+        with mock.patch('portal.views._run_ocr', side_effect=RuntimeError('Tesseract a eșuat.')):
+            self.assertFalse(workers.process(self.worker, claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, OcrJob.Status.FAILED)
+        self.assertEqual(job.error_message, 'Tesseract a eșuat.')
+        self.assertEqual(OcrWorker.objects.get(pk=self.worker.pk).jobs_failed, 1)
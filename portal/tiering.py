@@ -0,0 +1,263 @@
+"""
+Tiered media storage. ``MEDIA_ROOT`` is the hot tier; cold files are moved to an
+archive tier (zstd-compressed, on ``OCR_ARCHIVE_ROOT`` or any Django storage set in
+``OCR_ARCHIVE_STORAGE``) by ``manage.py storage_tiers --migrate``:
+
+* source uploads of completed jobs older than ``OCR_TIER_SOURCE_DAYS``;
+* processed PDFs, sidecars, library copies and Word files not accessed for
+  ``OCR_TIER_IDLE_DAYS``.
+
+Views call :func:`ensure_hot` before reading a file; an archived file is restored
+under its original name, so model fields never change. :func:`archive` deletes the hot
+copy under a lock on the file's ``TieredFile`` row and only if nobody has touched it
+since the policy chose it, so a download that has just called :func:`ensure_hot` keeps
+its file.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from typing import IO, Iterator
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import media, metrics
+from .models import OcrJob, StoredDocument, TieredFile, WordDocument
+
+try:  # pragma: no cover - optional dependency
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+ZSTD_AVAILABLE = zstandard is not None
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX = '.zst'
+# Access times are only rewritten when older than this, so hot downloads stay write-free.
+_TOUCH_INTERVAL = timedelta(hours=1)
+_COPY_CHUNK = 1024 * 1024
+
+# File fields moved to the archive tier once nobody opened them for OCR_TIER_IDLE_DAYS.
+IDLE_FIELDS = (
+    (OcrJob, ('processed_file', 'sidecar_file')),
+    (StoredDocument, ('original_file', 'processed_file')),
+    (WordDocument, ('document_file', 'source_pdf')),
+)
+
+
+@dataclass(slots=True)
+class TierMove:
+    name: str
+    reason: str
+    size: int
+    archived_size: int = 0
+
+
+@lru_cache(maxsize=1)
+def archive_storage():
+    storage_class = import_string(settings.OCR_ARCHIVE_STORAGE)
+    if settings.OCR_ARCHIVE_STORAGE == 'django.core.files.storage.FileSystemStorage':
+        return storage_class(location=settings.OCR_ARCHIVE_ROOT, base_url=None)
+    return storage_class()
+
+
+def _write(storage, name: str, stream: IO[bytes]) -> int:
+    """
+    Store ``stream`` under exactly ``name``, replacing any previous file. Local files are
+    written beside the target and renamed over it, so readers never see a partial file.
+    """
+    target = media.local_path(storage, name)
+    if target is not None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(f'.{target.name}.tiering')
+        with staging.open('wb') as output:
+            shutil.copyfileobj(stream, output, _COPY_CHUNK)
+        os.replace(staging, target)
+        return target.stat().st_size
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(stream, spool, _COPY_CHUNK)
+        size = spool.tell()
+        spool.seek(0)
+        if storage.exists(name):
+            storage.delete(name)
+        saved = storage.save(name, File(spool))
+    if saved != name:
+        raise RuntimeError(f'Storage renamed {name} to {saved}.')
+    return size
+
+
+def touch(name: str) -> None:
+    now = timezone.now()
+    updated = TieredFile.objects.filter(name=name, last_accessed_at__lt=now - _TOUCH_INTERVAL).update(
+        last_accessed_at=now
+    )
+    if not updated:
+        TieredFile.objects.get_or_create(name=name, defaults={'last_accessed_at': now})
+
+
+def rehydrate(name: str, storage=None) -> bool:
+    """Restore an archived file into the hot tier; ``False`` when it is not archived."""
+    storage = storage or default_storage
+    with transaction.atomic():
+        entry = TieredFile.objects.select_for_update().filter(name=name, tier=TieredFile.Tier.ARCHIVE).first()
+        if entry is None:
+            return False
+        if not storage.exists(name):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError('zstandard nu este instalat; fișierul arhivat nu poate fi restaurat.')
+            with archive_storage().open(name + ARCHIVE_SUFFIX, 'rb') as packed:
+                _write(storage, name, zstandard.ZstdDecompressor().stream_reader(packed))
+        now = timezone.now()
+        entry.tier = TieredFile.Tier.HOT
+        entry.moved_at = now
+        entry.last_accessed_at = now
+        entry.save(update_fields=['tier', 'moved_at', 'last_accessed_at'])
+    archive_storage().delete(name + ARCHIVE_SUFFIX)
+    metrics.record_tier_move('rehydrate', entry.size)
+    log.info('Rehydrated %s from the archive tier.', name)
+    return True
+
+
+def ensure_hot(field_file) -> None:
+    """Make a stored file readable from its storage, restoring it from the archive if needed."""
+    if not field_file:
+        return
+    name = field_file.name
+    # Touched before the existence check: archive() keeps files touched after it chose them.
+    touch(name)
+    if not field_file.storage.exists(name):
+        rehydrate(name, field_file.storage)
+
+
+def archive(name: str, reason: str, storage=None, idle_since=None) -> TierMove | None:
+    """
+    Compress a hot file into the archive tier and remove it from the hot tier. With
+    ``idle_since``, a file accessed at or after that time stays hot (and ``None`` is
+    returned): it was opened while it was being compressed.
+    """
+    storage = storage or default_storage
+    if not storage.exists(name):
+        return None
+    size = storage.size(name)
+    compressor = zstandard.ZstdCompressor(level=settings.OCR_ARCHIVE_ZSTD_LEVEL)
+    with storage.open(name, 'rb') as source:
+        archived_size = _write(archive_storage(), name + ARCHIVE_SUFFIX, compressor.stream_reader(source))
+    with transaction.atomic():
+        entry, _ = TieredFile.objects.select_for_update().get_or_create(name=name)
+        accessed = entry.last_accessed_at
+        in_use = idle_since is not None and accessed is not None and accessed >= idle_since
+        if not in_use:
+            entry.tier = TieredFile.Tier.ARCHIVE
+            entry.size = size
+            entry.archived_size = archived_size
+            entry.moved_at = timezone.now()
+            entry.save(update_fields=['tier', 'size', 'archived_size', 'moved_at'])
+            storage.delete(name)
+    if in_use:
+        archive_storage().delete(name + ARCHIVE_SUFFIX)
+        log.info('Kept %s in the hot tier; it was accessed while being archived.', name)
+        return None
+    metrics.record_tier_move('archive', size)
+    return TierMove(name, reason, size, archived_size)
+
+
+def discard(name: str) -> None:
+    """Forget a deleted file, including its archived copy."""
+    entry = TieredFile.objects.filter(name=name).first()
+    if entry is None:
+        return
+    if entry.tier == TieredFile.Tier.ARCHIVE:
+        archive_storage().delete(name + ARCHIVE_SUFFIX)
+    entry.delete()
+
+
+def delete(field_file) -> None:
+    """``FieldFile.delete(save=False)`` that also removes an archived copy."""
+    name = field_file.name
+    field_file.delete(save=False)
+    if name:
+        discard(name)
+
+
+def candidates(now=None) -> Iterator[tuple[str, str]]:
+    """``(name, reason)`` of hot files the policy moves to the archive tier."""
+    now = now or timezone.now()
+    source_cutoff = now - timedelta(days=settings.OCR_TIER_SOURCE_DAYS)
+    idle_cutoff = now - timedelta(days=settings.OCR_TIER_IDLE_DAYS)
+    archived = set(TieredFile.objects.filter(tier=TieredFile.Tier.ARCHIVE).values_list('name', flat=True))
+    recent = set(TieredFile.objects.filter(last_accessed_at__gte=idle_cutoff).values_list('name', flat=True))
+
+    sources = OcrJob.objects.filter(status=OcrJob.Status.COMPLETED, updated_at__lt=source_cutoff)
+    for name in sources.exclude(source_file='').values_list('source_file', flat=True):
+        if name and name not in archived:
+            yield name, 'source'
+
+    for model, fields in IDLE_FIELDS:
+        rows = model.objects.filter(updated_at__lt=idle_cutoff)
+        if model is OcrJob:
+            rows = rows.filter(status=OcrJob.Status.COMPLETED)
+        for names in rows.values_list(*fields):
+            for name in names:
+                if name and name not in archived and name not in recent:
+                    yield name, 'idle'
+
+
+def migrate(dry_run: bool = False, limit: int = 0) -> list[TierMove]:
+    if not ZSTD_AVAILABLE and not dry_run:
+        raise RuntimeError('zstandard is not installed.')
+    now = timezone.now()
+    # Files touched after this are in use. touch() skips writes for _TOUCH_INTERVAL, so an
+    # access time that recent may hide a newer read.
+    idle_since = {
+        'source': now - _TOUCH_INTERVAL,
+        'idle': min(now - timedelta(days=settings.OCR_TIER_IDLE_DAYS), now - _TOUCH_INTERVAL),
+    }
+    moves = []
+    for name, reason in candidates(now):
+        if limit and len(moves) >= limit:
+            break
+        if dry_run:
+            if default_storage.exists(name):
+                moves.append(TierMove(name, reason, default_storage.size(name)))
+            continue
+        try:
+            move = archive(name, reason, idle_since=idle_since[reason])
+        except Exception:  # noqa: BLE001 - one unreadable file must not stop the run
+            log.exception('Could not archive %s', name)
+            continue
+        if move is not None:
+            moves.append(move)
+    return moves
+
+
+def report() -> dict:
+    """File counts and bytes per tier."""
+    hot_files = hot_bytes = 0
+    for model, fields in ((OcrJob, ('source_file', 'processed_file', 'sidecar_file', 'structure_file', 'blocks_file')),) + IDLE_FIELDS[1:]:
+        for names in model.objects.values_list(*fields):
+            for name in names:
+                if name and default_storage.exists(name):
+                    hot_files += 1
+                    hot_bytes += default_storage.size(name)
+    archived = TieredFile.objects.filter(tier=TieredFile.Tier.ARCHIVE)
+    return {
+        'hot': {'files': hot_files, 'bytes': hot_bytes},
+        'archive': {
+            'files': archived.count(),
+            'bytes': sum(archived.values_list('size', flat=True)),
+            'stored_bytes': sum(archived.values_list('archived_size', flat=True)),
+        },
+        'rehydrated': TieredFile.objects.filter(tier=TieredFile.Tier.HOT, moved_at__isnull=False).count(),
+    }
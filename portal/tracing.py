@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class JobTracer:
+    """
+    Collect wall-clock time and bytes moved per processing stage. Stages that run
+    more than once (e.g. an OCR retry) accumulate into the same entry.
+    """
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._stages: dict[str, dict[str, float]] = {}
+
+    @classmethod
+    def resume(cls, timings: dict | None) -> 'JobTracer':
+        """Continue the trace of a job whose earlier stages ran in another process."""
+        tracer = cls()
+        for name, entry in ((timings or {}).get('stages') or {}).items():
+            tracer._stages[name] = dict(entry)
+        return tracer
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            entry = self._stages.setdefault(name, {'s': 0.0})
+            entry['s'] += time.perf_counter() - started
+            if nbytes:
+                self.add_bytes(name, nbytes)
+
+    def add_seconds(self, name: str, seconds: float) -> None:
+        entry = self._stages.setdefault(name, {'s': 0.0})
+        entry['s'] += seconds
+
+    def add_bytes(self, name: str, nbytes: int) -> None:
+        entry = self._stages.setdefault(name, {'s': 0.0})
+        entry['b'] = entry.get('b', 0) + int(nbytes)
+
+    def as_dict(self) -> dict:
+        return {
+            'total': round(time.perf_counter() - self._started, 4),
+            'stages': {
+                name: {key: round(value, 4) if key == 's' else value for key, value in entry.items()}
+                for name, entry in self._stages.items()
+            },
+        }
+
+    def save(self, job) -> None:
+        job.timings = self.as_dict()
+        job.save(update_fields=['timings'])
+        log.info('Job %s timings %s', job.id, json.dumps(job.timings, separators=(',', ':')))
+
+
+def stage_summary(timings_list) -> list[dict]:
+    """Per-stage p50/p95 (seconds) over an iterable of stored ``OcrJob.timings``."""
+    samples: dict[str, list[float]] = {}
+    byte_totals: dict[str, int] = {}
+    for timings in timings_list:
+        for name, entry in ((timings or {}).get('stages') or {}).items():
+            samples.setdefault(name, []).append(entry.get('s', 0.0))
+            byte_totals[name] = byte_totals.get(name, 0) + entry.get('b', 0)
+        if timings and 'total' in timings:
+            samples.setdefault('total', []).append(timings['total'])
+
+    return [
+        {
+            'stage': name,
+            'count': len(values),
+            'p50': round(percentile(values, 50), 3),
+            'p95': round(percentile(values, 95), 3),
+            'bytes': byte_totals.get(name, 0),
+        }
+        for name, values in sorted(samples.items(), key=lambda item: -percentile(item[1], 95))
+    ]
@@ -10,6 +10,7 @@ urlpatterns = [
     path('ocr/', views.ocr_studio, name='ocr'),
     path('ocr/descarca/<uuid:job_id>/', views.download_job, name='download_job'),
     path('ocr/sidecar/<uuid:job_id>/', views.download_sidecar, name='download_sidecar'),
+    path('ocr/status/<uuid:job_id>/', views.job_status, name='job_status'),
     path('ocr/folder/<uuid:job_id>/', views.assign_job_folder, name='assign_job_folder'),
     path('ocr/sterge/<uuid:job_id>/', views.delete_job, name='delete_job'),
     path('biblioteci/', views.libraries, name='libraries'),
@@ -22,7 +23,14 @@ urlpatterns = [
     path('previzualizare/', views.preview_hub, name='preview_hub'),
     path('previzualizare/<uuid:document_id>/', views.preview_document, name='preview'),
     path('previzualizare/<uuid:document_id>/descarca/', views.download_document, name='download_document'),
+    path('previzualizare/<uuid:document_id>/cautare/', views.search_document, name='search_document'),
     path('word/', views.word_studio, name='word'),
     path('word/<uuid:document_id>/descarca/', views.download_word_document, name='download_word'),
     path('admin-console/', views.admin_console, name='admin'),
+    path(
+        'admin-console/profil/<str:trace_id>/<str:fmt>/',
+        views.download_profile,
+        name='download_profile',
+    ),
+    path('metrics', views.metrics_endpoint, name='metrics'),
 ]
@@ -1,22 +1,45 @@
 from __future__ import annotations
 
+import hashlib
+import importlib.util
 import io
 import logging
 import re
 import shutil
 import tempfile
+import time
 import zipfile
-from dataclasses import dataclass
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.files import File
-from django.http import FileResponse, Http404
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.text import slugify
 
+from . import (
+    bounded,
+    checkpoints,
+    compression,
+    governor,
+    media,
+    metrics,
+    preprocess,
+    profiling,
+    resolution,
+    scratch,
+    tiering,
+    warmup,
+    workers,
+)
+from .capabilities import load_registry, missing_languages, record_probe
 from .decorators import portal_menu_required
 from .forms import (
     AccessApprovalForm,
@@ -29,6 +52,7 @@ from .forms import (
     SignUpForm,
     WordDocumentForm,
 )
+from .governor import Budget
 from .models import (
     LibraryFolder,
     OcrJob,
@@ -37,15 +61,27 @@ from .models import (
     StoredDocument,
     WordDocument,
 )
+from .ocrdata import PageReader, docling_pages, hocr_pages, read_index, write_pages
+from .preprocess import PreprocessOptions
+from .resolution import ResolutionPlan
+from .routing import count_pages, profile_document, record_outcome, route_job, routing_summary
+from .scratch import Reservation
+from .streaming import file_response
+from .tracing import JobTracer, stage_summary
+from .wordexport import blocks_to_text, docling_blocks, iter_sidecar_blocks, read_blocks, write_blocks, write_docx
 
 log = logging.getLogger(__name__)
 
+DOCLING_NO_TEXT = 'Nu a fost posibilă extragerea textului cu Docling.'
+
 
 @dataclass(slots=True)
 class ProcessingResult:
     message: str
     level: str = 'success'
     engine: str = 'ocrmypdf'
+    # Docling's structured document, kept so Word export can reuse it without a second pass.
+    document: object | None = field(default=None, repr=False)
 
 
 @login_required
@@ -87,18 +123,27 @@ def ocr_studio(request):
         options = form.selected_options()
         destination_folder = form.cleaned_data.get('destination_folder')
 
+        queued = workers.enabled()
         job = OcrJob(
             user=request.user,
             language=language_codes,
-            status=OcrJob.Status.PROCESSING,
+            status=OcrJob.Status.PENDING if queued else OcrJob.Status.PROCESSING,
             options=options,
             destination_folder=destination_folder,
         )
-        job.source_file.save(pdf_file.name, pdf_file, save=False)
-        job.save()
+        tracer = JobTracer()
+        with tracer.stage('upload', pdf_file.size):
+            job.source_sha256 = _upload_sha256(pdf_file)
+            job.source_file.save(pdf_file.name, pdf_file, save=False)
+            job.save()
+
+        if queued:
+            tracer.save(job)
+            messages.info(request, 'Documentul a fost pus în coada de procesare. Starea se actualizează automat.')
+            return redirect('portal:ocr')
 
         try:
-            result = _run_ocr(job)
+            result = _run_leased_ocr(job, tracer)
         except RuntimeError as exc:
             job.status = OcrJob.Status.FAILED
             job.error_message = str(exc)
@@ -126,12 +171,7 @@ def ocr_studio(request):
     engine_label = settings_obj.get_ocr_engine_display()
     ocrmypdf_version = None
     if engine_key == PortalSettings.OcrEngine.OCRMYPDF:
-        try:
-            import ocrmypdf
-
-            ocrmypdf_version = ocrmypdf.__version__
-        except Exception:  # pragma: no cover - optional metadata
-            ocrmypdf_version = None
+        ocrmypdf_version = warmup.engine_version('ocrmypdf')
     return render(
         request,
         'portal/ocr_studio.html',
@@ -197,6 +237,7 @@ def library_detail(request, folder_id):
         {
             'folder': folder,
             'documents': documents,
+            'compression': compression.library_summary(folder),
         },
     )
 
@@ -221,6 +262,7 @@ def download_library_archive(request, folder_id):
 
             if document.original_file:
                 original_name = document.original_filename()
+                tiering.ensure_hot(document.original_file)
                 with document.original_file.open('rb') as original_stream:
                     archive.writestr(
                         f"{entry_prefix}{original_name}",
@@ -229,12 +271,14 @@ def download_library_archive(request, folder_id):
 
             if document.processed_file:
                 processed_name = document.processed_filename()
+                tiering.ensure_hot(document.processed_file)
                 with document.processed_file.open('rb') as processed_stream:
                     archive.writestr(
                         f"{entry_prefix}{processed_name}",
                         processed_stream.read(),
                     )
 
+    metrics.record_download('download_library_archive', buffer.getbuffer().nbytes)
     buffer.seek(0)
     archive_name = slugify(folder.name) or 'folder'
     filename = f"{archive_name}-{folder.id.hex[:8]}.zip"
@@ -263,26 +307,66 @@ def preview_hub(request):
 
 
 @portal_menu_required('preview')
-def preview_document(request, document_id):
-    document = get_object_or_404(StoredDocument, id=document_id, folder__user=request.user)
-    return render(
+async def preview_document(request, document_id):
+    user = await request.auser()
+    document = await aget_object_or_404(
+        StoredDocument.objects.select_related('folder', 'ocr_job'), id=document_id, folder__user=user
+    )
+    # The viewer loads the PDF straight from MEDIA_URL, bypassing the download views.
+    await sync_to_async(tiering.ensure_hot, thread_sensitive=False)(document.processed_file)
+    await sync_to_async(tiering.ensure_hot, thread_sensitive=False)(document.original_file)
+    processed_url = original_url = ''
+    if document.processed_file:
+        processed_url = await sync_to_async(media.inline_url, thread_sensitive=False)(document.processed_file)
+    if document.original_file:
+        original_url = await sync_to_async(media.inline_url, thread_sensitive=False)(document.original_file)
+    # Context processors query the database synchronously.
+    return await sync_to_async(render)(
         request,
         'portal/preview_document.html',
         {
             'document': document,
+            'processed_url': processed_url,
+            'original_url': original_url,
         },
     )
 
 
+@lru_cache(maxsize=32)
+def _structure_index(storage, name: str, size: int):
+    # Keyed on size as well so a re-processed job never serves a stale index.
+    with storage.open(name, 'rb') as stream:
+        return read_index(stream)
+
+
+@portal_menu_required('preview')
+def search_document(request, document_id):
+    document = get_object_or_404(
+        StoredDocument.objects.select_related('ocr_job'), id=document_id, folder__user=request.user
+    )
+    query = request.GET.get('q', '').strip()
+    job = document.ocr_job
+    if job is None or not job.structure_file:
+        return JsonResponse({'query': query, 'available': False, 'hits': []})
+
+    structure = job.structure_file
+    with structure.open('rb') as stream:
+        reader = PageReader(stream, _structure_index(structure.storage, structure.name, structure.size))
+        hits = reader.search(query, limit=settings.OCR_SEARCH_MAX_HITS) if query else []
+    return JsonResponse({'query': query, 'available': True, 'hits': hits})
+
+
 @portal_menu_required('preview')
-def download_document(request, document_id):
-    document = get_object_or_404(StoredDocument, id=document_id, folder__user=request.user)
+async def download_document(request, document_id):
+    user = await request.auser()
+    document = await aget_object_or_404(StoredDocument, id=document_id, folder__user=user)
     if not document.processed_file:
         raise Http404('Documentul procesat nu este disponibil pentru descărcare.')
-    return FileResponse(
-        document.processed_file.open('rb'),
-        as_attachment=True,
-        filename=document.processed_filename() or 'document_ocr.pdf',
+    return await file_response(
+        request,
+        document.processed_file,
+        document.processed_filename() or 'document_ocr.pdf',
+        'download_document',
     )
 
 
@@ -329,38 +413,62 @@ def word_studio(request):
 
 
 @portal_menu_required('word')
-def download_word_document(request, document_id):
-    document = get_object_or_404(WordDocument, id=document_id, user=request.user)
-    return FileResponse(
-        document.document_file.open('rb'),
-        as_attachment=True,
-        filename=Path(document.document_file.name).name,
+async def download_word_document(request, document_id):
+    user = await request.auser()
+    document = await aget_object_or_404(WordDocument, id=document_id, user=user)
+    return await file_response(
+        request,
+        document.document_file,
+        Path(document.document_file.name).name,
+        'download_word_document',
     )
 
 
 @portal_menu_required('ocr')
-def download_job(request, job_id):
-    job = get_object_or_404(OcrJob, id=job_id, user=request.user)
+async def download_job(request, job_id):
+    user = await request.auser()
+    job = await aget_object_or_404(OcrJob, id=job_id, user=user)
 
     if job.status != OcrJob.Status.COMPLETED or not job.processed_file:
         raise Http404('Documentul nu este disponibil pentru descărcare.')
 
-    return FileResponse(
-        job.processed_file.open('rb'),
-        as_attachment=True,
-        filename=job.processed_filename() or 'document_ocr.pdf',
+    return await file_response(
+        request,
+        job.processed_file,
+        job.processed_filename() or 'document_ocr.pdf',
+        'download_job',
     )
 
 
 @portal_menu_required('ocr')
-def download_sidecar(request, job_id):
-    job = get_object_or_404(OcrJob, id=job_id, user=request.user)
+async def download_sidecar(request, job_id):
+    user = await request.auser()
+    job = await aget_object_or_404(OcrJob, id=job_id, user=user)
     if not job.sidecar_file:
         raise Http404('Fișierul sidecar nu este disponibil.')
-    return FileResponse(
-        job.sidecar_file.open('rb'),
-        as_attachment=True,
-        filename=job.sidecar_filename() or 'document.txt',
+    return await file_response(
+        request,
+        job.sidecar_file,
+        job.sidecar_filename() or 'document.txt',
+        'download_sidecar',
+    )
+
+
+@portal_menu_required('ocr')
+async def job_status(request, job_id):
+    user = await request.auser()
+    job = await aget_object_or_404(OcrJob, id=job_id, user=user)
+    return JsonResponse(
+        {
+            'id': str(job.id),
+            'status': job.status,
+            'status_label': job.get_status_display(),
+            'error_message': job.error_message,
+            'download_url': reverse('portal:download_job', args=[job.id])
+            if job.status == OcrJob.Status.COMPLETED and job.processed_file
+            else None,
+            'updated_at': job.updated_at.isoformat(),
+        }
     )
 
 
@@ -417,11 +525,15 @@ def delete_job(request, job_id):
         return redirect('portal:ocr')
 
     if job.source_file:
-        job.source_file.delete(save=False)
+        tiering.delete(job.source_file)
     if job.processed_file:
-        job.processed_file.delete(save=False)
+        tiering.delete(job.processed_file)
     if job.sidecar_file:
-        job.sidecar_file.delete(save=False)
+        tiering.delete(job.sidecar_file)
+    if job.structure_file:
+        tiering.delete(job.structure_file)
+    if job.blocks_file:
+        tiering.delete(job.blocks_file)
 
     job.delete()
     messages.success(request, 'Procesarea a fost eliminată din istoric.')
@@ -485,10 +597,58 @@ def admin_console(request):
             'form': form,
             'settings_form': settings_form,
             'portal_settings': settings_obj,
+            'routing_summary': routing_summary(
+                OcrJob.objects.filter(options__has_key='routing')
+                .order_by('-created_at')
+                .values_list('options', flat=True)[: settings.OCR_TIMINGS_WINDOW]
+            ),
+            'queue_summary': workers.queue_summary(),
+            'compression_summary': compression.summarize(
+                OcrJob.objects.filter(options__has_key='compression')
+                .order_by('-created_at')
+                .values_list('options', flat=True)[: settings.OCR_TIMINGS_WINDOW]
+            ),
+            'stage_summary': stage_summary(
+                OcrJob.objects.exclude(timings={})
+                .order_by('-created_at')
+                .values_list('timings', flat=True)[: settings.OCR_TIMINGS_WINDOW]
+            ),
+            'capabilities': load_registry(),
+            'missing_languages': missing_languages(),
+            'profiling_enabled': settings.PROFILING_ENABLED,
+            'profile_traces': profiling.list_traces() if settings.PROFILING_ENABLED else [],
         },
     )
 
 
+@portal_menu_required('admin')
+def download_profile(request, trace_id, fmt):
+    if not request.user.is_staff:
+        raise Http404('Profilul nu este disponibil.')
+    trace = profiling.load_trace(trace_id)
+    if trace is None or fmt not in {'speedscope', 'collapsed'}:
+        raise Http404('Profilul nu este disponibil.')
+
+    if fmt == 'speedscope':
+        response = JsonResponse(profiling.to_speedscope(trace))
+        filename = f"profile-{trace['id'][:8]}.speedscope.json"
+    else:
+        response = HttpResponse(profiling.to_collapsed(trace), content_type='text/plain; charset=utf-8')
+        filename = f"profile-{trace['id'][:8]}.collapsed.txt"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def metrics_endpoint(request):
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', set())
+    if not request.user.is_staff and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden('Acces interzis.')
+    if not metrics.PROMETHEUS_AVAILABLE:
+        return HttpResponse('prometheus_client nu este instalat.', status=503, content_type='text/plain')
+    payload, content_type = metrics.render_latest()
+    return HttpResponse(payload, content_type=content_type)
+
+
 def _archive_job_to_folder(job: OcrJob, folder: LibraryFolder) -> StoredDocument:
     if folder is None:
         raise ValueError('Selectează un folder valid pentru arhivare.')
@@ -521,8 +681,9 @@ def _archive_job_to_folder(job: OcrJob, folder: LibraryFolder) -> StoredDocument
     processed_name = Path(job.processed_file.name).name
 
     if document.original_file and document.original_file.name:
-        document.original_file.delete(save=False)
+        tiering.delete(document.original_file)
 
+    tiering.ensure_hot(job.source_file)
     with job.source_file.open('rb') as original_stream:
         document.original_file.save(
             f"{job.id}_{original_name}",
@@ -531,8 +692,9 @@ def _archive_job_to_folder(job: OcrJob, folder: LibraryFolder) -> StoredDocument
         )
 
     if document.processed_file and document.processed_file.name:
-        document.processed_file.delete(save=False)
+        tiering.delete(document.processed_file)
 
+    tiering.ensure_hot(job.processed_file)
     with job.processed_file.open('rb') as processed_stream:
         document.processed_file.save(
             f"{job.id}_{processed_name}",
@@ -544,18 +706,97 @@ def _archive_job_to_folder(job: OcrJob, folder: LibraryFolder) -> StoredDocument
     return document
 
 
-def _run_ocr(job: OcrJob) -> ProcessingResult:
+def _run_ocr(job: OcrJob, tracer: JobTracer | None = None) -> ProcessingResult:
+    tracer = tracer or JobTracer()
+    try:
+        return _run_traced_ocr(job, tracer)
+    finally:
+        tracer.save(job)
+
+
+def _run_leased_ocr(job: OcrJob, tracer: JobTracer) -> ProcessingResult:
+    """
+    Run a job inside the web request under a lease, so that a job whose process dies is
+    requeued and resumed by ``manage.py ocr_worker`` instead of staying in progress.
+    """
+    workers.lease_inline(job)
+    try:
+        with workers.LeaseKeeper(None, job.pk):
+            return _run_ocr(job, tracer)
+    finally:
+        workers.end_lease(None, job)
+
+
+def _run_traced_ocr(job: OcrJob, tracer: JobTracer) -> ProcessingResult:
     settings_obj = PortalSettings.load()
     engine = settings_obj.ocr_engine or PortalSettings.OcrEngine.OCRMYPDF
-    options = job.options or {}
-    options['engine'] = engine
-    job.options = options
+    if engine == PortalSettings.OcrEngine.AUTO:
+        with tracer.stage('routing'):
+            engine = route_job(job).engine
+    # Scratch space is reserved first, so a job waiting for disk holds no CPU/memory
+    # units; both are held only while the engine runs. A web request (no lease owner)
+    # waits less for disk than a queue worker, which requeues the job instead.
+    inline = job.lease_owner_id is None
+    with ExitStack() as admission:
+        with tracer.stage('scratch_wait'):
+            wait = settings.OCR_SCRATCH_INLINE_WAIT_SECONDS if inline else None
+            workspace = admission.enter_context(scratch.reserve_for(job, wait))
+        with tracer.stage('admission'):
+            budget = admission.enter_context(governor.admit(engine))
+        options = job.options or {}
+        options['engine'] = engine
+        options['budget'] = budget.as_dict()
+        options['scratch'] = workspace.as_dict()
+        job.options = options
+        job.save(update_fields=['options'])
+
+        started = time.perf_counter()
+        metrics.OCR_JOBS_IN_PROGRESS.inc()
+        try:
+            result = _run_engine(job, engine, tracer, budget, workspace)
+        except RuntimeError:
+            # A crash never gets here, so its checkpoints are kept for the next attempt.
+            checkpoints.discard(job)
+            elapsed = time.perf_counter() - started
+            record_outcome(job, engine, elapsed, OcrJob.Status.FAILED)
+            workspace.measure()
+            job.options['scratch'] = workspace.as_dict()
+            job.save(update_fields=['options'])
+            metrics.record_job(engine, OcrJob.Status.FAILED, elapsed, 0, tracer.as_dict())
+            raise
+        finally:
+            metrics.OCR_JOBS_IN_PROGRESS.dec()
+        workspace.measure()
+        job.options['scratch'] = workspace.as_dict()
+    checkpoints.discard(job)
+    elapsed = time.perf_counter() - started
+    record_outcome(job, result.engine, elapsed, job.status)
+    pages = job.options.get('pages') or count_pages(job)
+    job.options['pages'] = pages
     job.save(update_fields=['options'])
+    metrics.record_job(result.engine, job.status, elapsed, pages, tracer.as_dict())
+
+    if job.destination_folder and job.status == OcrJob.Status.COMPLETED:
+        try:
+            with tracer.stage('archive'):
+                _archive_job_to_folder(job, job.destination_folder)
+        except ValueError:
+            log.warning('Job %s nu poate fi salvat în folderul selectat.', job.id)
+
+    if job.status == OcrJob.Status.COMPLETED:
+        # The result is already downloadable; the smaller file replaces it when ready.
+        compression.schedule(job)
 
+    return result
+
+
+def _run_engine(
+    job: OcrJob, engine: str, tracer: JobTracer, budget: Budget, workspace: Reservation
+) -> ProcessingResult:
     if engine == PortalSettings.OcrEngine.DOCLING:
         if not PortalSettings.docling_available():
             log.warning('Docling engine requested but unavailable; falling back to OCRmyPDF.')
-            result = _run_with_ocrmypdf(job)
+            result = _run_with_ocrmypdf(job, tracer, budget, workspace)
             unavailable_msg = 'Docling nu este disponibil în acest moment. '
             if result.level == 'success':
                 result = ProcessingResult(
@@ -570,85 +811,229 @@ def _run_ocr(job: OcrJob) -> ProcessingResult:
                     engine=result.engine,
                 )
         else:
-            result = _run_with_docling(job)
+            result = _run_with_docling(job, tracer, budget, workspace)
     else:
-        result = _run_with_ocrmypdf(job)
-
-    if job.destination_folder and job.status == OcrJob.Status.COMPLETED:
-        try:
-            _archive_job_to_folder(job, job.destination_folder)
-        except ValueError:
-            log.warning('Job %s nu poate fi salvat în folderul selectat.', job.id)
-
+        result = _run_with_ocrmypdf(job, tracer, budget, workspace)
     return result
 
 
-def _run_with_ocrmypdf(job: OcrJob) -> ProcessingResult:
+def _ocrmypdf_kwargs(options: dict, language: str | None) -> dict:
+    return {
+        'language': language,
+        'optimize': int(options.get('optimize', 1) or 0),
+        'deskew': options.get('deskew', False),
+        'rotate_pages': options.get('rotate_pages', False),
+        'remove_background': options.get('remove_background', False),
+        'clean_final': options.get('clean_final', False),
+        'skip_text': options.get('skip_text', True),
+        'force_ocr': options.get('force_ocr', False),
+        'output_type': options.get('output_type') or 'pdfa',
+        'progress_bar': False,
+    }
+
+
+def _plan_resolution(job: OcrJob, input_path: Path, tracer: JobTracer) -> ResolutionPlan | None:
+    """
+    Choose the OCR resolution and colour mode from the text size of a few sample
+    pages and record it in ``job.options['resolution']``.
+    """
+    if not settings.OCR_ADAPTIVE_DPI or not resolution.available():
+        return None
+    options = job.options or {}
     try:
-        import ocrmypdf
-        from ocrmypdf import exceptions as ocrmypdf_exceptions
-    except ImportError as exc:  # pragma: no cover
+        with tracer.stage('resolution'):
+            profile = (options.get('routing') or {}).get('profile')
+            if profile:
+                native_dpi = profile.get('image_dpi') or 0
+            else:
+                with input_path.open('rb') as stream:
+                    native_dpi = profile_document(stream).image_dpi
+            plan = resolution.plan_resolution(input_path, native_dpi)
+    except Exception:  # noqa: BLE001 - OCR still runs at the native resolution
+        log.warning('Resolution analysis failed for job %s.', job.id, exc_info=True)
+        return None
+    if plan is None:
+        return None
+    options['resolution'] = plan.as_dict()
+    job.options = options
+    job.save(update_fields=['options'])
+    return plan
+
+
+def _preprocess_input(
+    job: OcrJob,
+    input_path: Path,
+    scratch_dir: Path,
+    tracer: JobTracer,
+    plan: ResolutionPlan | None = None,
+) -> Path | None:
+    """
+    Run the OpenCV preprocessing stage when it is enabled and the job asked for
+    deskew/background removal/cleaning. Returns the cleaned PDF (written to
+    ``scratch_dir``; ``input_path`` may be the stored upload), or ``None`` to let
+    the engine handle those options itself. Pages are rasterised at the planned
+    resolution when the scan is denser than the text needs.
+    """
+    if settings.OCR_PREPROCESSING != 'opencv':
+        return None
+    options = job.options or {}
+    dpi = plan.dpi if plan is not None and plan.reduced else settings.OCR_PREPROCESS_DPI
+    preprocess_options = PreprocessOptions.from_job_options(options, dpi=dpi)
+    if not preprocess_options.enabled:
+        return None
+    preprocess_options.bitonal = plan is not None and plan.mode == 'bitonal'
+    if not preprocess.available():
+        log.warning('OpenCV preprocessing requested but opencv/pypdfium2/img2pdf are missing.')
+        return None
+
+    destination = scratch_dir / 'preprocessed.pdf'
+    try:
+        angles = preprocess.preprocess_pdf(input_path, destination, preprocess_options, stage=tracer.stage)
+    except Exception:  # noqa: BLE001 - the engine can still process the original
+        log.warning('Preprocessing failed for job %s; using the original PDF.', job.id, exc_info=True)
+        return None
+    if all(angle is None for angle in angles):
+        # Every page has a text layer; the engine gets the original.
+        return None
+    options['preprocessing'] = {'engine': 'opencv', 'dpi': preprocess_options.dpi, 'skew': angles}
+    job.options = options
+    job.save(update_fields=['options'])
+    return destination
+
+
+def _run_with_ocrmypdf(
+    job: OcrJob, tracer: JobTracer, budget: Budget, workspace: Reservation
+) -> ProcessingResult:
+    if importlib.util.find_spec('ocrmypdf') is None:  # pragma: no cover
         raise RuntimeError(
             'OCRmyPDF nu este instalat. Instalează pachetul „ocrmypdf” și dependențele Tesseract.'
-        ) from exc
+        )
 
     job.ensure_directories()
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with tempfile.TemporaryDirectory(dir=workspace.path) as temp_dir, ExitStack() as inputs:
         temp_dir_path = Path(temp_dir)
-        input_path = temp_dir_path / 'input.pdf'
         output_path = temp_dir_path / 'output.pdf'
         sidecar_path = temp_dir_path / 'sidecar.txt'
 
-        with job.source_file.open('rb') as uploaded, input_path.open('wb') as destination:
-            shutil.copyfileobj(uploaded, destination)
+        # Local storage is read in place; remote storage is streamed to scratch once.
+        with tracer.stage('copy_input'):
+            tiering.ensure_hot(job.source_file)
+            input_path = inputs.enter_context(media.local_copy(job.source_file, temp_dir_path))
+        tracer.add_bytes('copy_input', input_path.stat().st_size)
 
         language = job.language or None
         options = job.options or {}
         if options.get('auto_language'):
             language = None
 
-        ocr_kwargs = {
-            'language': language,
-            'optimize': int(options.get('optimize', 1) or 0),
-            'deskew': options.get('deskew', False),
-            'rotate_pages': options.get('rotate_pages', False),
-            'remove_background': options.get('remove_background', False),
-            'clean_final': options.get('clean_final', False),
-            'skip_text': options.get('skip_text', True),
-            'force_ocr': options.get('force_ocr', False),
-            'output_type': options.get('output_type') or 'pdfa',
-            'progress_bar': False,
-        }
-
+        ocr_kwargs = _ocrmypdf_kwargs(options, language)
+        ocr_kwargs['jobs'] = budget.cpus
+        plan = _plan_resolution(job, input_path, tracer)
         sidecar_requested = options.get('make_sidecar')
-        if sidecar_requested:
-            ocr_kwargs['sidecar'] = str(sidecar_path)
 
-        handled_exceptions = [
-            ocrmypdf_exceptions.MissingDependencyError,
+        total_pages = bounded.page_count(input_path)
+        if checkpoints.enabled_for(total_pages):
+            info_message = _run_ocrmypdf_chunks(job, input_path, temp_dir_path, total_pages, ocr_kwargs, plan, tracer)
+        else:
+            info_message = _ocrmypdf_pass(
+                job, input_path, temp_dir_path, ocr_kwargs, plan, tracer, sidecar=sidecar_requested
+            )
+            if settings.OCR_STRUCTURED_OUTPUT:
+                _save_structure(job, hocr_pages(temp_dir_path / 'hocr'), tracer)
+
+        with tracer.stage('save_processed', output_path.stat().st_size):
+            with output_path.open('rb') as processed:
+                job.processed_file.save(
+                    f"{Path(job.source_file.name).stem}_ocr.pdf",
+                    File(processed),
+                    save=False,
+                )
+
+        if sidecar_requested and sidecar_path.exists():
+            with tracer.stage('save_sidecar', sidecar_path.stat().st_size):
+                with sidecar_path.open('rb') as sidecar_stream:
+                    job.sidecar_file.save(
+                        f"{Path(job.source_file.name).stem}.txt",
+                        File(sidecar_stream),
+                        save=False,
+                    )
+        elif job.sidecar_file:
+            job.sidecar_file.delete(save=False)
+            job.sidecar_file = None
+
+    job.status = OcrJob.Status.COMPLETED
+    job.error_message = ''
+    job.save(
+        update_fields=[
+            'processed_file',
+            'sidecar_file',
+            'structure_file',
+            'status',
+            'error_message',
+            'updated_at',
         ]
-        for attr in ('SubprocessOutputError', 'OcrError', 'ExitCodeError'):
-            exc_cls = getattr(ocrmypdf_exceptions, attr, None)
-            if exc_cls is not None and exc_cls not in handled_exceptions:
-                handled_exceptions.append(exc_cls)
+    )
+
+    message = info_message or 'Documentul a fost procesat cu succes cu OCRmyPDF.'
+    level = 'info' if info_message else 'success'
+    return ProcessingResult(message, level=level, engine='ocrmypdf')
 
-        info_message = None
+
+def _ocrmypdf_pass(
+    job: OcrJob,
+    input_path: Path,
+    directory: Path,
+    ocr_kwargs: dict,
+    plan: ResolutionPlan | None,
+    tracer: JobTracer,
+    sidecar: bool = False,
+) -> str | None:
+    """
+    Preprocess and OCR ``input_path`` into ``directory/output.pdf`` (plus
+    ``sidecar.txt`` and the ``hocr`` pages when asked for). Returns the message shown
+    when the PDF already had OCR text.
+    """
+    import ocrmypdf
+    from ocrmypdf import exceptions as ocrmypdf_exceptions
+
+    output_path = directory / 'output.pdf'
+    ocr_kwargs = dict(ocr_kwargs)
+    preprocessed = _preprocess_input(job, input_path, directory, tracer, plan)
+    if preprocessed is not None:
+        input_path = preprocessed
+        ocr_kwargs.update(deskew=False, remove_background=False, clean_final=False)
+    elif plan is not None:
+        ocr_kwargs.update(plan.ocrmypdf_kwargs())
+
+    if sidecar:
+        ocr_kwargs['sidecar'] = str(directory / 'sidecar.txt')
+
+    hocr_dir = directory / 'hocr'
+    if settings.OCR_STRUCTURED_OUTPUT:
+        hocr_dir.mkdir()
+        ocr_kwargs.update(portal_hocr_dir=str(hocr_dir), pdf_renderer='hocr')
+    if settings.OCR_STRUCTURED_OUTPUT or 'portal_ocr_colour' in ocr_kwargs:
+        ocr_kwargs['plugins'] = ['portal.ocrmypdf_plugin']
+
+    handled_exceptions = [
+        ocrmypdf_exceptions.MissingDependencyError,
+    ]
+    for attr in ('SubprocessOutputError', 'OcrError', 'ExitCodeError'):
+        exc_cls = getattr(ocrmypdf_exceptions, attr, None)
+        if exc_cls is not None and exc_cls not in handled_exceptions:
+            handled_exceptions.append(exc_cls)
+
+    info_message = None
+    with tracer.stage('ocr'):
         try:
-            ocrmypdf.ocr(
-                str(input_path),
-                str(output_path),
-                **ocr_kwargs,
-            )
+            # In a child process, so OCRmyPDF's work files land in the job directory.
+            scratch.run_in(directory, ocrmypdf.ocr, str(input_path), str(output_path), **ocr_kwargs)
         except ocrmypdf_exceptions.PriorOcrFoundError:
             log.info('Existing OCR detected for job %s; rerunning with skip_text.', job.id)
             safe_kwargs = {**ocr_kwargs, 'skip_text': True, 'force_ocr': False}
             try:
-                ocrmypdf.ocr(
-                    str(input_path),
-                    str(output_path),
-                    **safe_kwargs,
-                )
+                scratch.run_in(directory, ocrmypdf.ocr, str(input_path), str(output_path), **safe_kwargs)
             except tuple(handled_exceptions) as fallback_exc:  # type: ignore[arg-type]
                 log.exception('OCR fallback failed for job %s', job.id)
                 raise RuntimeError(str(fallback_exc)) from fallback_exc
@@ -659,134 +1044,290 @@ def _run_with_ocrmypdf(job: OcrJob) -> ProcessingResult:
         except tuple(handled_exceptions) as exc:  # type: ignore[arg-type]
             log.exception('OCR failed for job %s', job.id)
             raise RuntimeError(str(exc)) from exc
-
-        with output_path.open('rb') as processed:
-            job.processed_file.save(
-                f"{Path(job.source_file.name).stem}_ocr.pdf",
-                File(processed),
-                save=False,
+    return info_message
+
+
+def _run_ocrmypdf_chunks(
+    job: OcrJob,
+    input_path: Path,
+    scratch_dir: Path,
+    total_pages: int,
+    ocr_kwargs: dict,
+    plan: ResolutionPlan | None,
+    tracer: JobTracer,
+) -> str | None:
+    """
+    OCR a long document in checkpointed chunks (see ``portal.checkpoints``): only the
+    pages a previous attempt did not finish are processed, then ``scratch_dir/output.pdf``,
+    ``sidecar.txt`` and the structure file are assembled from the stored chunks.
+    """
+    info_message = None
+    chunks = checkpoints.completed(job, 'ocrmypdf')
+    resumed_from = checkpoints.next_page(chunks)
+    for window in checkpoints.plan(total_pages, start=resumed_from):
+        directory = scratch_dir / f'chunk-{window.start:06d}'
+        directory.mkdir()
+        with tracer.stage('split'):
+            part = checkpoints.extract(input_path, window, directory / 'input.pdf')
+        # The sidecar is always written: the assembled text must cover every chunk.
+        info_message = _ocrmypdf_pass(job, part, directory, ocr_kwargs, plan, tracer, sidecar=True) or info_message
+        pages = ()
+        if settings.OCR_STRUCTURED_OUTPUT:
+            pages = checkpoints.shift_pages(hocr_pages(directory / 'hocr'), window.start - 1)
+        with tracer.stage('checkpoint'):
+            chunks.append(
+                checkpoints.save(job, 'ocrmypdf', window, directory / 'output.pdf', directory / 'sidecar.txt', pages)
             )
+        shutil.rmtree(directory, ignore_errors=True)
 
-        if sidecar_requested and sidecar_path.exists():
-            with sidecar_path.open('rb') as sidecar_stream:
-                job.sidecar_file.save(
-                    f"{Path(job.source_file.name).stem}.txt",
-                    File(sidecar_stream),
-                    save=False,
-                )
-        elif job.sidecar_file:
-            job.sidecar_file.delete(save=False)
-            job.sidecar_file = None
+    with tracer.stage('assemble'):
+        checkpoints.assemble(chunks, scratch_dir, input_path, total_pages)
+    if settings.OCR_STRUCTURED_OUTPUT:
+        _save_structure(job, checkpoints.structure_pages(chunks, scratch_dir), tracer)
+    _record_checkpoints(job, chunks, resumed_from, total_pages)
+    return info_message
 
-    job.status = OcrJob.Status.COMPLETED
-    job.error_message = ''
-    job.save(
-        update_fields=['processed_file', 'sidecar_file', 'status', 'error_message', 'updated_at']
-    )
 
-    message = info_message or 'Documentul a fost procesat cu succes cu OCRmyPDF.'
-    level = 'info' if info_message else 'success'
-    return ProcessingResult(message, level=level, engine='ocrmypdf')
+def _record_checkpoints(job: OcrJob, chunks, resumed_from: int, total_pages: int) -> None:
+    options = job.options or {}
+    options['checkpoints'] = {'pages': total_pages, 'chunks': len(chunks), 'resumed_from': resumed_from}
+    job.options = options
+    job.save(update_fields=['options'])
 
-def _run_with_docling(job: OcrJob) -> ProcessingResult:
-    try:
-        from docling.document_converter import DocumentConverter
-    except ImportError as exc:  # pragma: no cover
+
+def _save_structure(job: OcrJob, pages, tracer: JobTracer) -> None:
+    with tracer.stage('save_structure'), tempfile.NamedTemporaryFile(suffix='.ocrpages') as buffer:
+        if write_pages(buffer, pages):
+            _store_structure(job, buffer, tracer)
+
+
+def _save_blocks(job: OcrJob, document, tracer: JobTracer) -> None:
+    """Keep the Word blocks of a whole Docling document for later conversions."""
+    with tracer.stage('save_blocks'), tempfile.NamedTemporaryFile(suffix='.jsonl.gz') as buffer:
+        write_blocks(buffer, docling_blocks(document))
+        tracer.add_bytes('save_blocks', buffer.tell())
+        buffer.seek(0)
+        if job.blocks_file:
+            job.blocks_file.delete(save=False)
+        job.blocks_file.save(f"{Path(job.source_file.name).stem}.blocks.jsonl.gz", File(buffer), save=False)
+
+
+def _store_structure(job: OcrJob, buffer, tracer: JobTracer) -> None:
+    tracer.add_bytes('save_structure', buffer.tell())
+    buffer.seek(0)
+    if job.structure_file:
+        job.structure_file.delete(save=False)
+    job.structure_file.save(f"{Path(job.source_file.name).stem}.ocrpages", File(buffer), save=False)
+
+
+def _run_with_docling(
+    job: OcrJob, tracer: JobTracer, budget: Budget, workspace: Reservation
+) -> ProcessingResult:
+    if importlib.util.find_spec('docling') is None:  # pragma: no cover
         raise RuntimeError(
             'Docling nu este instalat. Instalează pachetul „docling” pentru a folosi acest motor.'
-        ) from exc
+        )
 
     job.ensure_directories()
     options = job.options or {}
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with tempfile.TemporaryDirectory(dir=workspace.path) as temp_dir, ExitStack() as inputs:
         temp_dir_path = Path(temp_dir)
-        input_path = temp_dir_path / 'input.pdf'
         output_path = temp_dir_path / 'output.pdf'
         sidecar_path = temp_dir_path / 'sidecar.txt'
 
-        with job.source_file.open('rb') as uploaded, input_path.open('wb') as destination:
-            shutil.copyfileobj(uploaded, destination)
+        # Local storage is read in place; remote storage is streamed to scratch once.
+        with tracer.stage('copy_input'):
+            tiering.ensure_hot(job.source_file)
+            input_path = inputs.enter_context(media.local_copy(job.source_file, temp_dir_path))
+        tracer.add_bytes('copy_input', input_path.stat().st_size)
+        # Docling renders pages at its own scale; the plan only matters for preprocessing.
+        plan = _plan_resolution(job, input_path, tracer) if settings.OCR_PREPROCESSING == 'opencv' else None
+        input_path = _preprocess_input(job, input_path, temp_dir_path, tracer, plan) or input_path
 
         try:
-            converter = DocumentConverter()
+            with tracer.stage('docling_init'):
+                converter = warmup.docling_converter(budget.cpus)
         except Exception as exc:  # noqa: BLE001
             log.exception('Docling initialisation failed for job %s', job.id)
+            record_probe('docling', False, warmup.engine_version('docling'), str(exc))
             raise RuntimeError(
                 'Docling nu a putut fi inițializat. Verifică dacă dependențele (rapidocr-onnxruntime, opencv-python-headless) sunt instalate.'
             ) from exc
 
-        try:
-            result = converter.convert(str(input_path))
-        except Exception as exc:  # noqa: BLE001
-            log.exception('Docling conversion failed for job %s', job.id)
-            message = str(exc)
-            if 'No OCR engine found' in message:
-                message = (
-                    'Docling nu a găsit un motor OCR disponibil. Instalează „rapidocr-onnxruntime” sau configurează un motor compatibil.'
-                )
-            raise RuntimeError(message) from exc
-        document = getattr(result, 'document', None)
-        if document is None:
-            raise RuntimeError('Docling nu a putut procesa documentul furnizat.')
-
-        pdf_bytes = getattr(result, 'pdf_bytes', None)
-        if pdf_bytes:
-            with output_path.open('wb') as pdf_out:
-                pdf_out.write(pdf_bytes)
-        elif hasattr(document, 'export_to_pdf'):
-            exported_pdf = document.export_to_pdf()
-            if isinstance(exported_pdf, (bytes, bytearray)):
-                with output_path.open('wb') as pdf_out:
-                    pdf_out.write(exported_pdf)
-            else:
-                shutil.copyfile(input_path, output_path)
+        total_pages = bounded.page_count(input_path)
+        if bounded.enabled_for(total_pages):
+            # The document is never whole in memory; Word export reads the sidecar instead.
+            document = None
+            _run_docling_windows(job, converter, input_path, temp_dir_path, total_pages, tracer)
         else:
-            shutil.copyfile(input_path, output_path)
-
-        text_content = ''
-        if hasattr(document, 'export_to_markdown'):
-            text_content = _markdown_to_plain_text(document.export_to_markdown())
-        elif hasattr(document, 'export_to_text'):
-            text_content = str(document.export_to_text())
-        elif hasattr(document, 'pages'):
-            lines = []
-            for page in getattr(document, 'pages', []):
-                page_text = getattr(page, 'text', '')
-                if page_text:
-                    lines.append(page_text)
-            text_content = '\n'.join(lines)
-
-        text_content = text_content.strip()
-        if not text_content:
-            text_content = 'Nu a fost posibilă extragerea textului cu Docling.'
+            try:
+                with warmup.docling_lock, tracer.stage('ocr'):
+                    result = converter.convert(str(input_path))
+            except Exception as exc:  # noqa: BLE001
+                raise _docling_failure(job, exc) from exc
+            document = getattr(result, 'document', None)
+            if document is None:
+                raise RuntimeError('Docling nu a putut procesa documentul furnizat.')
+
+            with tracer.stage('export_pdf'):
+                pdf_bytes = getattr(result, 'pdf_bytes', None)
+                if pdf_bytes:
+                    with output_path.open('wb') as pdf_out:
+                        pdf_out.write(pdf_bytes)
+                elif hasattr(document, 'export_to_pdf'):
+                    exported_pdf = document.export_to_pdf()
+                    if isinstance(exported_pdf, (bytes, bytearray)):
+                        with output_path.open('wb') as pdf_out:
+                            pdf_out.write(exported_pdf)
+                    else:
+                        shutil.copyfile(input_path, output_path)
+                else:
+                    shutil.copyfile(input_path, output_path)
+
+            with tracer.stage('export_text'):
+                text_content = _docling_text(document)
+            if not text_content:
+                text_content = DOCLING_NO_TEXT
+            sidecar_path.write_text(text_content, encoding='utf-8', errors='ignore')
+
+            if settings.OCR_STRUCTURED_OUTPUT and hasattr(document, 'iterate_items'):
+                _save_structure(job, docling_pages(document), tracer)
+            if hasattr(document, 'iterate_items'):
+                _save_blocks(job, document, tracer)
 
         if options.get('make_sidecar'):
-            sidecar_path.write_text(text_content, encoding='utf-8', errors='ignore')
-            with sidecar_path.open('rb') as sidecar_stream:
-                job.sidecar_file.save(
-                    f"{Path(job.source_file.name).stem}.txt",
-                    File(sidecar_stream),
-                    save=False,
-                )
+            with tracer.stage('save_sidecar', sidecar_path.stat().st_size):
+                with sidecar_path.open('rb') as sidecar_stream:
+                    job.sidecar_file.save(
+                        f"{Path(job.source_file.name).stem}.txt",
+                        File(sidecar_stream),
+                        save=False,
+                    )
         elif job.sidecar_file:
             job.sidecar_file.delete(save=False)
             job.sidecar_file = None
 
-        with output_path.open('rb') as processed:
-            job.processed_file.save(
-                f"{Path(job.source_file.name).stem}_docling.pdf",
-                File(processed),
-                save=False,
-            )
+        with tracer.stage('save_processed', output_path.stat().st_size):
+            with output_path.open('rb') as processed:
+                job.processed_file.save(
+                    f"{Path(job.source_file.name).stem}_docling.pdf",
+                    File(processed),
+                    save=False,
+                )
 
     job.status = OcrJob.Status.COMPLETED
     job.error_message = ''
     job.save(
-        update_fields=['processed_file', 'sidecar_file', 'status', 'error_message', 'updated_at']
+        update_fields=[
+            'processed_file',
+            'sidecar_file',
+            'structure_file',
+            'blocks_file',
+            'status',
+            'error_message',
+            'updated_at',
+        ]
     )
 
-    return ProcessingResult('Documentul a fost procesat cu succes cu Docling.', engine='docling')
+    return ProcessingResult(
+        'Documentul a fost procesat cu succes cu Docling.', engine='docling', document=document
+    )
+
+
+def _docling_failure(job: OcrJob, exc: Exception) -> RuntimeError:
+    log.exception('Docling conversion failed for job %s', job.id)
+    message = str(exc)
+    if 'No OCR engine found' in message:
+        message = (
+            'Docling nu a găsit un motor OCR disponibil. Instalează „rapidocr-onnxruntime” sau configurează un motor compatibil.'
+        )
+    return RuntimeError(message)
+
+
+def _run_docling_windows(
+    job: OcrJob,
+    converter,
+    input_path: Path,
+    scratch_dir: Path,
+    total_pages: int,
+    tracer: JobTracer,
+) -> None:
+    """
+    Convert a large PDF in page windows (see ``portal.bounded``), storing each window
+    as a checkpoint, then assemble ``scratch_dir/output.pdf``, ``sidecar.txt`` and the
+    structure file from the stored windows. A retried job skips the windows a previous
+    attempt finished.
+    """
+    chunks = checkpoints.completed(job, 'docling')
+    resumed_from = checkpoints.next_page(chunks)
+
+    def handle(window: bounded.Window, result) -> None:
+        document = getattr(result, 'document', None)
+        if document is None:
+            raise RuntimeError('Docling nu a putut procesa documentul furnizat.')
+        directory = scratch_dir / f'chunk-{window.start:06d}'
+        directory.mkdir()
+        pdf_bytes = getattr(result, 'pdf_bytes', None)
+        if pdf_bytes:
+            (directory / 'output.pdf').write_bytes(pdf_bytes)
+        with tracer.stage('export_text'):
+            text_content = _docling_text(document)
+        with (directory / 'sidecar.txt').open('w', encoding='utf-8', errors='ignore') as sidecar:
+            if text_content:
+                sidecar.write(text_content + '\n\n')
+        pages = ()
+        if settings.OCR_STRUCTURED_OUTPUT and hasattr(document, 'iterate_items'):
+            pages = docling_pages(document)
+        with tracer.stage('checkpoint'):
+            chunks.append(
+                checkpoints.save(job, 'docling', window, directory / 'output.pdf', directory / 'sidecar.txt', pages)
+            )
+        shutil.rmtree(directory, ignore_errors=True)
+
+    try:
+        with warmup.docling_lock:
+            planner = bounded.convert_in_windows(
+                converter, input_path, total_pages, handle, stage=tracer.stage, start=resumed_from
+            )
+    except RuntimeError:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        raise _docling_failure(job, exc) from exc
+
+    with tracer.stage('assemble'):
+        if not checkpoints.assemble(chunks, scratch_dir, input_path, total_pages):
+            (scratch_dir / 'sidecar.txt').write_text(DOCLING_NO_TEXT, encoding='utf-8')
+    if settings.OCR_STRUCTURED_OUTPUT:
+        _save_structure(job, checkpoints.structure_pages(chunks, scratch_dir), tracer)
+    _record_checkpoints(job, chunks, resumed_from, total_pages)
+
+    options = job.options or {}
+    options['bounded'] = {
+        'pages': total_pages,
+        'window': planner.size,
+        'peak_rss_mb': planner.peak // (1024 * 1024),
+    }
+    job.options = options
+    job.save(update_fields=['options'])
+
+
+def _docling_text(document) -> str:
+    text_content = ''
+    if hasattr(document, 'iterate_items'):
+        text_content = ''.join(blocks_to_text(docling_blocks(document)))
+    elif hasattr(document, 'export_to_markdown'):
+        text_content = _markdown_to_plain_text(document.export_to_markdown())
+    elif hasattr(document, 'export_to_text'):
+        text_content = str(document.export_to_text())
+    elif hasattr(document, 'pages'):
+        lines = []
+        for page in getattr(document, 'pages', []):
+            page_text = getattr(page, 'text', '')
+            if page_text:
+                lines.append(page_text)
+        text_content = '\n'.join(lines)
+    return text_content.strip()
 
 
 def _markdown_to_plain_text(markdown_text: str) -> str:
@@ -829,35 +1370,75 @@ def _generate_docx(user, title: str, body: str) -> WordDocument:
     return word_doc
 
 
+def _upload_sha256(uploaded_file) -> str:
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _reusable_text_job(user, sha256: str) -> OcrJob | None:
+    """A finished job of this user for the same PDF whose text can be reused."""
+    return (
+        OcrJob.objects.filter(user=user, source_sha256=sha256, status=OcrJob.Status.COMPLETED)
+        .exclude(sidecar_file='')
+        .exclude(sidecar_file__isnull=True)
+        .order_by('-created_at')
+        .first()
+    )
+
+
 def _convert_pdf_to_word(user, title: str, pdf_file) -> WordDocument:
-    Document = _load_docx_document()
-    job = OcrJob(user=user, status=OcrJob.Status.PROCESSING, options={'make_sidecar': True})
-    job.source_file.save(pdf_file.name, pdf_file, save=False)
-    job.save()
+    _load_docx_document()
+    sha256 = _upload_sha256(pdf_file)
+    job = _reusable_text_job(user, sha256)
+    structured = None
+    if job is not None:
+        log.info('Reusing the OCR text of job %s for the Word conversion.', job.id)
+    else:
+        job = OcrJob(
+            user=user,
+            status=OcrJob.Status.PROCESSING,
+            # A worker that resumes an interrupted conversion creates the document.
+            options={'make_sidecar': True, 'word_title': title},
+            source_sha256=sha256,
+        )
+        tracer = JobTracer()
+        with tracer.stage('upload', pdf_file.size):
+            job.source_file.save(pdf_file.name, pdf_file, save=False)
+            job.save()
 
-    try:
-        _run_ocr(job)
-    except RuntimeError as exc:
-        job.status = OcrJob.Status.FAILED
-        job.error_message = str(exc)
-        job.save(update_fields=['status', 'error_message', 'updated_at'])
-        raise
+        try:
+            result = _run_leased_ocr(job, tracer)
+        except RuntimeError as exc:
+            job.status = OcrJob.Status.FAILED
+            job.error_message = str(exc)
+            job.save(update_fields=['status', 'error_message', 'updated_at'])
+            raise
+        structured = result.document if result else None
 
-    text_content = ''
-    if job.sidecar_file:
-        with job.sidecar_file.open('rb') as sidecar:
-            text_content = sidecar.read().decode('utf-8', errors='ignore')
+    return _word_document_from_job(user, title, job, structured)
 
-    document = Document()
-    document.add_heading(title, level=1)
-    for paragraph in text_content.split('\n'):
-        if paragraph.strip():
-            document.add_paragraph(paragraph)
 
+def _word_document_from_job(user, title: str, job: OcrJob, structured=None) -> WordDocument:
     with tempfile.NamedTemporaryFile(suffix='.docx') as tmp:
-        document.save(tmp.name)
+        if structured is not None:
+            write_docx(tmp, title, docling_blocks(structured))
+        elif job.blocks_file:
+            # A reused or resumed Docling job: its headings, lists and tables were kept.
+            tiering.ensure_hot(job.blocks_file)
+            with job.blocks_file.open('rb') as stored:
+                write_docx(tmp, title, read_blocks(stored))
+        elif job.sidecar_file:
+            tiering.ensure_hot(job.sidecar_file)
+            with job.sidecar_file.open('rb') as sidecar:
+                write_docx(tmp, title, iter_sidecar_blocks(sidecar))
+        else:
+            write_docx(tmp, title, [])
         tmp.seek(0)
         word_doc = WordDocument(user=user, title=title)
+        tiering.ensure_hot(job.source_file)
         with job.source_file.open('rb') as source_stream:
             word_doc.source_pdf.save(Path(job.source_file.name).name, File(source_stream), save=False)
         word_doc.document_file.save(f"{title.replace(' ', '_')}.docx", File(tmp), save=False)
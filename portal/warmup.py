@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+import threading
+import time
+from importlib import metadata
+
+from django.conf import settings
+from django.db import connections
+
+from . import governor
+from .capabilities import probe_tesseract, record_probe
+
+log = logging.getLogger(__name__)
+
+# Versions resolved during warm-up (or lazily on first lookup); forked workers
+# inherit the populated dict.
+ENGINE_VERSIONS: dict[str, str | None] = {}
+# Seconds spent warming each engine in this process.
+WARMUP_SECONDS: dict[str, float] = {}
+
+_PACKAGES = {
+    'ocrmypdf': 'ocrmypdf',
+    'docling': 'docling',
+    'docx': 'python-docx',
+}
+
+_docling_converter = None
+_docling_init_lock = threading.Lock()
+# DocumentConverter keeps per-format pipelines with mutable state; conversions in
+# the threads of one worker are serialised on the shared instance.
+docling_lock = threading.Lock()
+
+
+def engine_version(engine: str) -> str | None:
+    """Installed version of an engine, read from package metadata without importing it."""
+    if engine not in ENGINE_VERSIONS:
+        try:
+            ENGINE_VERSIONS[engine] = metadata.version(_PACKAGES.get(engine, engine))
+        except metadata.PackageNotFoundError:
+            ENGINE_VERSIONS[engine] = None
+    return ENGINE_VERSIONS[engine]
+
+
+def docling_converter(num_threads: int | None = None):
+    """
+    Process-wide Docling converter; built on first use unless warm-up already did it.
+    Its models (and the onnxruntime OCR sessions) run on at most ``num_threads``
+    threads, one job's CPU budget by default.
+    """
+    global _docling_converter
+    if _docling_converter is None:
+        with _docling_init_lock:
+            if _docling_converter is None:
+                _docling_converter = _build_docling_converter(num_threads or governor.capacity().job_cpus)
+    return _docling_converter
+
+
+def _build_docling_converter(num_threads: int):
+    from docling.document_converter import DocumentConverter
+
+    try:
+        from docling.datamodel.base_models import InputFormat
+        from docling.datamodel.pipeline_options import PdfPipelineOptions
+        from docling.document_converter import PdfFormatOption
+
+        try:
+            from docling.datamodel.accelerator_options import AcceleratorOptions
+        except ImportError:  # pragma: no cover - Docling < 2.40
+            from docling.datamodel.pipeline_options import AcceleratorOptions
+    except ImportError:  # pragma: no cover - releases without accelerator options
+        log.info('Docling has no accelerator options; thread pools follow OMP_NUM_THREADS.')
+        return DocumentConverter()
+
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.accelerator_options = AcceleratorOptions(num_threads=num_threads)
+    return DocumentConverter(
+        format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)}
+    )
+
+
+def _warm_ocrmypdf() -> None:
+    import ocrmypdf
+    import pikepdf  # noqa: F401 - imported for its side effect on sys.modules
+
+    ENGINE_VERSIONS['ocrmypdf'] = ocrmypdf.__version__
+    # Tesseract runs as a subprocess per page, so its traineddata cannot be held in
+    # Python memory; the registry only re-runs it when the install changed.
+    probe_tesseract()
+
+
+def _import_docling() -> None:
+    import docling.document_converter  # noqa: F401
+
+    try:
+        import docling.pipeline.standard_pdf_pipeline  # noqa: F401
+    except ImportError:  # pragma: no cover - older Docling releases
+        pass
+    engine_version('docling')
+
+
+def _warm_docling() -> None:
+    converter = docling_converter()
+    try:
+        from docling.datamodel.base_models import InputFormat
+    except ImportError:  # pragma: no cover - older Docling releases
+        return
+    initialize = getattr(converter, 'initialize_pipeline', None)
+    if initialize is not None:
+        # Loads the layout/table models and the OCR backend (onnxruntime) now, so the
+        # first job of the worker finds them already in memory.
+        initialize(InputFormat.PDF)
+    engine_version('docling')
+
+
+def _warm_docx() -> None:
+    import docx  # noqa: F401
+
+    engine_version('docx')
+
+
+# Fork-safe warm-up: module imports and subprocess probes, nothing that starts
+# threads or native runtimes (the gunicorn master runs these before forking).
+_IMPORTERS = {
+    'ocrmypdf': _warm_ocrmypdf,
+    'docling': _import_docling,
+    'docx': _warm_docx,
+}
+# Model loading; torch/onnxruntime thread pools do not survive a fork, so these run
+# in each worker process.
+_INITIALISERS = {
+    'docling': _warm_docling,
+}
+
+
+def warm_up(engines: list[str] | None = None, phase: str = 'all') -> dict[str, float]:
+    """
+    Import and initialise the OCR engines once per process. ``phase='import'`` only
+    runs the fork-safe importers (the gunicorn master, before the workers fork),
+    ``phase='init'`` only builds the models (each worker, after the fork).
+    Engines that are not installed are skipped; failures are logged, never raised.
+    """
+    if engines is None:
+        engines = list(getattr(settings, 'OCR_WARMUP_ENGINES', _IMPORTERS))
+    stages = {'import': (_IMPORTERS,), 'init': (_INITIALISERS,), 'all': (_IMPORTERS, _INITIALISERS)}[phase]
+
+    started = time.perf_counter()
+    for engine in engines:
+        warmers = [stage[engine] for stage in stages if engine in stage]
+        if not warmers or importlib.util.find_spec(engine) is None:
+            continue
+        engine_started = time.perf_counter()
+        try:
+            for warmer in warmers:
+                warmer()
+        except Exception as exc:  # noqa: BLE001 - a broken engine must not stop the server
+            log.warning('Warm-up of %s failed.', engine, exc_info=True)
+            record_probe(engine, False, engine_version(engine), str(exc))
+            continue
+        WARMUP_SECONDS[engine] = WARMUP_SECONDS.get(engine, 0.0) + time.perf_counter() - engine_started
+        record_probe(engine, True, engine_version(engine), seconds=WARMUP_SECONDS[engine])
+    if phase == 'import':
+        # Workers must not inherit the master's database connections.
+        connections.close_all()
+
+    log.info(
+        'OCR warm-up finished in %.2fs: %s',
+        time.perf_counter() - started,
+        ', '.join(f'{name}={seconds:.2f}s' for name, seconds in WARMUP_SECONDS.items()) or 'no engines',
+    )
+    return dict(WARMUP_SECONDS)
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import re
+import shutil
+import zipfile
+from dataclasses import dataclass
+from typing import IO, Iterable, Iterator
+from xml.sax.saxutils import escape
+
+# Marker yielded between pages; rendered as a Word page break.
+PAGE_BREAK = object()
+
+_DOCUMENT_PART = 'word/document.xml'
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_PAGE_BREAK_XML = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+# Docling labels that repeat on every page and would clutter the Word body.
+_SKIPPED_LABELS = {'page_header', 'page_footer', 'picture'}
+
+
+@dataclass(slots=True)
+class Heading:
+    text: str
+    level: int = 2
+
+
+@dataclass(slots=True)
+class ListEntry:
+    text: str
+    ordered: bool = False
+
+
+@dataclass(slots=True)
+class Table:
+    rows: list[list[str]]
+
+
+def iter_sidecar_blocks(stream: IO[bytes]) -> Iterator[str | object]:
+    """
+    Yield the non-empty lines of an OCR sidecar with ``PAGE_BREAK`` between pages
+    (OCRmyPDF separates pages with a form feed). Only one line is held in memory.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='ignore')
+    try:
+        for line in text:
+            for index, part in enumerate(line.split('\f')):
+                if index:
+                    yield PAGE_BREAK
+                if part.strip():
+                    yield part.rstrip('\r\n')
+    finally:
+        text.detach()
+
+
+def _label(item) -> str:
+    label = getattr(item, 'label', '')
+    return str(getattr(label, 'value', label))
+
+
+def docling_blocks(document) -> Iterator[str | object]:
+    """
+    Walk a Docling document in reading order and yield Word blocks: headings, list
+    entries, tables and paragraphs, with ``PAGE_BREAK`` when the source page changes.
+    """
+    current_page = None
+    for item, _depth in document.iterate_items():
+        label = _label(item)
+        if label in _SKIPPED_LABELS:
+            continue
+        provenance = getattr(item, 'prov', None)
+        page = provenance[0].page_no if provenance else current_page
+        if current_page is not None and page != current_page:
+            yield PAGE_BREAK
+        current_page = page
+
+        if label == 'table':
+            data = getattr(item, 'data', None)
+            rows = [[cell.text for cell in row] for row in getattr(data, 'grid', [])]
+            if rows:
+                yield Table(rows)
+            continue
+        text = (getattr(item, 'text', '') or '').strip()
+        if not text:
+            continue
+        if label == 'title':
+            yield Heading(text, level=1)
+        elif label == 'section_header':
+            # The conversion title is Heading 1, so Docling levels start one below.
+            yield Heading(text, level=min(getattr(item, 'level', 1) + 1, 9))
+        elif label == 'list_item':
+            yield ListEntry(text, ordered=bool(getattr(item, 'enumerated', False)))
+        else:
+            yield text
+
+
+def write_blocks(destination: IO[bytes], blocks: Iterable[str | object]) -> int:
+    """
+    Store blocks as gzip-compressed JSON lines (read back by :func:`read_blocks`);
+    returns how many were written. ``PAGE_BREAK`` is stored as ``null``.
+    """
+    count = 0
+    with gzip.GzipFile(fileobj=destination, mode='wb') as archive:
+        for block in blocks:
+            if block is PAGE_BREAK:
+                entry = None
+            elif isinstance(block, Heading):
+                entry = {'h': block.text, 'l': block.level}
+            elif isinstance(block, ListEntry):
+                entry = {'li': block.text, 'o': block.ordered}
+            elif isinstance(block, Table):
+                entry = {'t': block.rows}
+            else:
+                entry = str(block)
+            archive.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+    return count
+
+
+def read_blocks(stream: IO[bytes]) -> Iterator[str | object]:
+    """Blocks stored by :func:`write_blocks`, one line in memory at a time."""
+    with gzip.GzipFile(fileobj=stream, mode='rb') as archive:
+        for line in archive:
+            entry = json.loads(line)
+            if entry is None:
+                yield PAGE_BREAK
+            elif isinstance(entry, str):
+                yield entry
+            elif 'h' in entry:
+                yield Heading(entry['h'], entry['l'])
+            elif 'li' in entry:
+                yield ListEntry(entry['li'], entry['o'])
+            else:
+                yield Table(entry['t'])
+
+
+def blocks_to_text(blocks: Iterable[str | object]) -> Iterator[str]:
+    """Plain-text rendering of blocks, one line each, pages separated by form feeds."""
+    for block in blocks:
+        if block is PAGE_BREAK:
+            yield '\f'
+        elif isinstance(block, Table):
+            for row in block.rows:
+                yield '\t'.join(row) + '\n'
+        elif isinstance(block, (Heading, ListEntry)):
+            yield block.text + '\n'
+        else:
+            yield f'{block}\n'
+
+
+def _run_xml(text: str) -> str:
+    text = _INVALID_XML_CHARS.sub('', text)
+    return f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def _paragraph_xml(text: str, style: str | None = None) -> str:
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return f'<w:p>{properties}{_run_xml(text)}</w:p>'
+
+
+def _table_xml(table: Table) -> str:
+    columns = max(len(row) for row in table.rows)
+    parts = [
+        '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/></w:tblPr>',
+        '<w:tblGrid>' + '<w:gridCol/>' * columns + '</w:tblGrid>',
+    ]
+    for row in table.rows:
+        cells = list(row) + [''] * (columns - len(row))
+        parts.append('<w:tr>' + ''.join(f'<w:tc><w:p>{_run_xml(cell)}</w:p></w:tc>' for cell in cells) + '</w:tr>')
+    parts.append('</w:tbl>')
+    return ''.join(parts)
+
+
+def _block_xml(block: str | object) -> str:
+    if isinstance(block, Heading):
+        return _paragraph_xml(block.text, f'Heading{block.level}')
+    if isinstance(block, ListEntry):
+        return _paragraph_xml(block.text, 'ListNumber' if block.ordered else 'ListBullet')
+    if isinstance(block, Table):
+        # Word requires a paragraph between adjacent tables.
+        return _table_xml(block) + '<w:p/>'
+    return _paragraph_xml(str(block))
+
+
+def _template(title: str) -> bytes:
+    from docx import Document
+
+    document = Document()
+    document.add_heading(title, level=1)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def write_docx(destination: IO[bytes], title: str, blocks: Iterable[str | object]) -> None:
+    """
+    Write a DOCX whose body is streamed from ``blocks`` (strings, ``Heading``,
+    ``ListEntry``, ``Table`` or ``PAGE_BREAK``).
+    A python-docx document containing only the heading provides styles and settings;
+    the body XML is then written paragraph by paragraph straight into the archive, so
+    memory does not grow with the document length.
+    """
+    template = zipfile.ZipFile(io.BytesIO(_template(title)))
+    document_xml = template.read(_DOCUMENT_PART).decode('utf-8')
+    # Paragraphs go after the heading and before the final section properties.
+    split_at = document_xml.rindex('<w:sectPr')
+    head, tail = document_xml[:split_at], document_xml[split_at:]
+
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for item in template.infolist():
+            if item.filename == _DOCUMENT_PART:
+                continue
+            with template.open(item) as source, archive.open(item.filename, 'w') as target:
+                shutil.copyfileobj(source, target)
+
+        with archive.open(_DOCUMENT_PART, 'w', force_zip64=True) as target:
+            target.write(head.encode('utf-8'))
+            pending_break = False
+            for block in blocks:
+                if block is PAGE_BREAK:
+                    pending_break = True
+                    continue
+                if pending_break:
+                    target.write(_PAGE_BREAK_XML.encode('utf-8'))
+                    pending_break = False
+                target.write(_block_xml(block).encode('utf-8'))
+            target.write(tail.encode('utf-8'))
@@ -0,0 +1,282 @@
+"""
+Queue execution for split deployments (``OCR_EXECUTION=queue``). Web replicas only
+store the upload and create a pending ``OcrJob``; ``manage.py ocr_worker`` processes,
+on any number of nodes sharing the database and media storage, claim jobs one at a
+time with a lease.
+
+A claim is a conditional ``UPDATE`` on the job status, so two workers can never take
+the same job, on SQLite or PostgreSQL alike. While a job runs a heartbeat thread
+extends its lease; when a worker dies the lease expires and the job is queued again,
+up to ``OCR_JOB_MAX_ATTEMPTS`` attempts. The next attempt continues from the job's
+checkpoints (see ``portal.checkpoints``).
+
+Inline jobs (``OCR_EXECUTION=inline``) hold a lease without an owner, so one whose web
+process died is requeued the same way. Inline uploads never wait in the queue, so an
+``ocr_worker`` run in inline mode (e.g. ``--exit-when-idle`` from cron) only resumes
+interrupted jobs.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .governor import GovernorBusy
+from .models import OcrJob, OcrWorker
+from .scratch import ScratchUnavailable
+from .tracing import JobTracer
+
+log = logging.getLogger(__name__)
+
+# Pending jobs looked at per claim; losing a race moves on to the next one.
+_CLAIM_CANDIDATES = 5
+# A worker without a heartbeat for this many intervals is shown as gone.
+_ALIVE_INTERVALS = 3
+
+
+@dataclass(slots=True)
+class WorkerStats:
+    completed: int = 0
+    failed: int = 0
+
+
+def enabled() -> bool:
+    return settings.OCR_EXECUTION == 'queue'
+
+
+def _lease_until():
+    return timezone.now() + timedelta(seconds=settings.OCR_WORKER_LEASE_SECONDS)
+
+
+def register(name: str | None = None) -> OcrWorker:
+    hostname = socket.gethostname()
+    now = timezone.now()
+    worker, _ = OcrWorker.objects.update_or_create(
+        name=name or f'{hostname}-{os.getpid()}',
+        defaults={
+            'hostname': hostname,
+            'pid': os.getpid(),
+            'status': OcrWorker.Status.IDLE,
+            'started_at': now,
+            'heartbeat_at': now,
+        },
+    )
+    log.info('OCR worker %s registered.', worker.name)
+    return worker
+
+
+def heartbeat(worker: OcrWorker, status: str | None = None) -> None:
+    values = {'heartbeat_at': timezone.now()}
+    if status:
+        values['status'] = status
+    OcrWorker.objects.filter(pk=worker.pk).update(**values)
+
+
+def deregister(worker: OcrWorker) -> None:
+    heartbeat(worker, OcrWorker.Status.STOPPED)
+    log.info('OCR worker %s stopped.', worker.name)
+
+
+def reap_expired() -> int:
+    """Requeue (or fail, after too many attempts) jobs whose worker stopped renewing the lease."""
+    now = timezone.now()
+    expired = OcrJob.objects.filter(status=OcrJob.Status.PROCESSING, lease_expires_at__lt=now)
+    failed = expired.filter(attempts__gte=settings.OCR_JOB_MAX_ATTEMPTS).update(
+        status=OcrJob.Status.FAILED,
+        error_message='Procesarea a fost întreruptă de prea multe ori și a fost oprită.',
+        lease_owner=None,
+        lease_expires_at=None,
+        updated_at=now,
+    )
+    requeued = expired.update(
+        status=OcrJob.Status.PENDING, lease_owner=None, lease_expires_at=None, updated_at=now
+    )
+    if failed or requeued:
+        log.warning('Expired OCR leases: %d jobs requeued, %d failed.', requeued, failed)
+    return requeued + failed
+
+
+def claim(worker: OcrWorker) -> OcrJob | None:
+    """Lease the oldest pending job to ``worker``; ``None`` when the queue is empty."""
+    pending = OcrJob.objects.filter(status=OcrJob.Status.PENDING).order_by('created_at')
+    for pk in pending.values_list('pk', flat=True)[:_CLAIM_CANDIDATES]:
+        now = timezone.now()
+        claimed = OcrJob.objects.filter(pk=pk, status=OcrJob.Status.PENDING).update(
+            status=OcrJob.Status.PROCESSING,
+            lease_owner=worker,
+            lease_expires_at=_lease_until(),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return OcrJob.objects.get(pk=pk)
+    return None
+
+
+def lease_inline(job: OcrJob) -> None:
+    """Lease a job about to run in the web process (no worker owns it)."""
+    job.lease_owner = None
+    job.lease_expires_at = _lease_until()
+    job.attempts += 1
+    job.save(update_fields=['lease_owner', 'lease_expires_at', 'attempts'])
+
+
+def end_lease(worker: OcrWorker | None, job: OcrJob) -> None:
+    OcrJob.objects.filter(pk=job.pk, lease_owner=worker).update(lease_expires_at=None)
+
+
+def renew(worker: OcrWorker | None, job_id) -> bool:
+    """Extend the lease; ``False`` when the job was reaped and handed to someone else."""
+    renewed = OcrJob.objects.filter(
+        pk=job_id, lease_owner=worker, status=OcrJob.Status.PROCESSING
+    ).update(lease_expires_at=_lease_until())
+    if worker is not None:
+        heartbeat(worker)
+    return bool(renewed)
+
+
+class LeaseKeeper:
+    """Renews a job lease from a background thread while the engine runs."""
+
+    def __init__(self, worker: OcrWorker | None, job_id):
+        self.worker = worker
+        self.job_id = job_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'lease-{job_id}', daemon=True)
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(settings.OCR_WORKER_HEARTBEAT_SECONDS):
+                if not renew(self.worker, self.job_id) and not self.lost:
+                    self.lost = True
+                    log.warning('Lost the lease on job %s; another worker may run it again.', self.job_id)
+        finally:
+            connection.close()
+
+    def __enter__(self) -> 'LeaseKeeper':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def release(worker: OcrWorker, job: OcrJob) -> None:
+    """Put a claimed job back in the queue without counting the attempt."""
+    OcrJob.objects.filter(pk=job.pk, lease_owner=worker).update(
+        status=OcrJob.Status.PENDING,
+        lease_owner=None,
+        lease_expires_at=None,
+        attempts=F('attempts') - 1,
+        updated_at=timezone.now(),
+    )
+
+
+def process(worker: OcrWorker, job: OcrJob) -> bool | None:
+    """Run a claimed job; returns whether it completed, or ``None`` when it was requeued."""
+    # The engines live with the views, which import this module.
+    from .views import _run_ocr, _word_document_from_job
+
+    tracer = JobTracer.resume(job.timings)
+    tracer.add_seconds('queue_wait', max(0.0, (timezone.now() - job.created_at).total_seconds()))
+    with LeaseKeeper(worker, job.pk):
+        try:
+            _run_ocr(job, tracer)
+        except (ScratchUnavailable, GovernorBusy) as exc:
+            # Another worker (or this one, later) may have the disk space or free units.
+            log.warning('Job %s does not fit on worker %s now (%s); requeued.', job.id, worker.name, type(exc).__name__)
+            release(worker, job)
+            return None
+        except Exception as exc:  # noqa: BLE001 - a broken job must not stop the worker
+            if not isinstance(exc, RuntimeError):
+                log.exception('OCR job %s crashed on worker %s', job.id, worker.name)
+            job.status = OcrJob.Status.FAILED
+            job.error_message = str(exc) or 'Procesarea a eșuat.'
+            job.save(update_fields=['status', 'error_message', 'updated_at'])
+    end_lease(worker, job)
+    completed = job.status == OcrJob.Status.COMPLETED
+    word_title = (job.options or {}).get('word_title')
+    if completed and word_title:
+        # A Word conversion whose request died with its web process.
+        try:
+            _word_document_from_job(job.user, word_title, job)
+        except Exception:  # noqa: BLE001 - the OCR result stays reusable for a new conversion
+            log.exception('Could not create the Word document of resumed job %s', job.id)
+    counter = 'jobs_completed' if completed else 'jobs_failed'
+    OcrWorker.objects.filter(pk=worker.pk).update(**{counter: F(counter) + 1})
+    return completed
+
+
+def run(
+    worker: OcrWorker,
+    stop: threading.Event,
+    max_jobs: int = 0,
+    exit_when_idle: bool = False,
+) -> WorkerStats:
+    """Claim and process jobs until ``stop`` is set (after the current job)."""
+    stats = WorkerStats()
+    while not stop.is_set():
+        close_old_connections()
+        reap_expired()
+        job = claim(worker)
+        if job is None:
+            heartbeat(worker, OcrWorker.Status.IDLE)
+            if exit_when_idle:
+                break
+            stop.wait(settings.OCR_WORKER_POLL_SECONDS)
+            continue
+        heartbeat(worker, OcrWorker.Status.BUSY)
+        log.info('Worker %s processing job %s (attempt %d).', worker.name, job.id, job.attempts)
+        completed = process(worker, job)
+        if completed is None:
+            stop.wait(settings.OCR_WORKER_POLL_SECONDS)
+            continue
+        if completed:
+            stats.completed += 1
+        else:
+            stats.failed += 1
+        if max_jobs and stats.completed + stats.failed >= max_jobs:
+            break
+    return stats
+
+
+def queue_summary() -> dict:
+    """Queue depth and registered workers for the admin console."""
+    alive_after = timezone.now() - timedelta(
+        seconds=settings.OCR_WORKER_HEARTBEAT_SECONDS * _ALIVE_INTERVALS
+    )
+    workers = list(OcrWorker.objects.exclude(status=OcrWorker.Status.STOPPED))
+    leased = dict(
+        OcrJob.objects.filter(status=OcrJob.Status.PROCESSING, lease_owner__isnull=False).values_list(
+            'lease_owner_id', 'id'
+        )
+    )
+    return {
+        'enabled': enabled(),
+        'pending': OcrJob.objects.filter(status=OcrJob.Status.PENDING).count(),
+        'processing': OcrJob.objects.filter(status=OcrJob.Status.PROCESSING).count(),
+        'workers': [
+            {
+                'name': worker.name,
+                'status': worker.get_status_display(),
+                'alive': worker.heartbeat_at >= alive_after,
+                'heartbeat_at': worker.heartbeat_at,
+                'job': leased.get(worker.pk),
+                'completed': worker.jobs_completed,
+                'failed': worker.jobs_failed,
+            }
+            for worker in workers
+        ],
+        'alive': sum(1 for worker in workers if worker.heartbeat_at >= alive_after),
+    }